@@ -1,17 +1,30 @@
 import json
+import uuid
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.utils import timezone
 from .models import Conversation, Message
+from .state import mark_read, post_message
+from .write_behind import get_buffer, write_behind_enabled
+
+def conversation_group(conversation_id):
+    return f"chat_{conversation_id}"
+
+def client_id_or_none(value):
+    """The client_id a tab sent with a message, if usable"""
+    if isinstance(value, str) and 0 < len(value) <= 64:
+        return value
+    return None
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.user = self.scope["user"]
-        self.conversation_id = self.scope["url_route"]["kwargs"]["conversation_id"]
-        self.conversation_group_name = f"chat_{self.conversation_id}"
+        self.conversation_id = int(self.scope["url_route"]["kwargs"]["conversation_id"])
+        self.conversation_group_name = conversation_group(self.conversation_id)
         
-        # Check user permissions
-        if not await self.user_can_access_conversation():
+        # Check user permissions once; participants_removed() revokes it
+        self.is_participant = await self.user_can_access_conversation()
+        if not self.is_participant:
             await self.close()
             return
         
@@ -33,28 +46,37 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.conversation_group_name,
             self.channel_name
         )
+        
+        # Store buffered messages before the connection is gone
+        if write_behind_enabled():
+            await get_buffer().flush()
     
     async def receive(self, text_data):
         # Parse the received message
         text_data_json = json.loads(text_data)
         message_content = text_data_json.get("message", "").strip()
         
-        if not message_content:
+        if not message_content or not self.is_participant:
             return
         
-        # Create message in database
-        message = await self.create_message(message_content)
+        if write_behind_enabled():
+            # Broadcast now, the buffer stores it within milliseconds
+            message = await self.buffer_message(message_content, text_data_json.get("client_id"))
+        else:
+            # Create message in database
+            message = await self.create_message(message_content, text_data_json.get("client_id"))
         
         # Send message to conversation group
         await self.channel_layer.group_send(
             self.conversation_group_name,
             {
                 "type": "chat_message",
-                "message": message_content,
+                "message": message["content"],
                 "sender_id": self.user.id,
                 "sender_username": self.user.username,
                 "timestamp": message["timestamp"],
-                "message_id": message["id"]
+                "message_id": message["id"],
+                "client_id": message["client_id"]
             }
         )
     
@@ -68,43 +90,58 @@ class ChatConsumer(AsyncWebsocketConsumer):
             "sender_id": event["sender_id"],
             "sender_username": event["sender_username"],
             "timestamp": event["timestamp"],
-            "message_id": event["message_id"]
+            "message_id": event["message_id"],
+            "client_id": event.get("client_id")
         }))
     
+    async def participants_removed(self, event):
+        """Drop the connection of a participant removed from the conversation"""
+        if self.user.id in event["user_ids"]:
+            self.is_participant = False
+            await self.close()
+    
     @database_sync_to_async
     def user_can_access_conversation(self):
-        """Check if user has permission to access this conversation"""
-        try:
-            conversation = Conversation.objects.get(id=self.conversation_id)
-            return self.user in conversation.participants.all()
-        except Conversation.DoesNotExist:
+        """Check if user has permission to access this conversation (one EXISTS query)"""
+        if not self.user.is_authenticated:
             return False
+        return Conversation.participants.through.objects.filter(
+            conversation_id=self.conversation_id,
+            user_id=self.user.id
+        ).exists()
     
     @database_sync_to_async
-    def create_message(self, content):
+    def create_message(self, content, client_id=None):
         """Create a new message in the database"""
-        conversation = Conversation.objects.get(id=self.conversation_id)
-        message = Message.objects.create(
-            conversation=conversation,
+        message = post_message(self.conversation_id, self.user, content, client_id_or_none(client_id))
+        
+        # A resent client_id returns the message stored the first time
+        return {
+            "id": message.id,
+            "client_id": message.client_id,
+            "content": message.content,
+            "timestamp": message.created_at.isoformat()
+        }
+    
+    async def buffer_message(self, content, client_id=None):
+        """Queue the message for write-behind; it has no database id yet"""
+        message = Message(
+            conversation_id=self.conversation_id,
             sender=self.user,
-            content=content
+            content=content,
+            client_id=client_id_or_none(client_id) or uuid.uuid4().hex,
+            created_at=timezone.now()
         )
-        
-        # Update the conversation's updated_at field
-        conversation.updated_at = timezone.now()
-        conversation.save(update_fields=['updated_at'])
+        await get_buffer().add(message)
         
         return {
-            "id": message.id,
+            "id": None,
+            "client_id": message.client_id,
+            "content": message.content,
             "timestamp": message.created_at.isoformat()
         }
     
     @database_sync_to_async
     def mark_messages_as_read(self):
         """Mark all unread messages in this conversation as read for current user"""
-        conversation = Conversation.objects.get(id=self.conversation_id)
-        Message.objects.filter(
-            conversation=conversation,
-            sender__id__ne=self.user.id,
-            is_read=False
-        ).update(is_read=True)
+        mark_read(self.conversation_id, self.user.id)
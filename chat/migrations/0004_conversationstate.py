@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_conversation_states(apps, schema_editor):
+    Conversation = apps.get_model('chat', 'Conversation')
+    ConversationState = apps.get_model('chat', 'ConversationState')
+    Message = apps.get_model('chat', 'Message')
+
+    states = []
+    for conversation in Conversation.objects.prefetch_related('participants'):
+        messages = Message.objects.filter(conversation=conversation).order_by('-created_at', '-pk')
+        last_message = messages.first()
+        for user in conversation.participants.all():
+            states.append(ConversationState(
+                conversation=conversation,
+                user=user,
+                unread_count=messages.filter(is_read=False).exclude(sender=user).count(),
+                last_read_message=messages.filter(
+                    models.Q(is_read=True) | models.Q(sender=user)
+                ).first(),
+                last_message=last_message,
+                last_message_at=last_message.created_at if last_message else None
+            ))
+    ConversationState.objects.bulk_create(states, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.PositiveIntegerField(default=0, verbose_name='Unread messages')),
+                ('last_message_at', models.DateTimeField(blank=True, null=True, verbose_name='Last message at')),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='states', to='chat.conversation', verbose_name='Conversation')),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.message', verbose_name='Last message')),
+                ('last_read_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.message', verbose_name='Last read message')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_states', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Conversation State',
+                'verbose_name_plural': 'Conversation States',
+                'indexes': [models.Index(fields=['user', '-last_message_at'], name='chat_state_user_last_msg')],
+                'constraints': [models.UniqueConstraint(fields=('conversation', 'user'), name='unique_conversation_state')],
+            },
+        ),
+        migrations.RunPython(backfill_conversation_states, migrations.RunPython.noop),
+    ]
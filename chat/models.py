@@ -1,8 +1,35 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse
 
+
+class ConversationQuerySet(models.QuerySet):
+    def inbox(self, user):
+        """
+        The user's conversations, most recent message first, in two queries.
+        Each conversation is annotated from the user's ConversationState with
+        unread_count, last_message_content, last_message_at and
+        last_message_sender_id, and gets an other_participants list.
+        """
+        from django.contrib.auth import get_user_model
+        from django.db.models import F, Prefetch
+
+        return self.filter(states__user=user).annotate(
+            unread_count=F('states__unread_count'),
+            last_message_at=F('states__last_message_at'),
+            last_message_content=F('states__last_message__content'),
+            last_message_sender_id=F('states__last_message__sender_id'),
+        ).select_related('listing', 'booking').prefetch_related(
+            Prefetch(
+                'participants',
+                queryset=get_user_model().objects.exclude(pk=user.pk),
+                to_attr='other_participants'
+            )
+        ).order_by(F('states__last_message_at').desc(nulls_last=True), '-updated_at')
+
+
 class Conversation(models.Model):
     """
     Conversation between users
@@ -32,6 +59,8 @@ class Conversation(models.Model):
         blank=True,
         verbose_name=_("Related Booking")
     )
+
+    objects = ConversationQuerySet.as_manager()
     
     class Meta:
         verbose_name = _("Conversation")
@@ -50,7 +79,10 @@ class Conversation(models.Model):
     @property
     def last_message(self):
         """Get the last message in the conversation"""
-        return self.messages.order_by('-created_at').first()
+        state = self.states.select_related('last_message').first()
+        if state is None:
+            return self.messages.order_by('-created_at').first()
+        return state.last_message
     
     @property
     def title(self):
@@ -71,7 +103,8 @@ class Conversation(models.Model):
     def get_unread_count(self, user=None):
         """Get count of unread messages for a specific user"""
         if user:
-            return self.messages.filter(is_read=False).exclude(sender=user).count()
+            from .state import unread_count
+            return unread_count(self.pk, user.pk)
         return 0
 
 class Message(models.Model):
@@ -91,13 +124,28 @@ class Message(models.Model):
         verbose_name=_("Sender")
     )
     content = models.TextField(_("Message"))
-    created_at = models.DateTimeField(_("Created at"), auto_now_add=True)
+    # Not auto_now_add: write-behind stores the time the message was sent,
+    # not the time its batch was flushed (see chat/write_behind.py)
+    created_at = models.DateTimeField(_("Created at"), default=timezone.now, editable=False)
     is_read = models.BooleanField(_("Is read"), default=False)
+    # Id given by the sending tab; it matches the tab's optimistic copy to
+    # the stored message and makes resends and retried writes idempotent
+    client_id = models.CharField(_("Client ID"), max_length=64, null=True, blank=True, editable=False)
     
     class Meta:
         verbose_name = _("Message")
         verbose_name_plural = _("Messages")
         ordering = ['created_at']
+        indexes = [
+            # History pages and the last message of a conversation
+            models.Index(fields=['conversation', 'created_at'], name='chat_msg_conv_created'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['conversation', 'sender', 'client_id'],
+                name='unique_message_client_id'
+            ),
+        ]
     
     def __str__(self):
         return f"Message from {self.sender.username} at {self.created_at}"
@@ -107,3 +155,58 @@ class Message(models.Model):
         if not self.is_read:
             self.is_read = True
             self.save(update_fields=['is_read'])
+
+class ConversationState(models.Model):
+    """
+    Per-participant state of a conversation, maintained by chat.state:
+    the participant's unread message count, the last message they have
+    read and the conversation's last message (for inbox previews and
+    ordering without touching the messages table).
+    """
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name='states',
+        verbose_name=_("Conversation")
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='conversation_states',
+        verbose_name=_("User")
+    )
+    unread_count = models.PositiveIntegerField(_("Unread messages"), default=0)
+    last_read_message = models.ForeignKey(
+        Message,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        verbose_name=_("Last read message")
+    )
+    last_message = models.ForeignKey(
+        Message,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        verbose_name=_("Last message")
+    )
+    last_message_at = models.DateTimeField(_("Last message at"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Conversation State")
+        verbose_name_plural = _("Conversation States")
+        indexes = [
+            # Inbox, most recent activity first
+            models.Index(fields=['user', '-last_message_at'], name='chat_state_user_last_msg'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['conversation', 'user'],
+                name='unique_conversation_state'
+            )
+        ]
+
+    def __str__(self):
+        return f"Conversation {self.conversation_id} for user {self.user_id}: {self.unread_count} unread"
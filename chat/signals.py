@@ -0,0 +1,71 @@
+"""
+Signal handlers keeping ConversationState in step (see chat/state.py) and
+revoking the ChatConsumer access of removed participants
+"""
+import logging
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+
+from .models import Conversation, Message
+from .state import ensure_states, record_messages, remove_states
+
+logger = logging.getLogger(__name__)
+
+def disconnect_removed_participants(conversation_id, user_ids):
+    """Close the open chat sockets of users no longer in the conversation"""
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+    from .consumers import conversation_group
+
+    def send():
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        try:
+            async_to_sync(channel_layer.group_send)(
+                conversation_group(conversation_id),
+                {'type': 'participants.removed', 'user_ids': list(user_ids)}
+            )
+        except Exception as e:
+            logger.warning(f"Could not notify chat {conversation_id} of removed participants: {e}")
+
+    transaction.on_commit(send)
+
+@receiver(post_save, sender=Message)
+def record_new_message(sender, instance, created, **kwargs):
+    if created:
+        record_messages(instance.conversation_id, [instance])
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def sync_participant_states(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # user.conversations.add(...): instance is the user
+        if action == 'post_add':
+            for conversation_id in pk_set:
+                ensure_states(conversation_id, [instance.pk])
+        elif action == 'post_remove':
+            for conversation_id in pk_set:
+                remove_states(conversation_id, [instance.pk])
+                disconnect_removed_participants(conversation_id, [instance.pk])
+        elif action == 'pre_clear':
+            from .models import ConversationState
+            states = ConversationState.objects.filter(user=instance)
+            for conversation_id in states.values_list('conversation_id', flat=True):
+                disconnect_removed_participants(conversation_id, [instance.pk])
+            states.delete()
+        return
+
+    if action == 'post_add':
+        ensure_states(instance.pk, pk_set)
+    elif action == 'post_remove':
+        remove_states(instance.pk, pk_set)
+        disconnect_removed_participants(instance.pk, pk_set)
+    elif action == 'pre_clear':
+        # The participant ids are gone after the clear
+        disconnect_removed_participants(
+            instance.pk, list(instance.participants.values_list('pk', flat=True))
+        )
+    elif action == 'post_clear':
+        remove_states(instance.pk)
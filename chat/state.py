@@ -0,0 +1,159 @@
+"""
+Denormalized per-participant conversation state.
+
+ConversationState keeps, for every participant of a conversation, the
+unread message count and the last read message, plus the conversation's
+last message. Badges, unread counts and the inbox read these rows instead
+of counting and sorting Message rows.
+
+    * Participants added to or removed from a conversation get or lose
+      their row (m2m_changed, see chat/signals.py).
+    * A new message is recorded with one UPDATE over the conversation's
+      rows (Message post_save, or record_messages() after bulk_create).
+      Recipients' open tabs learn about it from the message notification.
+    * mark_read() clears a participant's count with one UPDATE of the
+      messages and one of the state row.
+
+post_message() creates a message, its state update and the conversation
+updated_at bump in one transaction; every code path that posts a message
+should use it.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Sum, When
+from django.utils import timezone
+
+from notifications.push import push_unread_changed
+
+
+def ensure_states(conversation_id, user_ids):
+    """Create missing state rows, pointing at the current last message"""
+    from .models import ConversationState, Message
+
+    last_message = Message.objects.filter(
+        conversation_id=conversation_id
+    ).order_by('-created_at', '-pk').only('pk', 'created_at').first()
+
+    ConversationState.objects.bulk_create([
+        ConversationState(
+            conversation_id=conversation_id,
+            user_id=user_id,
+            last_message=last_message,
+            last_read_message=last_message,
+            last_message_at=last_message.created_at if last_message else None
+        )
+        for user_id in user_ids
+    ], ignore_conflicts=True)
+
+
+def remove_states(conversation_id, user_ids=None):
+    from .models import ConversationState
+
+    states = ConversationState.objects.filter(conversation_id=conversation_id)
+    if user_ids is not None:
+        states = states.filter(user_id__in=user_ids)
+    states.delete()
+
+
+def record_messages(conversation_id, messages):
+    """
+    Account for new messages of one conversation (oldest first): bump the
+    unread counts of everyone but their senders and move the last message
+    pointers. One UPDATE regardless of the number of participants.
+    """
+    from .models import ConversationState
+
+    if not messages:
+        return
+
+    last = messages[-1]
+    unread = Case(
+        *[
+            When(user_id=sender_id, then=F('unread_count') + count)
+            for sender_id, count in _received_counts(messages).items()
+        ],
+        default=F('unread_count') + len(messages)
+    )
+    ConversationState.objects.filter(conversation_id=conversation_id).update(
+        unread_count=unread,
+        last_message_id=last.pk,
+        last_message_at=last.created_at
+    )
+
+
+def _received_counts(messages):
+    """For each sender, the number of the messages not sent by them"""
+    senders = {}
+    for message in messages:
+        senders[message.sender_id] = senders.get(message.sender_id, 0) + 1
+    return {sender_id: len(messages) - sent for sender_id, sent in senders.items()}
+
+
+def post_message(conversation_id, sender, content, client_id=None):
+    """
+    Create a message and update the conversation state atomically. A
+    message the sender already posted to the conversation with the same
+    client_id is returned instead of being stored twice.
+    """
+    from .models import Conversation, Message
+
+    try:
+        with transaction.atomic():
+            # post_save records it in ConversationState
+            message = Message.objects.create(
+                conversation_id=conversation_id,
+                sender=sender,
+                content=content,
+                client_id=client_id or None
+            )
+            Conversation.objects.filter(pk=conversation_id).update(updated_at=timezone.now())
+    except IntegrityError:
+        if not client_id:
+            raise
+        return Message.objects.get(
+            conversation_id=conversation_id,
+            sender=sender,
+            client_id=client_id
+        )
+    return message
+
+
+def mark_read(conversation_id, user_id):
+    """Mark the conversation read for the user; returns the number of messages marked"""
+    from .models import ConversationState, Message
+
+    with transaction.atomic():
+        marked = Message.objects.filter(
+            conversation_id=conversation_id,
+            is_read=False
+        ).exclude(sender_id=user_id).update(is_read=True)
+        ConversationState.objects.filter(
+            conversation_id=conversation_id,
+            user_id=user_id
+        ).update(
+            unread_count=0,
+            last_read_message_id=F('last_message_id')
+        )
+
+    if marked:
+        push_unread_changed(user_id)
+    return marked
+
+
+def unread_count(conversation_id, user_id):
+    from .models import ConversationState
+
+    return ConversationState.objects.filter(
+        conversation_id=conversation_id,
+        user_id=user_id
+    ).values_list('unread_count', flat=True).first() or 0
+
+
+def total_unread_count(user_id):
+    """Unread messages over all of the user's conversations"""
+    from .models import ConversationState
+
+    return ConversationState.objects.filter(
+        user_id=user_id,
+        unread_count__gt=0
+    ).aggregate(total=Sum('unread_count'))['total'] or 0
+
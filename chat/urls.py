@@ -6,6 +6,7 @@ app_name = 'chat'
 urlpatterns = [
     path('', views.conversation_list, name='conversation_list'),
     path('<int:pk>/', views.conversation_detail, name='conversation_detail'),
+    path('<int:pk>/messages/', views.message_history, name='message_history'),
     path('start/', views.start_conversation, name='start_conversation'),
     path('start/user/<int:user_id>/', views.start_conversation, name='start_conversation_with_user'),
     path('start/listing/<int:listing_id>/', views.start_conversation, name='start_conversation_about_listing'),
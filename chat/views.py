@@ -1,70 +1,105 @@
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import Http404, JsonResponse
 from django.db.models import Q
 from django.contrib import messages
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
-from .models import Conversation, Message
+from utils.pagination import InvalidCursor, clamp_page_size, keyset_page
+from .models import Conversation
 from users.models import User
 from listings.models import Listing, Booking
+from .state import mark_read, post_message, total_unread_count
 
 @login_required
 def conversation_list(request):
     """View for listing all conversations for the current user"""
-    # Get all conversations where the user is a participant
-    conversations = Conversation.objects.filter(
-        participants=request.user
-    ).select_related('listing', 'booking').prefetch_related('participants')
-
-    # Add unread count and other user for each conversation
-    conversations_with_data = []
-    for conversation in conversations:
-        conversation.unread_count = conversation.get_unread_count(request.user)
-        conversation.other_user = conversation.get_other_participant(request.user)
-        conversations_with_data.append(conversation)
+    # Unread counts, last messages and other participants in two queries
+    conversations = Conversation.objects.inbox(request.user)
 
     return render(request, 'chat/conversation_list.html', {
-        'conversations': conversations_with_data
+        'conversations': conversations
     })
 
+def _participant_conversation(request, pk):
+    """The conversation, or 404 if the user does not take part in it"""
+    conversation = get_object_or_404(
+        Conversation.objects.select_related('listing', 'booking__listing__host'), pk=pk
+    )
+    if not conversation.participants.filter(pk=request.user.pk).exists():
+        raise Http404("Conversation not found")
+    return conversation
+
+def _history_page(request, conversation, cursor=None):
+    """Keyset page of the conversation's messages, newest first"""
+    page_size = clamp_page_size(
+        request.GET.get('page_size'),
+        default=getattr(settings, 'CHAT_HISTORY_PAGE_SIZE', 50)
+    )
+    return keyset_page(
+        conversation.messages.select_related('sender'),
+        cursor,
+        page_size
+    )
+
 @login_required
 def conversation_detail(request, pk):
     """View for displaying a conversation"""
-    conversation = get_object_or_404(Conversation, pk=pk)
-
-    # Check if user is a participant
-    if request.user not in conversation.participants.all():
-        raise Http404("Conversation not found")
+    conversation = _participant_conversation(request, pk)
 
     # Handle POST request (message sending)
     if request.method == 'POST':
         content = request.POST.get('content', '').strip()
         if content:
-            Message.objects.create(
-                conversation=conversation,
-                sender=request.user,
-                content=content
-            )
+            post_message(conversation.pk, request.user, content)
         return redirect('chat:conversation_detail', pk=pk)
 
-    # Get messages in conversation
-    messages_list = conversation.messages.select_related('sender').order_by('created_at')
+    # Only the latest page; older messages are loaded from message_history
+    page = _history_page(request, conversation)
 
     # Mark unread messages as read
-    unread_messages = messages_list.filter(is_read=False).exclude(sender=request.user)
-    for msg in unread_messages:
-        msg.is_read = True
-        msg.save(update_fields=['is_read'])
+    mark_read(conversation.pk, request.user.pk)
 
     # Get other participant(s)
     other_participants = conversation.participants.exclude(id=request.user.id)
 
     return render(request, 'chat/chat_room.html', {
         'conversation': conversation,
-        'messages': messages_list,
+        'conversations': Conversation.objects.inbox(request.user),
+        'messages': page.items[::-1],
+        'older_cursor': page.next_cursor,
         'other_participants': other_participants
     })
 
+@login_required
+def message_history(request, pk):
+    """JSON API for loading older messages: ?cursor=&page_size="""
+    conversation = _participant_conversation(request, pk)
+    try:
+        page = _history_page(request, conversation, request.GET.get('cursor'))
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        # Oldest first, ready to be prepended
+        'results': [
+            {
+                'id': message.id,
+                'client_id': message.client_id,
+                'content': message.content,
+                'sender_id': message.sender_id,
+                'sender_name': message.sender.first_name or message.sender.username,
+                'created_at': message.created_at.isoformat(),
+                'is_outgoing': message.sender_id == request.user.pk,
+            }
+            for message in reversed(page.items)
+        ],
+        'next_cursor': page.next_cursor,
+        'has_next': page.has_next,
+    })
+
 @login_required
 def start_conversation(request, user_id=None, listing_id=None, booking_id=None):
     """Start a new conversation or redirect to existing one"""
@@ -166,23 +201,25 @@ def start_conversation(request, user_id=None, listing_id=None, booking_id=None):
     if request.method == 'POST' and 'initial_message' in request.POST:
         initial_message = request.POST.get('initial_message').strip()
         if initial_message:
-            Message.objects.create(
-                conversation=conversation,
-                sender=request.user,
-                content=initial_message
-            )
+            post_message(conversation.pk, request.user, initial_message)
 
     return redirect('chat:conversation_detail', pk=conversation.pk)
 
+def _unread_message_count(request):
+    # Shared by the ETag check and the view
+    if not hasattr(request, '_unread_message_count'):
+        request._unread_message_count = total_unread_count(request.user.pk)
+    return request._unread_message_count
+
+def _unread_etag(request):
+    return f'"messages-{request.user.pk}-{_unread_message_count(request)}"'
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_unread_etag)
 def get_unread_count(request):
-    """API to get unread message count for current user"""
-    count = Message.objects.filter(
-        conversation__participants=request.user,
-        is_read=False
-    ).exclude(
-        sender=request.user
-    ).count()
+    """API to get unread message count for current user (polling fallback of ws/notifications/)"""
+    count = _unread_message_count(request)
 
     # Return HTML template for HTMX
     return render(request, 'chat/partials/unread_count.html', {'count': count})
\ No newline at end of file
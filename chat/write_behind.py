@@ -0,0 +1,213 @@
+"""
+Write-behind persistence for WebSocket chat messages (optional).
+
+By default ChatConsumer saves every message before broadcasting it: an
+INSERT, the state and notification bookkeeping and an updated_at bump, all
+serialized through the single database thread of database_sync_to_async.
+With CHAT_WRITE_BEHIND = True the consumer broadcasts immediately, tagged
+with a client-generated id, and hands the message to this process's
+MessageBuffer. The buffer writes what has accumulated every
+CHAT_WRITE_BEHIND_INTERVAL seconds, or as soon as CHAT_WRITE_BEHIND_BATCH_SIZE
+messages are waiting:
+
+    * one bulk_create for the messages of all conversations,
+    * one ConversationState UPDATE per conversation (record_messages),
+    * one updated_at UPDATE for all the conversations involved,
+    * one notification bulk insert for all recipients,
+
+in a single transaction. bulk_create skips post_save, so persist_messages()
+does the work of the Message signal handlers itself; it needs a database
+that returns primary keys from bulk inserts (PostgreSQL, SQLite 3.35+).
+
+Every buffered message carries the client_id it was broadcast with, unique
+per sender and conversation, and the created_at it was broadcast with. A
+flush skips messages already stored under their client_id, so a batch
+retried after an unclear failure, or a message resent by a reconnecting
+tab, is stored once, with the time the clients were shown.
+
+A batch that fails as a whole is split: each conversation's messages are
+written on their own, then each message of a conversation that still
+fails. Only the messages that fail alone, e.g. of a conversation deleted
+meanwhile, stay in the buffer; they are retried on the next intervals and
+dropped after MAX_ATTEMPTS, without holding back the rest.
+
+Backpressure: at most CHAT_WRITE_BEHIND_MAX_PENDING messages wait in memory;
+beyond that, add() blocks the sending consumer until a flush makes room.
+A consumer flushes the buffer when its socket disconnects, so a client
+that sends and closes has its messages stored before the connection is
+gone. Messages still waiting when the process dies are lost (at most one
+interval's worth), which is the trade-off this mode accepts; leave it off
+where every message must be durable before it is shown.
+"""
+import asyncio
+import logging
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 0.05
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_MAX_PENDING = 5000
+# Consecutive failed writes of a message before it is dropped
+MAX_ATTEMPTS = 3
+
+
+def write_behind_enabled():
+    return getattr(settings, 'CHAT_WRITE_BEHIND', False)
+
+
+def _by_conversation(messages):
+    groups = {}
+    for message in messages:
+        groups.setdefault(message.conversation_id, []).append(message)
+    return groups
+
+
+def _new_messages(messages):
+    """The messages whose (conversation, sender, client_id) is not stored yet, first copy only"""
+    from .models import Message
+
+    unique = {}
+    for message in messages:
+        unique.setdefault((message.conversation_id, message.sender_id, message.client_id), message)
+
+    stored = set(Message.objects.filter(
+        conversation_id__in={key[0] for key in unique},
+        sender_id__in={key[1] for key in unique},
+        client_id__in={key[2] for key in unique}
+    ).values_list('conversation_id', 'sender_id', 'client_id'))
+    return [message for key, message in unique.items() if key not in stored]
+
+
+def persist_messages(messages):
+    """
+    Save unsaved Message objects (oldest first, each with a client_id) with
+    their bookkeeping; returns the number stored
+    """
+    from notifications.tasks import create_message_notifications
+    from .models import Conversation, Message
+    from .state import record_messages
+
+    try:
+        with transaction.atomic():
+            messages = _new_messages(messages)
+            if not messages:
+                return 0
+
+            by_conversation = _by_conversation(messages)
+            Message.objects.bulk_create(messages)
+            for conversation_id, conversation_messages in by_conversation.items():
+                record_messages(conversation_id, conversation_messages)
+            Conversation.objects.filter(pk__in=by_conversation).update(updated_at=timezone.now())
+            create_message_notifications(messages)
+    except Exception:
+        # Rolled back: the ids bulk_create assigned were not kept
+        for message in messages:
+            message.pk = None
+        raise
+    return len(messages)
+
+
+def persist_batch(messages):
+    """
+    persist_messages(), isolating failures: a failed batch is written per
+    conversation, a failed conversation per message. Returns the messages
+    that could not be written and the last error.
+    """
+    try:
+        persist_messages(messages)
+        return [], None
+    except Exception as e:
+        if len(messages) == 1:
+            return messages, e
+        error = e
+
+    groups = list(_by_conversation(messages).values())
+    if len(groups) == 1:
+        groups = [[message] for message in messages]
+
+    failed = []
+    for group in groups:
+        group_failed, group_error = persist_batch(group)
+        failed.extend(group_failed)
+        error = group_error or error
+    return failed, error
+
+
+class MessageBuffer:
+    """Per-process queue of messages waiting to be written"""
+
+    def __init__(self, interval=None, batch_size=None, max_pending=None):
+        self.interval = interval or getattr(settings, 'CHAT_WRITE_BEHIND_INTERVAL', DEFAULT_INTERVAL)
+        self.batch_size = batch_size or getattr(settings, 'CHAT_WRITE_BEHIND_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        self.max_pending = max_pending or getattr(settings, 'CHAT_WRITE_BEHIND_MAX_PENDING', DEFAULT_MAX_PENDING)
+        self.loop = asyncio.get_running_loop()
+        self.pending = []
+        self.attempts = 0
+        self.lock = asyncio.Lock()
+        self.space = asyncio.Condition()
+        self.wake = asyncio.Event()
+        self.flusher = None
+
+    async def add(self, message):
+        """Queue an unsaved Message; waits while the buffer is full"""
+        if len(self.pending) >= self.max_pending:
+            self.wake.set()
+            async with self.space:
+                await self.space.wait_for(lambda: len(self.pending) < self.max_pending)
+
+        self.pending.append(message)
+        if len(self.pending) >= self.batch_size:
+            self.wake.set()
+        if self.flusher is None or self.flusher.done():
+            self.flusher = self.loop.create_task(self.run())
+
+    async def run(self):
+        """Flush on every interval, or earlier when a batch fills up"""
+        while self.pending:
+            try:
+                await asyncio.wait_for(self.wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write everything pending, batch_size messages per transaction"""
+        async with self.lock:
+            while self.pending:
+                batch = self.pending[:self.batch_size]
+                failed, error = await database_sync_to_async(persist_batch)(batch)
+                del self.pending[:len(batch)]
+
+                if failed:
+                    self.attempts += 1
+                    if self.attempts < MAX_ATTEMPTS:
+                        # Retried on the next interval, ahead of newer messages
+                        logger.warning(f"Could not write {len(failed)} chat messages: {error}")
+                        self.pending[:0] = failed
+                        await self.notify_space()
+                        return
+                    logger.error(f"Dropping {len(failed)} chat messages after {self.attempts} failed writes: {error}")
+
+                self.attempts = 0
+                await self.notify_space()
+
+    async def notify_space(self):
+        async with self.space:
+            self.space.notify_all()
+
+
+_buffer = None
+
+
+def get_buffer():
+    """The buffer of the running event loop (one per process)"""
+    global _buffer
+    if _buffer is None or _buffer.loop is not asyncio.get_running_loop():
+        _buffer = MessageBuffer()
+    return _buffer
@@ -12,10 +12,14 @@ django.setup()  # <- Это критически важно!
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 import chat.routing
+import notifications.routing
 
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
     "websocket": AuthMiddlewareStack(
-        URLRouter(chat.routing.websocket_urlpatterns)
+        URLRouter(
+            chat.routing.websocket_urlpatterns
+            + notifications.routing.websocket_urlpatterns
+        )
     ),
 })
\ No newline at end of file
@@ -41,6 +41,18 @@ STATICFILES_DIRS = [
 
 ASGI_APPLICATION = 'core.asgi:application'
 
+# Shared cache: the web server and run_task_worker update the same
+# counters (unread notifications, entitlements)
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+        }
+    }
+}
+
 # Channel layers for Django Channels
 CHANNEL_LAYERS = {
     'default': {
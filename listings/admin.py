@@ -1,5 +1,10 @@
 from django.contrib import admin
+from django.utils import timezone
 from .models import Listing, Booking, Review, ListingImage
+from .analytics import rebuild_host_rollups
+from .availability import rebuild_availability_index
+from .ratings import rebuild_rating_aggregates
+from subscriptions.entitlements import invalidate_entitlements
 
 class ListingImageInline(admin.TabularInline):
     model = ListingImage
@@ -47,11 +52,13 @@ class ListingAdmin(admin.ModelAdmin):
 
     def activate_listings(self, request, queryset):
         queryset.update(is_active=True)
+        invalidate_entitlements(*queryset.values_list('host_id', flat=True).distinct())
         self.message_user(request, f"{queryset.count()} listings have been activated.")
     activate_listings.short_description = "Activate selected listings"
 
     def deactivate_listings(self, request, queryset):
         queryset.update(is_active=False)
+        invalidate_entitlements(*queryset.values_list('host_id', flat=True).distinct())
         self.message_user(request, f"{queryset.count()} listings have been deactivated.")
     deactivate_listings.short_description = "Deactivate selected listings"
 
@@ -85,17 +92,23 @@ class BookingAdmin(admin.ModelAdmin):
     actions = ['mark_as_confirmed', 'mark_as_canceled', 'mark_as_completed']
 
     def mark_as_confirmed(self, request, queryset):
-        queryset.update(status='confirmed')
+        queryset.update(status='confirmed', updated_at=timezone.now())
+        rebuild_availability_index(queryset)
+        rebuild_host_rollups(Listing.objects.filter(id__in=queryset.values('listing_id')))
         self.message_user(request, f"{queryset.count()} bookings have been marked as confirmed.")
     mark_as_confirmed.short_description = "Mark selected bookings as confirmed"
 
     def mark_as_canceled(self, request, queryset):
-        queryset.update(status='canceled')
+        queryset.update(status='canceled', updated_at=timezone.now())
+        rebuild_availability_index(queryset)
+        rebuild_host_rollups(Listing.objects.filter(id__in=queryset.values('listing_id')))
         self.message_user(request, f"{queryset.count()} bookings have been marked as canceled.")
     mark_as_canceled.short_description = "Mark selected bookings as canceled"
 
     def mark_as_completed(self, request, queryset):
-        queryset.update(status='completed')
+        queryset.update(status='completed', updated_at=timezone.now())
+        rebuild_availability_index(queryset)
+        rebuild_host_rollups(Listing.objects.filter(id__in=queryset.values('listing_id')))
         self.message_user(request, f"{queryset.count()} bookings have been marked as completed.")
     mark_as_completed.short_description = "Mark selected bookings as completed"
 
@@ -111,11 +124,13 @@ class ReviewAdmin(admin.ModelAdmin):
 
     def approve_reviews(self, request, queryset):
         queryset.update(is_approved=True)
+        rebuild_rating_aggregates(Listing.objects.filter(id__in=queryset.values('listing_id')))
         self.message_user(request, f"{queryset.count()} reviews have been approved.")
     approve_reviews.short_description = "Approve selected reviews"
 
     def unapprove_reviews(self, request, queryset):
         queryset.update(is_approved=False)
+        rebuild_rating_aggregates(Listing.objects.filter(id__in=queryset.values('listing_id')))
         self.message_user(request, f"{queryset.count()} reviews have been unapproved.")
     unapprove_reviews.short_description = "Unapprove selected reviews"
 
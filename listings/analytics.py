@@ -0,0 +1,454 @@
+"""
+Pre-aggregated host analytics.
+
+HostDailyStats keeps one row per listing per day with the booking figures the
+host dashboard needs. Rows are adjusted incrementally from Booking signals
+(see listings/signals.py): the contribution of the booking's previous state is
+subtracted and the contribution of its new state added, so a status change or
+a date move only touches the affected days. ``rebuild_host_rollups`` (and the
+management command of the same name) recomputes rows from scratch.
+
+The read helpers below turn a queryset of rollup rows into the series used by
+HostDashboardView and host_dashboard_data with one grouped query each.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.db.models import F, Q, Sum, Value
+from django.db.models.functions import ExtractMonth, TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import Booking, HostDailyStats
+
+STATUS_COUNT_FIELDS = {
+    'pending': 'pending_bookings',
+    'confirmed': 'confirmed_bookings',
+    'completed': 'completed_bookings',
+    'canceled': 'canceled_bookings',
+}
+
+GUEST_FIELDS = {
+    'confirmed': 'confirmed_guests',
+    'completed': 'completed_guests',
+}
+
+NIGHT_FIELDS = {
+    'confirmed': 'confirmed_nights',
+    'completed': 'completed_nights',
+}
+
+SUM_FIELDS = (
+    'bookings_created', 'pending_bookings', 'confirmed_bookings',
+    'completed_bookings', 'canceled_bookings', 'created_revenue',
+    'confirmed_guests', 'completed_guests', 'completed_stays',
+    'stay_revenue', 'confirmed_nights', 'completed_nights',
+)
+
+MONTH_SHORT_NAMES_RU = {
+    1: 'Янв', 2: 'Фев', 3: 'Мар', 4: 'Апр', 5: 'Май', 6: 'Июн',
+    7: 'Июл', 8: 'Авг', 9: 'Сен', 10: 'Окт', 11: 'Ноя', 12: 'Дек'
+}
+
+MONTH_NAMES_RU = [
+    '', 'Январь', 'Февраль', 'Март', 'Апрель', 'Май', 'Июнь',
+    'Июль', 'Август', 'Сентябрь', 'Октябрь', 'Ноябрь', 'Декабрь'
+]
+
+# Booking fields whose changes affect the rollups
+ROLLUP_FIELDS = {
+    'listing', 'listing_id', 'created_at', 'status',
+    'start_date', 'end_date', 'total_price', 'guests',
+}
+
+ROLLUP_STATE_FIELDS = (
+    'listing_id', 'listing__host_id', 'created_at', 'status',
+    'start_date', 'end_date', 'total_price', 'guests',
+)
+
+
+# --- Maintenance ---------------------------------------------------------
+
+def _local_date(value):
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.date()
+    return value
+
+
+def booking_rollup_state(booking, with_host=True):
+    """
+    Snapshot of the booking fields the rollups depend on. The host is only
+    needed when rows may have to be created, so deletions skip the lookup.
+    """
+    return {
+        'listing_id': booking.listing_id,
+        'listing__host_id': booking.listing.host_id if with_host else None,
+        'created_at': booking.created_at,
+        'status': booking.status,
+        'start_date': booking.start_date,
+        'end_date': booking.end_date,
+        'total_price': booking.total_price,
+        'guests': booking.guests,
+    }
+
+
+def stored_rollup_state(booking_id):
+    """Snapshot of a booking as currently stored in the database"""
+    return Booking.objects.filter(pk=booking_id).values(*ROLLUP_STATE_FIELDS).first()
+
+
+def booking_contribution(state):
+    """
+    Return {(listing_id, day): {field: value}} describing what a booking in
+    the given state adds to the rollups.
+    """
+    rows = defaultdict(lambda: defaultdict(int))
+    if not state:
+        return rows
+
+    listing_id = state['listing_id']
+    status = state['status']
+    total_price = state['total_price'] or Decimal('0')
+    guests = state['guests'] or 0
+
+    if state['created_at']:
+        row = rows[(listing_id, _local_date(state['created_at']))]
+        row['bookings_created'] += 1
+        if status in STATUS_COUNT_FIELDS:
+            row[STATUS_COUNT_FIELDS[status]] += 1
+        if status in GUEST_FIELDS:
+            row[GUEST_FIELDS[status]] += guests
+        if status == 'completed':
+            row['created_revenue'] += total_price
+
+    if status == 'completed' and state['end_date']:
+        row = rows[(listing_id, state['end_date'])]
+        row['completed_stays'] += 1
+        row['stay_revenue'] += total_price
+
+    if status in NIGHT_FIELDS and state['start_date'] and state['end_date']:
+        field = NIGHT_FIELDS[status]
+        for i in range((state['end_date'] - state['start_date']).days):
+            rows[(listing_id, state['start_date'] + timedelta(days=i))][field] += 1
+
+    return rows
+
+
+def apply_rollup_change(old_state, new_state):
+    """Move the rollups from a booking's old state to its new state"""
+    old_rows = booking_contribution(old_state)
+    new_rows = booking_contribution(new_state)
+
+    deltas = {}
+    for key in set(old_rows) | set(new_rows):
+        fields = {}
+        for field in set(old_rows.get(key, {})) | set(new_rows.get(key, {})):
+            value = new_rows.get(key, {}).get(field, 0) - old_rows.get(key, {}).get(field, 0)
+            if value:
+                fields[field] = value
+        if fields:
+            deltas[key] = fields
+
+    if not deltas:
+        return
+
+    hosts = {}
+    for state in (old_state, new_state):
+        if state:
+            hosts[state['listing_id']] = state['listing__host_id']
+
+    with transaction.atomic():
+        # Only rows receiving something need to exist; pure subtractions
+        # never create rows (the listing may be going away).
+        needed = [key for key, fields in deltas.items() if any(v > 0 for v in fields.values())]
+        if needed:
+            HostDailyStats.objects.bulk_create([
+                HostDailyStats(host_id=hosts[listing_id], listing_id=listing_id, day=day)
+                for listing_id, day in needed
+            ], ignore_conflicts=True)
+
+        # Runs of nights share the same delta, so group days per update
+        grouped = defaultdict(list)
+        for (listing_id, day), fields in deltas.items():
+            grouped[(listing_id, tuple(sorted(fields.items())))].append(day)
+
+        for (listing_id, fields), days in grouped.items():
+            HostDailyStats.objects.filter(listing_id=listing_id, day__in=days).update(
+                **{field: F(field) + value for field, value in fields}
+            )
+
+
+def rebuild_host_rollups(listings=None, batch_size=1000):
+    """
+    Recompute rollup rows for the given listings (all listings by default).
+    Returns the number of rows written.
+    """
+    from .models import Listing
+
+    if listings is None:
+        listings = Listing.objects.all()
+
+    rows = defaultdict(lambda: defaultdict(int))
+    hosts = {}
+    bookings = Booking.objects.filter(listing__in=listings.values('pk')).values(*ROLLUP_STATE_FIELDS)
+    for state in bookings.iterator(chunk_size=batch_size):
+        hosts[state['listing_id']] = state['listing__host_id']
+        for key, fields in booking_contribution(state).items():
+            for field, value in fields.items():
+                rows[key][field] += value
+
+    with transaction.atomic():
+        HostDailyStats.objects.filter(listing__in=listings.values('pk')).delete()
+        HostDailyStats.objects.bulk_create([
+            HostDailyStats(host_id=hosts[listing_id], listing_id=listing_id, day=day, **fields)
+            for (listing_id, day), fields in rows.items()
+        ], batch_size=batch_size)
+
+    return len(rows)
+
+
+# --- Reading -------------------------------------------------------------
+
+def summarize(rows):
+    """Sum every rollup column over the given rows in one query"""
+    summary = rows.aggregate(**{field: Sum(field) for field in SUM_FIELDS})
+    return {field: value or 0 for field, value in summary.items()}
+
+
+def period_booking_stats(summary, status_filter='all'):
+    """
+    Booking counts, revenue and guests for a period summary, restricted to
+    a single status when status_filter is not 'all'.
+    """
+    def only(status, value):
+        return value if status_filter in ('all', status) else 0
+
+    counts = {
+        status: only(status, summary[field])
+        for status, field in STATUS_COUNT_FIELDS.items()
+    }
+    if status_filter == 'all':
+        total_bookings = summary['bookings_created']
+    else:
+        total_bookings = counts.get(status_filter, 0)
+
+    completed_count = counts['completed']
+    revenue = only('completed', summary['created_revenue'])
+
+    return {
+        'total_bookings': total_bookings,
+        'pending_bookings': counts['pending'],
+        'confirmed_bookings': counts['confirmed'],
+        'completed_bookings': completed_count,
+        'canceled_bookings': counts['canceled'],
+        'filtered_revenue': revenue,
+        'average_booking_value': (revenue / completed_count) if completed_count else 0,
+        'total_guests': (
+            only('confirmed', summary['confirmed_guests']) +
+            only('completed', summary['completed_guests'])
+        ),
+    }
+
+
+def status_breakdown(summary, status_filter='all'):
+    """Bookings per status (with revenue for completed) for chart display"""
+    stats = period_booking_stats(summary, status_filter)
+    result = []
+    for status in STATUS_COUNT_FIELDS:
+        count = stats[f'{status}_bookings']
+        if count > 0:
+            result.append({
+                'status': status,
+                'count': count,
+                'revenue': float(stats['filtered_revenue']) if status == 'completed' else 0.0
+            })
+    return result
+
+
+def booked_nights_field(status_filter='all', prefix=''):
+    """
+    Expression counting occupied nights for the status filter, or None.
+    ``prefix`` allows reaching the rollups through a relation, e.g.
+    'daily_stats__' from Listing.
+    """
+    if status_filter == 'all':
+        return F(f'{prefix}confirmed_nights') + F(f'{prefix}completed_nights')
+    if status_filter in NIGHT_FIELDS:
+        return F(f'{prefix}{NIGHT_FIELDS[status_filter]}')
+    return None
+
+
+def occupancy_by_listing(listings, start_date, end_date, status_filter='all'):
+    """
+    Booked and possible nights per listing for the window [start_date, end_date)
+    in a single grouped query.
+
+    Booked nights are clipped to the window and to the day the listing was
+    created, which is also where its possible nights start. Returns
+    {listing_id: {'possible_nights', 'booked_nights', 'occupancy_rate'}}.
+    """
+    nights = booked_nights_field(status_filter, prefix='daily_stats__')
+    if nights is not None:
+        window = (
+            Q(daily_stats__day__gte=start_date) &
+            Q(daily_stats__day__lt=end_date) &
+            Q(daily_stats__day__gte=TruncDate('created_at'))
+        )
+        occupied_nights = Sum(nights, filter=window)
+    else:
+        occupied_nights = Value(0)
+
+    queryset = listings.annotate(occupied_nights=occupied_nights).values_list(
+        'id', 'created_at', 'occupied_nights'
+    ).order_by()
+
+    occupancy = {}
+    for listing_id, created_at, booked in queryset:
+        listing_start = max(created_at.date() if created_at else start_date, start_date)
+        possible = max(0, (end_date - listing_start).days)
+        booked = (booked or 0) if possible else 0
+        occupancy[listing_id] = {
+            'possible_nights': possible,
+            'booked_nights': booked,
+            'occupancy_rate': round(booked / possible * 100, 1) if possible else 0,
+        }
+    return occupancy
+
+
+def occupancy_totals(occupancy):
+    """Combine occupancy_by_listing results into overall figures"""
+    possible = sum(row['possible_nights'] for row in occupancy.values())
+    booked = sum(row['booked_nights'] for row in occupancy.values())
+    return {
+        'possible_nights': possible,
+        'booked_nights': booked,
+        'occupancy_rate': round(booked / possible * 100, 1) if possible else 0,
+    }
+
+
+def totals_by_listing(rows, status_filter='all'):
+    """Per-listing bookings, completed revenue and occupied nights"""
+    nights = booked_nights_field(status_filter)
+    queryset = rows.values('listing_id').annotate(
+        bookings=Sum('bookings_created'),
+        revenue=Sum('stay_revenue'),
+        nights=Sum(nights) if nights is not None else Value(0),
+    ).order_by()
+    return {
+        row['listing_id']: {
+            'bookings': row['bookings'] or 0,
+            'revenue': row['revenue'] or Decimal('0'),
+            'nights': row['nights'] or 0,
+        }
+        for row in queryset
+    }
+
+
+def revenue_by_month(rows):
+    """{first day of month: (completed revenue, completed stays)} by check-out month"""
+    queryset = rows.annotate(month=TruncMonth('day')).values('month').annotate(
+        revenue=Sum('stay_revenue'),
+        stays=Sum('completed_stays')
+    ).order_by()
+    return {
+        row['month']: (row['revenue'] or 0, row['stays'] or 0)
+        for row in queryset
+    }
+
+
+def monthly_revenue_series(rows, months):
+    """Completed revenue for the last ``months`` months, oldest first"""
+    current_month = timezone.now().date().replace(day=1)
+    first_month = current_month - relativedelta(months=months - 1)
+    by_month = revenue_by_month(rows.filter(
+        day__gte=first_month,
+        day__lt=current_month + relativedelta(months=1)
+    ))
+
+    series = []
+    for i in range(months - 1, -1, -1):
+        month = current_month - relativedelta(months=i)
+        revenue, stays = by_month.get(month, (0, 0))
+        series.append({
+            'month': month.strftime('%Y-%m-01'),
+            'month_name': f"{MONTH_SHORT_NAMES_RU[month.month]} {month.year}",
+            'revenue': float(revenue),
+            'bookings': stays
+        })
+    return series
+
+
+def quarterly_revenue_series(rows, quarters):
+    """Completed revenue for the last ``quarters`` quarters, oldest first"""
+    today = timezone.now().date()
+    current_quarter = date(today.year, ((today.month - 1) // 3) * 3 + 1, 1)
+    first_quarter = current_quarter - relativedelta(months=(quarters - 1) * 3)
+    by_month = revenue_by_month(rows.filter(
+        day__gte=first_quarter,
+        day__lt=current_quarter + relativedelta(months=3)
+    ))
+
+    series = []
+    for i in range(quarters - 1, -1, -1):
+        quarter_start = current_quarter - relativedelta(months=i * 3)
+        revenue, stays = 0, 0
+        for offset in range(3):
+            month_revenue, month_stays = by_month.get(quarter_start + relativedelta(months=offset), (0, 0))
+            revenue += month_revenue
+            stays += month_stays
+
+        quarter_num = ((quarter_start.month - 1) // 3) + 1
+        series.append({
+            'quarter': f"{quarter_start.year}-Q{quarter_num}",
+            'quarter_name': f"Q{quarter_num} {quarter_start.year}",
+            'revenue': float(revenue),
+            'bookings': stays
+        })
+    return series
+
+
+def seasonal_revenue_series(rows):
+    """Completed revenue per calendar month (January..December)"""
+    queryset = rows.annotate(month=ExtractMonth('day')).values('month').annotate(
+        revenue=Sum('stay_revenue'),
+        stays=Sum('completed_stays')
+    ).order_by()
+    by_month = {row['month']: row for row in queryset}
+
+    series = []
+    for month in range(1, 13):
+        row = by_month.get(month, {})
+        revenue = float(row.get('revenue') or 0)
+        stays = row.get('stays') or 0
+        series.append({
+            'month': month,
+            'month_name': MONTH_NAMES_RU[month],
+            'total_revenue': revenue,
+            'bookings': stays,
+            'avg_revenue': revenue / stays if stays else 0.0
+        })
+    return series
+
+
+def listing_month_totals(rows, nights_from, nights_until):
+    """
+    Per-month nights, completed revenue and created bookings for one
+    listing's rows. Nights are only counted in [nights_from, nights_until).
+    """
+    queryset = rows.annotate(month=TruncMonth('day')).values('month').annotate(
+        nights=Sum(booked_nights_field(), filter=Q(day__gte=nights_from, day__lt=nights_until)),
+        revenue=Sum('stay_revenue'),
+        bookings=Sum('bookings_created')
+    ).order_by()
+    return {
+        row['month']: {
+            'nights': row['nights'] or 0,
+            'revenue': row['revenue'] or 0,
+            'bookings': row['bookings'] or 0,
+        }
+        for row in queryset
+    }
@@ -0,0 +1,160 @@
+"""
+Availability index for listings.
+
+Every pending/confirmed booking is materialized as one BookedNight row per
+occupied date (check-in through check-out, inclusive - the same dates
+Listing.get_unavailable_dates reports). Date-range search then becomes a
+lookup on the (night, listing) index instead of an overlap scan over the
+bookings table.
+
+The index is maintained incrementally from Booking signals (see
+listings/signals.py) and can be rebuilt with the
+``rebuild_availability_index`` management command.
+
+Calendars use ``booked_intervals`` instead, which returns merged date ranges
+for a bounded window rather than every booked date of the listing's history.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max
+
+from .models import Booking, BookedNight
+
+# Booking statuses that make a date unavailable for other guests
+BLOCKING_STATUSES = ('confirmed', 'pending')
+
+# Calendar window served when the client does not ask for one, and the
+# longest window a client may ask for
+CALENDAR_WINDOW_DAYS = 365
+MAX_CALENDAR_WINDOW_DAYS = 731
+
+
+def booking_nights(booking):
+    """Return the set of dates blocked by a booking"""
+    if booking.status not in BLOCKING_STATUSES:
+        return set()
+    if not booking.start_date or not booking.end_date:
+        return set()
+
+    days = (booking.end_date - booking.start_date).days
+    return {booking.start_date + timedelta(days=i) for i in range(days + 1)}
+
+
+def sync_booking_nights(booking):
+    """
+    Bring the booked nights of a single booking in line with its current
+    dates and status, touching only the rows that actually changed.
+    """
+    wanted = booking_nights(booking)
+
+    with transaction.atomic():
+        existing = set(
+            BookedNight.objects.filter(booking=booking).values_list('night', flat=True)
+        )
+
+        stale = existing - wanted
+        if stale:
+            BookedNight.objects.filter(booking=booking, night__in=stale).delete()
+
+        missing = wanted - existing
+        if missing:
+            BookedNight.objects.bulk_create([
+                BookedNight(listing_id=booking.listing_id, booking=booking, night=night)
+                for night in sorted(missing)
+            ])
+
+
+def rebuild_availability_index(bookings=None, batch_size=1000):
+    """
+    Rebuild booked nights for the given bookings (all bookings by default).
+
+    Used for backfilling and after bulk ``QuerySet.update()`` calls, which
+    bypass model signals. Returns the number of rows written.
+    """
+    if bookings is None:
+        bookings = Booking.objects.all()
+
+    created = 0
+    with transaction.atomic():
+        BookedNight.objects.filter(booking__in=bookings.values('pk')).delete()
+
+        rows = []
+        blocking = bookings.filter(status__in=BLOCKING_STATUSES).only(
+            'id', 'listing_id', 'start_date', 'end_date', 'status'
+        )
+        for booking in blocking.iterator(chunk_size=batch_size):
+            for night in sorted(booking_nights(booking)):
+                rows.append(BookedNight(listing_id=booking.listing_id, booking_id=booking.id, night=night))
+
+            if len(rows) >= batch_size:
+                BookedNight.objects.bulk_create(rows, batch_size=batch_size)
+                created += len(rows)
+                rows = []
+
+        if rows:
+            BookedNight.objects.bulk_create(rows, batch_size=batch_size)
+            created += len(rows)
+
+    return created
+
+
+def booked_listing_ids(check_in, check_out):
+    """
+    Subquery of listing ids that have at least one booked night between
+    check_in and check_out (inclusive).
+    """
+    return BookedNight.objects.filter(
+        night__gte=check_in,
+        night__lte=check_out
+    ).values('listing_id')
+
+
+def available_listings(queryset, check_in, check_out):
+    """Restrict a Listing queryset to listings free for the given dates"""
+    return queryset.exclude(id__in=booked_listing_ids(check_in, check_out))
+
+
+def booked_intervals(listing_id, start, end):
+    """
+    Booked date ranges of a listing within [start, end] as a sorted list of
+    (first_date, last_date) pairs. Both ends are inclusive, overlapping or
+    adjacent bookings are merged and ranges are clipped to the window.
+    """
+    bookings = Booking.objects.filter(
+        listing_id=listing_id,
+        status__in=BLOCKING_STATUSES,
+        start_date__lte=end,
+        end_date__gte=start
+    ).order_by('start_date').values_list('start_date', 'end_date')
+
+    intervals = []
+    for first, last in bookings:
+        first, last = max(first, start), min(last, end)
+        if intervals and first <= intervals[-1][1] + timedelta(days=1):
+            intervals[-1][1] = max(intervals[-1][1], last)
+        else:
+            intervals.append([first, last])
+
+    return [(first, last) for first, last in intervals]
+
+
+def expand_intervals(intervals):
+    """List of ISO dates covered by booked_intervals() ranges"""
+    return [
+        (first + timedelta(days=i)).isoformat()
+        for first, last in intervals
+        for i in range((last - first).days + 1)
+    ]
+
+
+def calendar_version(listing_id):
+    """
+    Latest booking change of a listing and its booking count. Together they
+    change whenever the listing's calendar may have: edits bump updated_at,
+    new and deleted bookings change the count.
+    """
+    return Booking.objects.filter(listing_id=listing_id).aggregate(
+        last_modified=Max('updated_at'),
+        bookings=Count('id')
+    )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from listings.availability import rebuild_availability_index
+from listings.models import Booking
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the booked-nights availability index from bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--listing',
+            type=int,
+            help='Only rebuild nights for bookings of this listing ID'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows to insert per batch'
+        )
+
+    def handle(self, *args, **options):
+        bookings = Booking.objects.all()
+        if options['listing']:
+            bookings = bookings.filter(listing_id=options['listing'])
+
+        self.stdout.write('Rebuilding availability index...')
+        created = rebuild_availability_index(bookings, batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Availability index rebuilt: {created} booked nights')
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from listings.analytics import rebuild_host_rollups
+from listings.models import Listing
+
+
+class Command(BaseCommand):
+    help = 'Recompute host dashboard daily rollups from bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--host',
+            type=int,
+            help='Only rebuild rollups for listings of this host ID'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows to insert per query (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        listings = Listing.objects.all()
+        if options['host']:
+            listings = listings.filter(host_id=options['host'])
+
+        self.stdout.write('Rebuilding host rollups...')
+        created = rebuild_host_rollups(listings, batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Host rollups rebuilt: {created} daily rows')
+        )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from listings.models import Listing
+from listings.ratings import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Recompute stored rating aggregates on listings from approved reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--listing',
+            type=int,
+            help='Only rebuild aggregates for this listing ID'
+        )
+
+    def handle(self, *args, **options):
+        listings = Listing.objects.all()
+        if options['listing']:
+            listings = listings.filter(pk=options['listing'])
+
+        self.stdout.write('Rebuilding rating aggregates...')
+        updated = rebuild_rating_aggregates(listings)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rating aggregates rebuilt for {updated} listings')
+        )
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:00
+
+import django.db.models.deletion
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def backfill_booked_nights(apps, schema_editor):
+    Booking = apps.get_model('listings', 'Booking')
+    BookedNight = apps.get_model('listings', 'BookedNight')
+
+    rows = []
+    bookings = Booking.objects.filter(status__in=['confirmed', 'pending'])
+    for booking in bookings.iterator():
+        days = (booking.end_date - booking.start_date).days
+        for i in range(days + 1):
+            rows.append(BookedNight(
+                listing_id=booking.listing_id,
+                booking_id=booking.id,
+                night=booking.start_date + timedelta(days=i)
+            ))
+    BookedNight.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0009_hostreview'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookedNight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('night', models.DateField(verbose_name='Night')),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booked_nights', to='listings.booking')),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booked_nights', to='listings.listing')),
+            ],
+            options={
+                'verbose_name': 'Booked Night',
+                'verbose_name_plural': 'Booked Nights',
+                'indexes': [models.Index(fields=['listing', 'night'], name='listings_bn_listing_night'), models.Index(fields=['night', 'listing'], name='listings_bn_night_listing')],
+                'constraints': [models.UniqueConstraint(fields=('booking', 'night'), name='unique_booking_night')],
+            },
+        ),
+        migrations.RunPython(backfill_booked_nights, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Listing = apps.get_model('listings', 'Listing')
+    Review = apps.get_model('listings', 'Review')
+
+    totals = Review.objects.filter(is_approved=True).values('listing_id').annotate(
+        total=models.Sum('rating'),
+        count=models.Count('id')
+    )
+    for row in totals:
+        Listing.objects.filter(pk=row['listing_id']).update(
+            rating_sum=row['total'],
+            rating_count=row['count'],
+            avg_rating=row['total'] / row['count']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0010_bookednight'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='avg_rating',
+            field=models.FloatField(default=0, editable=False, verbose_name='Average rating'),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Rating count'),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Rating sum'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['-avg_rating', '-rating_count'], name='listings_rating_idx'),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
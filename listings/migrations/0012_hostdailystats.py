@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0011_listing_rating_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HostDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Day')),
+                ('bookings_created', models.IntegerField(default=0, verbose_name='Bookings created')),
+                ('pending_bookings', models.IntegerField(default=0, verbose_name='Pending bookings')),
+                ('confirmed_bookings', models.IntegerField(default=0, verbose_name='Confirmed bookings')),
+                ('completed_bookings', models.IntegerField(default=0, verbose_name='Completed bookings')),
+                ('canceled_bookings', models.IntegerField(default=0, verbose_name='Canceled bookings')),
+                ('created_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Revenue of completed bookings created')),
+                ('confirmed_guests', models.IntegerField(default=0, verbose_name='Guests of confirmed bookings')),
+                ('completed_guests', models.IntegerField(default=0, verbose_name='Guests of completed bookings')),
+                ('completed_stays', models.IntegerField(default=0, verbose_name='Completed stays')),
+                ('stay_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Revenue of completed stays')),
+                ('confirmed_nights', models.IntegerField(default=0, verbose_name='Confirmed nights')),
+                ('completed_nights', models.IntegerField(default=0, verbose_name='Completed nights')),
+                ('host', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='listings.listing')),
+            ],
+            options={
+                'verbose_name': 'Host Daily Stats',
+                'verbose_name_plural': 'Host Daily Stats',
+                'ordering': ['day'],
+                'indexes': [models.Index(fields=['host', 'day'], name='listings_hds_host_day')],
+                'constraints': [models.UniqueConstraint(fields=('listing', 'day'), name='unique_listing_daily_stats')],
+            },
+        ),
+    ]
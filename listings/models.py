@@ -6,6 +6,25 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 import uuid
 from datetime import date
 
+def main_image_prefetch(lookup='images'):
+    """
+    Prefetch the image Listing.main_image_url resolves to (the main image,
+    otherwise the latest upload) for every listing in one query. ``lookup``
+    may go through a relation, e.g. 'listing__images' from Booking.
+    """
+    return models.Prefetch(
+        lookup,
+        queryset=ListingImage.objects.order_by('-is_main', '-uploaded_at')[:1],
+        to_attr='prefetched_main_images'
+    )
+
+
+class ListingQuerySet(models.QuerySet):
+    def with_main_image(self):
+        """Resolve main_image_url for the whole queryset in one extra query"""
+        return self.prefetch_related(main_image_prefetch())
+
+
 class Listing(models.Model):
     """
     Property listing model
@@ -58,6 +77,11 @@ class Listing(models.Model):
     is_active = models.BooleanField(_("Is active"), default=True)
     is_approved = models.BooleanField(_("Is approved"), default=False)
     
+    # Rating aggregates over approved reviews, maintained by listings.ratings
+    rating_sum = models.PositiveIntegerField(_("Rating sum"), default=0, editable=False)
+    rating_count = models.PositiveIntegerField(_("Rating count"), default=0, editable=False)
+    avg_rating = models.FloatField(_("Average rating"), default=0, editable=False)
+    
     # Relationships
     host = models.ForeignKey(
         settings.AUTH_USER_MODEL, 
@@ -68,12 +92,17 @@ class Listing(models.Model):
     # Timestamps
     created_at = models.DateTimeField(_("Created at"), auto_now_add=True)
     updated_at = models.DateTimeField(_("Updated at"), auto_now=True)
+
+    objects = ListingQuerySet.as_manager()
     
     class Meta:
         verbose_name = _("Listing")
         verbose_name_plural = _("Listings")
         ordering = ['-created_at', '-id']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-avg_rating', '-rating_count'], name='listings_rating_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -84,14 +113,15 @@ class Listing(models.Model):
     @property
     def main_image_url(self):
         """Return the main image URL or a placeholder"""
-        main_image = self.images.filter(is_main=True).first()
+        # Images are ordered main first, so the first one is the main image
+        # or, if none is marked, the latest upload
+        if hasattr(self, 'prefetched_main_images'):
+            images = self.prefetched_main_images
+            main_image = images[0] if images else None
+        else:
+            main_image = self.images.first()
         if main_image:
             return main_image.image.url
-        
-        # Fallback to first image if no main image set
-        first_image = self.images.first()
-        if first_image:
-            return first_image.image.url
             
         # Fallback to old image_urls for backward compatibility
         if self.image_urls and len(self.image_urls) > 0:
@@ -101,16 +131,20 @@ class Listing(models.Model):
     
     @property
     def average_rating(self):
-        """Calculate the average rating for this listing"""
-        reviews = self.reviews.all()
-        if not reviews:
+        """Average rating of approved reviews (stored aggregate)"""
+        if not self.rating_count:
             return None
-        return sum(review.rating for review in reviews) / len(reviews)
+        return self.avg_rating
     
     @property
     def total_reviews(self):
-        """Count the total number of reviews"""
-        return self.reviews.count()
+        """Number of approved reviews (stored aggregate)"""
+        return self.rating_count
+    
+    @property
+    def review_count(self):
+        """Alias of total_reviews used by listing card templates"""
+        return self.rating_count
     
     def is_available(self, start_date, end_date):
         """Check if listing is available for given dates"""
@@ -255,6 +289,98 @@ class Booking(models.Model):
             return True
         return False
 
+class BookedNight(models.Model):
+    """
+    One occupied date of a blocking (pending/confirmed) booking.
+
+    Materialized from Booking by listings.availability so that date-range
+    searches can use the (listing, night) index instead of scanning bookings.
+    """
+    listing = models.ForeignKey(
+        Listing,
+        on_delete=models.CASCADE,
+        related_name='booked_nights'
+    )
+    booking = models.ForeignKey(
+        Booking,
+        on_delete=models.CASCADE,
+        related_name='booked_nights'
+    )
+    night = models.DateField(_("Night"))
+
+    class Meta:
+        verbose_name = _("Booked Night")
+        verbose_name_plural = _("Booked Nights")
+        indexes = [
+            models.Index(fields=['listing', 'night'], name='listings_bn_listing_night'),
+            models.Index(fields=['night', 'listing'], name='listings_bn_night_listing'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['booking', 'night'],
+                name='unique_booking_night'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.night} - listing {self.listing_id}"
+
+class HostDailyStats(models.Model):
+    """
+    Per-host, per-listing daily rollup of booking activity for the host dashboard.
+
+    Maintained incrementally by listings.analytics from Booking signals.
+    Booking counts, guests and created_revenue are keyed by the day the
+    booking was created; completed stays and stay_revenue by check-out day;
+    *_nights by each occupied night.
+    """
+    host = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='daily_stats'
+    )
+    listing = models.ForeignKey(
+        Listing,
+        on_delete=models.CASCADE,
+        related_name='daily_stats'
+    )
+    day = models.DateField(_("Day"))
+
+    # Bookings created on this day, by current status
+    bookings_created = models.IntegerField(_("Bookings created"), default=0)
+    pending_bookings = models.IntegerField(_("Pending bookings"), default=0)
+    confirmed_bookings = models.IntegerField(_("Confirmed bookings"), default=0)
+    completed_bookings = models.IntegerField(_("Completed bookings"), default=0)
+    canceled_bookings = models.IntegerField(_("Canceled bookings"), default=0)
+    created_revenue = models.DecimalField(_("Revenue of completed bookings created"), max_digits=12, decimal_places=2, default=0)
+    confirmed_guests = models.IntegerField(_("Guests of confirmed bookings"), default=0)
+    completed_guests = models.IntegerField(_("Guests of completed bookings"), default=0)
+
+    # Completed stays checking out on this day
+    completed_stays = models.IntegerField(_("Completed stays"), default=0)
+    stay_revenue = models.DecimalField(_("Revenue of completed stays"), max_digits=12, decimal_places=2, default=0)
+
+    # Nights occupied on this day
+    confirmed_nights = models.IntegerField(_("Confirmed nights"), default=0)
+    completed_nights = models.IntegerField(_("Completed nights"), default=0)
+
+    class Meta:
+        verbose_name = _("Host Daily Stats")
+        verbose_name_plural = _("Host Daily Stats")
+        ordering = ['day']
+        indexes = [
+            models.Index(fields=['host', 'day'], name='listings_hds_host_day'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['listing', 'day'],
+                name='unique_listing_daily_stats'
+            )
+        ]
+
+    def __str__(self):
+        return f"Stats for listing {self.listing_id} on {self.day}"
+
 class Review(models.Model):
     """
     Review model for listing reviews
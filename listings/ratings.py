@@ -0,0 +1,71 @@
+"""
+Denormalized rating aggregates for listings.
+
+Listing.rating_sum / rating_count / avg_rating hold the totals over the
+listing's approved reviews. They are adjusted incrementally from Review
+signals (see listings/signals.py) inside the same transaction as the review
+write, and can be rebuilt in bulk with the ``rebuild_rating_aggregates``
+management command.
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+from .models import Listing, Review
+
+RATING_FIELDS = ('rating_sum', 'rating_count', 'avg_rating')
+
+
+def average_rating_expression():
+    """SQL expression deriving avg_rating from the stored sum and count"""
+    return Case(
+        When(rating_count__gt=0, then=Cast('rating_sum', FloatField()) / F('rating_count')),
+        default=Value(0.0),
+        output_field=FloatField()
+    )
+
+
+def review_contribution(rating, is_approved):
+    """Return the (sum, count) a review adds to its listing's aggregates"""
+    if is_approved and rating:
+        return rating, 1
+    return 0, 0
+
+
+def apply_rating_delta(listing_id, sum_delta, count_delta):
+    """Shift a listing's stored aggregates by the given deltas"""
+    if not sum_delta and not count_delta:
+        return
+
+    with transaction.atomic():
+        listing = Listing.objects.filter(pk=listing_id)
+        listing.update(
+            rating_sum=F('rating_sum') + sum_delta,
+            rating_count=F('rating_count') + count_delta
+        )
+        listing.update(avg_rating=average_rating_expression())
+
+
+def rebuild_rating_aggregates(listings=None):
+    """
+    Recompute the aggregates from approved reviews with two UPDATE statements.
+
+    Used for backfilling and after bulk ``QuerySet.update()`` calls on
+    reviews, which bypass model signals. Returns the number of listings updated.
+    """
+    if listings is None:
+        listings = Listing.objects.all()
+
+    approved = Review.objects.filter(
+        listing=OuterRef('pk'),
+        is_approved=True
+    ).order_by().values('listing')
+
+    with transaction.atomic():
+        updated = listings.update(
+            rating_sum=Coalesce(Subquery(approved.annotate(total=Sum('rating')).values('total')), 0),
+            rating_count=Coalesce(Subquery(approved.annotate(total=Count('id')).values('total')), 0)
+        )
+        listings.update(avg_rating=average_rating_expression())
+
+    return updated
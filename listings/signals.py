@@ -5,7 +5,8 @@ This module contains signal handlers for listings-related events,
 such as handling booking updates, review notifications, etc.
 """
 
-from django.db.models.signals import post_save, pre_save
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 
@@ -44,6 +45,82 @@ if LISTING_MODELS_AVAILABLE:
 
             # You could implement notification logic, rating updates, etc. here
 
+    @receiver(pre_save, sender=Review)
+    def store_review_original_rating(sender, instance, **kwargs):
+        """Remember what the review contributed to rating aggregates before save"""
+        instance._original_rating_state = None
+        if instance.pk:
+            instance._original_rating_state = Review.objects.filter(pk=instance.pk).values_list(
+                'listing_id', 'rating', 'is_approved'
+            ).first()
+
+    @receiver(post_save, sender=Review)
+    def update_listing_rating_on_save(sender, instance, created, **kwargs):
+        """Apply a created, edited or (un)approved review to listing aggregates"""
+        from .ratings import apply_rating_delta, review_contribution
+
+        new_sum, new_count = review_contribution(instance.rating, instance.is_approved)
+        original = getattr(instance, '_original_rating_state', None)
+
+        with transaction.atomic():
+            if original and original[0] != instance.listing_id:
+                # Review moved to another listing
+                old_sum, old_count = review_contribution(original[1], original[2])
+                apply_rating_delta(original[0], -old_sum, -old_count)
+                apply_rating_delta(instance.listing_id, new_sum, new_count)
+            else:
+                old_sum, old_count = review_contribution(original[1], original[2]) if original else (0, 0)
+                apply_rating_delta(instance.listing_id, new_sum - old_sum, new_count - old_count)
+
+    @receiver(post_delete, sender=Review)
+    def update_listing_rating_on_delete(sender, instance, **kwargs):
+        """Remove a deleted review from listing aggregates"""
+        from .ratings import apply_rating_delta, review_contribution
+
+        old_sum, old_count = review_contribution(instance.rating, instance.is_approved)
+        apply_rating_delta(instance.listing_id, -old_sum, -old_count)
+
+    @receiver(post_save, sender=Booking)
+    def update_availability_index(sender, instance, created, update_fields=None, **kwargs):
+        """
+        Keep the booked-nights availability index in sync with the booking.
+        Deleted bookings drop their nights through the CASCADE foreign key.
+        """
+        if update_fields is not None and not {'status', 'start_date', 'end_date'} & set(update_fields):
+            return
+
+        from .availability import sync_booking_nights
+        sync_booking_nights(instance)
+
+    @receiver(pre_save, sender=Booking)
+    def store_booking_original_rollup_state(sender, instance, update_fields=None, **kwargs):
+        """Remember what the booking contributed to host rollups before save"""
+        from .analytics import ROLLUP_FIELDS, stored_rollup_state
+
+        if update_fields is not None and not ROLLUP_FIELDS & set(update_fields):
+            return
+        instance._original_rollup_state = stored_rollup_state(instance.pk) if instance.pk else None
+
+    @receiver(post_save, sender=Booking)
+    def update_host_rollups_on_save(sender, instance, created, update_fields=None, **kwargs):
+        """Move host analytics rollups from the booking's old state to the new one"""
+        from .analytics import ROLLUP_FIELDS, apply_rollup_change, booking_rollup_state
+
+        if update_fields is not None and not ROLLUP_FIELDS & set(update_fields):
+            return
+
+        apply_rollup_change(
+            getattr(instance, '_original_rollup_state', None),
+            booking_rollup_state(instance)
+        )
+
+    @receiver(post_delete, sender=Booking)
+    def update_host_rollups_on_delete(sender, instance, **kwargs):
+        """Remove a deleted booking from host analytics rollups"""
+        from .analytics import apply_rollup_change, booking_rollup_state
+
+        apply_rollup_change(booking_rollup_state(instance, with_host=False), None)
+
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from .models import Listing
@@ -5,20 +5,35 @@ from django.contrib import messages
 from django.db.models import Q, Avg, Count, Sum, F, Case, When, IntegerField, DecimalField
 from django.db.models.functions import TruncMonth, TruncWeek, TruncDay
 from django.db import models
-from django.http import JsonResponse, Http404, HttpResponse
+from django.http import JsonResponse, Http404, HttpResponse, FileResponse
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.views.decorators.http import condition
 from datetime import datetime, timedelta, date
 from django.utils import timezone
 import json
 import calendar
+import hashlib
+import tempfile
+from itertools import chain, islice
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment, PatternFill
 from openpyxl.utils import get_column_letter
 
-from .models import Listing, Booking, Review, ListingImage
+from .models import Listing, Booking, Review, ListingImage, HostDailyStats, main_image_prefetch
+from .analytics import (
+    MONTH_SHORT_NAMES_RU, booked_nights_field, listing_month_totals, monthly_revenue_series,
+    occupancy_by_listing, occupancy_totals, period_booking_stats, quarterly_revenue_series, seasonal_revenue_series, status_breakdown,
+    summarize, totals_by_listing,
+)
+from .availability import (
+    CALENDAR_WINDOW_DAYS, MAX_CALENDAR_WINDOW_DAYS, available_listings, booked_intervals,
+    calendar_version, expand_intervals,
+)
 from .forms import ListingForm, BookingForm, ReviewForm, ListingSearchForm, ListingImageForm
 from notifications.tasks import send_email_notification
+from utils.price_calculator import quote_many
 from subscriptions.services import SubscriptionService
 
 class ListingListView(ListView):
@@ -29,7 +44,7 @@ class ListingListView(ListView):
     paginate_by = 12
 
     def get_queryset(self):
-        queryset = Listing.objects.filter(
+        queryset = Listing.objects.with_main_image().filter(
             is_active=True, 
             is_approved=True
         ).filter(
@@ -52,14 +67,8 @@ class ListingListView(ListView):
             check_in = form.cleaned_data.get('check_in')
             check_out = form.cleaned_data.get('check_out')
             if check_in and check_out:
-                # Get all bookings that overlap with requested dates
-                overlapping_bookings = Booking.objects.filter(
-                    Q(start_date__lte=check_out, end_date__gte=check_in),
-                    status__in=['confirmed', 'pending']
-                ).values_list('listing_id', flat=True)
-
-                # Exclude listings with overlapping bookings
-                queryset = queryset.exclude(id__in=overlapping_bookings)
+                # Exclude listings with booked nights in the requested range
+                queryset = available_listings(queryset, check_in, check_out)
 
             # Guest capacity
             guests = form.cleaned_data.get('guests')
@@ -90,12 +99,6 @@ class ListingListView(ListView):
             if bathrooms:
                 queryset = queryset.filter(bathrooms__gte=bathrooms)
 
-        # Annotate with average rating
-        queryset = queryset.annotate(
-            avg_rating=Avg('reviews__rating'),
-            review_count=Count('reviews')
-        )
-
         # Handle sorting
         sort_by = self.request.GET.get('sort')
         if sort_by == 'price_asc':
@@ -103,7 +106,7 @@ class ListingListView(ListView):
         elif sort_by == 'price_desc':
             queryset = queryset.order_by('-price_per_night')
         elif sort_by == 'rating':
-            queryset = queryset.order_by('-avg_rating', '-review_count')
+            queryset = queryset.order_by('-avg_rating', '-rating_count')
         elif sort_by == 'newest':
             queryset = queryset.order_by('-created_at')
         else:
@@ -115,7 +118,16 @@ class ListingListView(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Add search form to context
-        context['form'] = ListingSearchForm(self.request.GET)
+        form = ListingSearchForm(self.request.GET)
+        context['form'] = form
+
+        # Price the requested stay for every listing on the page
+        if form.is_valid():
+            check_in = form.cleaned_data.get('check_in')
+            check_out = form.cleaned_data.get('check_out')
+            if check_in and check_out and check_out > check_in:
+                for listing in context['listings']:
+                    listing.stay_quote = quote_many(listing, [(check_in, check_out)])[0]
 
         # Add popular destinations based on bookings in last month
         context['popular_destinations'] = self.get_popular_destinations()
@@ -245,8 +257,11 @@ class ListingDetailView(DetailView):
                 ).first()
                 context['booking_for_review'] = completed_booking
 
-        # Unavailable dates for calendar
-        unavailable_dates = listing.get_unavailable_dates()
+        # Unavailable dates for calendar - only the bookable window, past dates can't be picked anyway
+        today = timezone.now().date()
+        unavailable_dates = expand_intervals(booked_intervals(
+            listing.pk, today, today + timedelta(days=CALENDAR_WINDOW_DAYS)
+        ))
         context['unavailable_dates_json'] = json.dumps(unavailable_dates)
         context['unavailable_dates'] = unavailable_dates
 
@@ -266,7 +281,7 @@ class ListingDetailView(DetailView):
         price_max = listing.price_per_night * Decimal('1.4')
 
         # Get similar listings with scoring system
-        similar = Listing.objects.filter(
+        similar = Listing.objects.with_main_image().filter(
             is_active=True,
             is_approved=True,
             approval_record__status='approved'
@@ -303,9 +318,7 @@ class ListingDetailView(DetailView):
                 ),
                 default=0,
                 output_field=IntegerField()
-            ),
-            avg_rating=Avg('reviews__rating'),
-            review_count=Count('reviews')
+            )
         ).filter(
             # At least some similarity (same city, state, or country + similar accommodates/price)
             Q(city__iexact=listing.city) |
@@ -377,239 +390,65 @@ class HostDashboardView(LoginRequiredMixin, TemplateView):
         else:
             filtered_listings = host_listings
 
-        # Get host's bookings with filters
-        host_bookings = Booking.objects.filter(
-            listing__host=user,
-            created_at__date__gte=start_date,
-            created_at__date__lte=end_date
-        )
+        from decimal import Decimal
+        from dateutil.relativedelta import relativedelta
 
-        # Apply listing filter to bookings
-        if listing_filter != 'all' and listing_filter.isdigit():
-            host_bookings = host_bookings.filter(listing_id=listing_filter)
+        # Booking analytics are read from the daily rollups maintained by
+        # listings.analytics rather than scanned from bookings per request
+        host_rollups = HostDailyStats.objects.filter(host=user)
 
-        # Apply status filter
-        if status_filter != 'all':
-            host_bookings = host_bookings.filter(status=status_filter)
+        period_rollups = host_rollups.filter(day__gte=start_date, day__lte=end_date)
+        if listing_filter != 'all' and listing_filter.isdigit():
+            period_rollups = period_rollups.filter(listing_id=listing_filter)
+        period_summary = summarize(period_rollups)
 
-        # Calculate comprehensive statistics with filtered data
         all_bookings = Booking.objects.filter(listing__host=user)
-        
-        # Use filtered bookings for period-specific metrics
-        period_bookings = host_bookings
-        
+
         stats = {
             'total_listings': host_listings.count(),
             'active_listings': host_listings.filter(is_active=True).count(),
             'pending_listings': host_listings.filter(is_approved=False).count(),
-            'total_bookings': period_bookings.count(),
-            'pending_bookings': period_bookings.filter(status='pending').count(),
-            'confirmed_bookings': period_bookings.filter(status='confirmed').count(),
-            'completed_bookings': period_bookings.filter(status='completed').count(),
-            'canceled_bookings': period_bookings.filter(status='canceled').count(),
-            'total_revenue': all_bookings.filter(status='completed').aggregate(
-                total=Sum('total_price')
-            )['total'] or 0,
-            'filtered_revenue': period_bookings.filter(status='completed').aggregate(
-                total=Sum('total_price')
-            )['total'] or 0,
-            'average_booking_value': period_bookings.filter(status='completed').aggregate(
-                avg=Avg('total_price')
-            )['avg'] or 0,
-            'total_guests': period_bookings.filter(status__in=['completed', 'confirmed']).aggregate(
-                total=Sum('guests')
-            )['total'] or 0,
+            'total_revenue': host_rollups.aggregate(total=Sum('stay_revenue'))['total'] or 0,
         }
+        stats.update(period_booking_stats(period_summary, status_filter))
 
-        # Calculate occupancy rate properly for filtered period
-        total_possible_nights = 0
-        total_booked_nights = 0
-
-        # Apply listing filter if specified
+        # Occupancy for the filtered period, in a single grouped query
         if listing_filter != 'all' and listing_filter.isdigit():
             active_listings = host_listings.filter(id=listing_filter, is_active=True, is_approved=True)
         else:
             active_listings = host_listings.filter(is_active=True, is_approved=True)
 
-        for listing in active_listings:
-            # Calculate available days since listing creation or start_date, whichever is later
-            listing_created = listing.created_at.date() if listing.created_at else start_date
-            listing_start = max(listing_created, start_date)
-            listing_end = min(timezone.now().date(), end_date)
-
-            # Only calculate if we have a valid period
-            if listing_end > listing_start:
-                days_available = (listing_end - listing_start).days
-                if days_available > 0:
-                    total_possible_nights += days_available
-
-                    # Get bookings for this listing in the time period with status filter
-                    listing_bookings = listing.bookings.filter(
-                        status__in=['completed', 'confirmed'],
-                        start_date__lt=listing_end,
-                        end_date__gt=listing_start
-                    )
-                    
-                    # Apply status filter if specified
-                    if status_filter != 'all':
-                        listing_bookings = listing_bookings.filter(status=status_filter)
-
-                    for booking in listing_bookings:
-                        # Calculate overlap between booking and our period
-                        booking_start = max(booking.start_date, listing_start)
-                        booking_end = min(booking.end_date, listing_end)
-
-                        # Only count if there's actual overlap
-                        if booking_end > booking_start:
-                            nights = (booking_end - booking_start).days
-                            if nights > 0:
-                                total_booked_nights += nights
-
-        # Calculate occupancy rate as percentage
-        if total_possible_nights > 0:
-            occupancy_percentage = (total_booked_nights / total_possible_nights) * 100
-            stats['occupancy_rate'] = round(occupancy_percentage, 1)
-        else:
-            stats['occupancy_rate'] = 0
-
-        stats['total_booked_nights'] = total_booked_nights
-        stats['total_possible_nights'] = total_possible_nights
-
-        # Revenue by month (last 12 months)
-        from dateutil.relativedelta import relativedelta
-        import calendar
-
-        # Generate last 12 months data
-        monthly_revenue = []
-        current_date = timezone.now().date()
-
-        month_names_ru = {
-            1: 'Янв', 2: 'Фев', 3: 'Мар', 4: 'Апр', 5: 'Май', 6: 'Июн',
-            7: 'Июл', 8: 'Авг', 9: 'Сен', 10: 'Окт', 11: 'Ноя', 12: 'Дек'
-        }
-
-        for i in range(11, -1, -1):  # Go from 11 months ago to current month
-            target_date = current_date.replace(day=1) - relativedelta(months=i)
-            month_end = target_date + relativedelta(months=1)
-
-            # Use end_date for completed bookings (when they actually finished)
-            month_revenue = all_bookings.filter(
-                status='completed',
-                end_date__gte=target_date,
-                end_date__lt=month_end
-            ).aggregate(
-                total_revenue=Sum('total_price'),
-                total_bookings=Count('id')
-            )
-
-            month_name = f"{month_names_ru[target_date.month]} {target_date.year}"
-
-            monthly_revenue.append({
-                'month': target_date.strftime('%Y-%m-01'),
-                'month_name': month_name,
-                'revenue': float(month_revenue['total_revenue'] or 0),
-                'bookings': month_revenue['total_bookings'] or 0
-            })
-
-        # Quarterly revenue (last 8 quarters)
-        quarterly_revenue = []
-        # Start from current quarter and go back 8 quarters
-        today = timezone.now().date()
-        current_quarter_start = date(today.year, ((today.month - 1) // 3) * 3 + 1, 1)
-        
-        for i in range(7, -1, -1):  # Last 8 quarters
-            quarter_start = current_quarter_start - relativedelta(months=i*3)
-            quarter_end = quarter_start + relativedelta(months=3)
-
-            quarter_revenue = all_bookings.filter(
-                status='completed',
-                end_date__gte=quarter_start,
-                end_date__lt=quarter_end
-            ).aggregate(
-                total_revenue=Sum('total_price'),
-                total_bookings=Count('id')
-            )
-
-            quarter_num = ((quarter_start.month - 1) // 3) + 1
-            quarterly_revenue.append({
-                'quarter': f"{quarter_start.year}-Q{quarter_num}",
-                'quarter_name': f"Q{quarter_num} {quarter_start.year}",
-                'revenue': float(quarter_revenue['total_revenue'] or 0),
-                'bookings': quarter_revenue['total_bookings'] or 0
-            })
-
-        # Seasonal revenue analysis (by month across all years)
-        seasonal_data = {}
-        month_names_ru = [
-            '', 'Январь', 'Февраль', 'Март', 'Апрель', 'Май', 'Июнь',
-            'Июль', 'Август', 'Сентябрь', 'Октябрь', 'Ноябрь', 'Декабрь'
-        ]
-
-        # Get data for last 2 years to have meaningful seasonal analysis
+        occupancy = occupancy_totals(occupancy_by_listing(
+            active_listings,
+            start_date,
+            min(timezone.now().date(), end_date),
+            status_filter
+        ))
+        stats['occupancy_rate'] = occupancy['occupancy_rate']
+        stats['total_booked_nights'] = occupancy['booked_nights']
+        stats['total_possible_nights'] = occupancy['possible_nights']
+
+        # Revenue by month (last 12 months) and quarter (last 8 quarters),
+        # by the check-out date of completed bookings
+        monthly_revenue = monthly_revenue_series(host_rollups, 12)
+        quarterly_revenue = quarterly_revenue_series(host_rollups, 8)
+
+        # Seasonal revenue analysis - only last 2 years for better seasonal patterns
         two_years_ago = timezone.now().date() - timedelta(days=730)
-        
-        for month in range(1, 13):
-            month_bookings = all_bookings.filter(
-                status='completed',
-                end_date__month=month,
-                end_date__gte=two_years_ago  # Only last 2 years for better seasonal patterns
-            ).aggregate(
-                total_revenue=Sum('total_price'),
-                total_bookings=Count('id'),
-                avg_revenue=Avg('total_price')
-            )
-
-            seasonal_data[month] = {
-                'month': month,
-                'month_name': month_names_ru[month],
-                'total_revenue': float(month_bookings['total_revenue'] or 0),
-                'bookings': month_bookings['total_bookings'] or 0,
-                'avg_revenue': float(month_bookings['avg_revenue'] or 0)
-            }
+        seasonal_revenue = seasonal_revenue_series(host_rollups.filter(day__gte=two_years_ago))
 
-        seasonal_revenue = list(seasonal_data.values())
+        # Bookings by status - use filtered period
+        status_stats = status_breakdown(period_summary, status_filter)
 
-        # Bookings by status - use filtered bookings
-        status_stats_qs = period_bookings.values('status').annotate(
-            count=Count('id'),
-            revenue=Sum(Case(
-                When(status='completed', then='total_price'),
-                default=0,
-                output_field=DecimalField()
-            ))
-        )
-
-        # Convert to list with proper formatting
-        status_stats = []
-        for item in status_stats_qs:
-            if item['count'] > 0:  # Only include statuses that have bookings
-                status_stats.append({
-                    'status': item['status'],
-                    'count': item['count'],
-                    'revenue': float(item['revenue'] or 0)
-                })
-
-        # Top performing listings with proper annotations
-        top_listings = host_listings.annotate(
-            avg_rating=Avg('reviews__rating'),
-            review_count=Count('reviews', distinct=True),
-            bookings_count=Count('bookings', distinct=True),
-            total_revenue=Sum(
-                Case(
-                    When(bookings__status='completed', then='bookings__total_price'),
-                    default=0,
-                    output_field=DecimalField()
-                )
-            )
-        ).prefetch_related('bookings').order_by('-total_revenue')
-
-        # Calculate occupancy days separately to avoid aggregation issues
+        # Top performing listings
+        listing_totals = totals_by_listing(host_rollups)
+        top_listings = list(host_listings.with_main_image())
         for listing in top_listings:
-            total_nights = 0
-            for booking in listing.bookings.filter(status__in=['completed', 'confirmed']):
-                nights = (booking.end_date - booking.start_date).days
-                total_nights += nights
-            listing.occupancy_days = total_nights
+            totals = listing_totals.get(listing.id, {})
+            listing.bookings_count = totals.get('bookings', 0)
+            listing.total_revenue = totals.get('revenue', Decimal('0'))
+            listing.occupancy_days = totals.get('nights', 0)
+        top_listings.sort(key=lambda listing: listing.total_revenue, reverse=True)
 
         # Recent activity (last 10)
         recent_bookings = all_bookings.select_related(
@@ -686,123 +525,61 @@ class HostDashboardView(LoginRequiredMixin, TemplateView):
                 # Always calculate stats even if period seems short
                 total_possible_days = max(1, (actual_end_date - actual_start_date).days)
                 
-                # Используем ТОЧНО такую же логику как в общей статистике заполняемости
-                # Считаем заполняемость так же как в главной статистике
-                occupied_days = 0
-                
-                # Получаем все подтвержденные и завершенные бронирования для этого объявления за весь период
-                occupancy_bookings = selected_listing.bookings.filter(
-                    status__in=['completed', 'confirmed'],
-                    start_date__lt=actual_end_date,
-                    end_date__gt=actual_start_date
-                )
+                listing_rollups = HostDailyStats.objects.filter(listing=selected_listing)
 
-                # Calculate occupied days - точно как в общей статистике
-                for booking in occupancy_bookings:
-                    # Calculate overlap between booking and our period
-                    booking_start = max(booking.start_date, actual_start_date)
-                    booking_end = min(booking.end_date, actual_end_date)
-                    
-                    # Only count if there's actual overlap
-                    if booking_end > booking_start:
-                        nights = (booking_end - booking_start).days
-                        if nights > 0:
-                            occupied_days += nights
+                # Occupied nights within the period
+                occupied_days = listing_rollups.filter(
+                    day__gte=actual_start_date,
+                    day__lt=actual_end_date
+                ).aggregate(nights=Sum(booked_nights_field()))['nights'] or 0
 
                 # Calculate occupancy rate
                 occupancy_rate = (occupied_days / total_possible_days * 100) if total_possible_days > 0 else 0
 
-                # Get revenue for the period - используем end_date для завершенных бронирований
-                period_revenue = selected_listing.bookings.filter(
-                    status='completed',
-                    end_date__gte=actual_start_date,
-                    end_date__lt=actual_end_date + timedelta(days=1)
-                ).aggregate(
-                    total_revenue=Sum('total_price')
-                )['total_revenue'] or 0
-
-                # Get booking stats - считаем все бронирования в периоде по created_at
-                all_bookings_in_period = selected_listing.bookings.filter(
-                    created_at__date__gte=actual_start_date,
-                    created_at__date__lte=actual_end_date
-                )
-                period_booking_count = all_bookings_in_period.count()
-                completed_bookings = all_bookings_in_period.filter(status='completed').count()
-                
+                # Revenue by check-out day of completed bookings, bookings by creation day
+                period_summary = summarize(listing_rollups.filter(
+                    day__gte=actual_start_date,
+                    day__lte=actual_end_date
+                ))
+                period_revenue = period_summary['stay_revenue']
+                period_booking_count = period_summary['bookings_created']
+                completed_bookings = period_summary['completed_bookings']
+
                 # Calculate average booking value
                 avg_booking_value = (period_revenue / completed_bookings) if completed_bookings > 0 else 0
 
                 # Get monthly breakdown
                 monthly_breakdown = []
                 current_month = actual_start_date.replace(day=1)
-                
-                month_names_ru = {
-                    1: 'Янв', 2: 'Фев', 3: 'Мар', 4: 'Апр', 5: 'Май', 6: 'Июн',
-                    7: 'Июл', 8: 'Авг', 9: 'Сен', 10: 'Окт', 11: 'Ноя', 12: 'Дек'
-                }
+                month_totals = listing_month_totals(
+                    listing_rollups.filter(day__gte=current_month, day__lte=actual_end_date),
+                    actual_start_date,
+                    actual_end_date
+                )
 
                 while current_month <= actual_end_date:
-                    # Calculate month end
-                    if current_month.month == 12:
-                        month_end = current_month.replace(year=current_month.year + 1, month=1)
-                    else:
-                        month_end = current_month.replace(month=current_month.month + 1)
-                    
-                    month_end = min(month_end, actual_end_date + timedelta(days=1))
-                    month_actual_end = min(month_end - timedelta(days=1), actual_end_date)
+                    next_month = current_month + relativedelta(months=1)
+                    month_actual_end = min(next_month - timedelta(days=1), actual_end_date)
+                    month_actual_start = max(current_month, actual_start_date)
 
                     # Days in month within our period
-                    month_days = max(0, (month_actual_end - max(current_month, actual_start_date)).days + 1) if month_actual_end >= max(current_month, actual_start_date) else 0
-
-                    # Get bookings for this month - используем ту же логику что и выше
-                    month_occupancy_bookings = selected_listing.bookings.filter(
-                        status__in=['completed', 'confirmed'],
-                        start_date__lt=month_end,
-                        end_date__gt=current_month
-                    )
-
-                    # Calculate occupied days for this month - точно как в общей логике
-                    month_occupied = 0
-                    for booking in month_occupancy_bookings:
-                        booking_start = max(booking.start_date, max(current_month, actual_start_date))
-                        booking_end = min(booking.end_date, month_actual_end)
-                        
-                        # Only count if there's actual overlap
-                        if booking_end > booking_start:
-                            nights = (booking_end - booking_start).days
-                            if nights > 0:
-                                month_occupied += nights
+                    month_days = max(0, (month_actual_end - month_actual_start).days + 1)
 
+                    totals = month_totals.get(current_month, {})
+                    month_occupied = totals.get('nights', 0)
                     month_occupancy = (month_occupied / month_days * 100) if month_days > 0 else 0
 
-                    # Revenue for this month - используем end_date как в общей статистике
-                    month_revenue = selected_listing.bookings.filter(
-                        status='completed',
-                        end_date__gte=current_month,
-                        end_date__lt=month_end
-                    ).aggregate(total=Sum('total_price'))['total'] or 0
-                    
-                    # Bookings count - используем created_at для подсчета бронирований
-                    month_bookings_count = selected_listing.bookings.filter(
-                        created_at__date__gte=current_month,
-                        created_at__date__lt=month_end.date() if hasattr(month_end, 'date') else month_end
-                    ).count()
-
                     monthly_breakdown.append({
                         'month': current_month.strftime('%Y-%m'),
-                        'month_name': f"{month_names_ru[current_month.month]} {current_month.year}",
+                        'month_name': f"{MONTH_SHORT_NAMES_RU[current_month.month]} {current_month.year}",
                         'days': month_days,
                         'occupied_days': month_occupied,
                         'occupancy_rate': round(month_occupancy, 1),
-                        'revenue': float(month_revenue),
-                        'bookings': month_bookings_count
+                        'revenue': float(totals.get('revenue', 0)),
+                        'bookings': totals.get('bookings', 0)
                     })
 
-                    # Move to next month
-                    if current_month.month == 12:
-                        current_month = current_month.replace(year=current_month.year + 1, month=1)
-                    else:
-                        current_month = current_month.replace(month=current_month.month + 1)
+                    current_month = next_month
 
                 listing_detail_stats = {
                     'listing': selected_listing,
@@ -879,7 +656,7 @@ class HostListingListView(LoginRequiredMixin, ListView):
 
     def get_queryset(self):
         # Only show listings owned by current user
-        queryset = Listing.objects.filter(host=self.request.user)
+        queryset = Listing.objects.with_main_image().filter(host=self.request.user)
         
         # If this is for profile view, show only active and approved listings
         if self.request.GET.get('profile_view'):
@@ -1150,28 +927,30 @@ def create_booking(request, pk):
                 host_message
             )
 
-            # Create in-app notifications
-            from notifications.tasks import create_notification
-            
-            # Notification for guest
-            create_notification(
-                user=request.user,
-                notification_type='booking_created',
-                title=f"Запрос на бронирование создан",
-                message=f"Ваш запрос на бронирование жилья '{listing.title}' создан и отправлен хозяину. Ожидайте подтверждения.",
-                listing=listing,
-                booking=booking
-            )
-            
-            # Notification for host
-            create_notification(
-                user=listing.host,
-                notification_type='booking_received',
-                title=f"Новый запрос на бронирование",
-                message=f"Пользователь {request.user.get_full_name() or request.user.username} хочет забронировать ваше жилье '{listing.title}' с {start_date} по {end_date}.",
-                listing=listing,
-                booking=booking
-            )
+            # Create in-app notifications (one INSERT for guest and host)
+            from notifications.models import Notification
+            from notifications.tasks import save_notifications_bulk
+
+            save_notifications_bulk([
+                # Notification for guest
+                Notification(
+                    user=request.user,
+                    notification_type='booking_created',
+                    title=f"Запрос на бронирование создан",
+                    message=f"Ваш запрос на бронирование жилья '{listing.title}' создан и отправлен хозяину. Ожидайте подтверждения.",
+                    listing=listing,
+                    booking=booking
+                ),
+                # Notification for host
+                Notification(
+                    user=listing.host,
+                    notification_type='booking_received',
+                    title=f"Новый запрос на бронирование",
+                    message=f"Пользователь {request.user.get_full_name() or request.user.username} хочет забронировать ваше жилье '{listing.title}' с {start_date} по {end_date}.",
+                    listing=listing,
+                    booking=booking
+                ),
+            ])
 
             messages.success(request, "Booking created successfully. Awaiting host confirmation.")
             return redirect('listings:booking_detail', reference=booking.booking_reference)
@@ -1250,7 +1029,9 @@ def booking_detail(request, reference):
 def user_bookings(request):
     """View for displaying user's bookings"""
     # Get all bookings for the user
-    bookings = Booking.objects.filter(guest=request.user).select_related('listing')
+    bookings = Booking.objects.filter(guest=request.user).select_related('listing').prefetch_related(
+        main_image_prefetch('listing__images')
+    )
 
     # Filter by status if provided
     status = request.GET.get('status')
@@ -1282,7 +1063,9 @@ def host_bookings(request):
     # Get all bookings for the host's listings
     bookings = Booking.objects.filter(
         listing__host=request.user
-    ).select_related('listing', 'guest')
+    ).select_related('listing', 'guest').prefetch_related(
+        main_image_prefetch('listing__images')
+    )
 
     # Filter by status if provided
     status = request.GET.get('status')
@@ -1447,7 +1230,8 @@ def update_booking_status(request, reference, status):
                 )
 
         # Send automatic message to chat if conversation exists
-        from chat.models import Conversation, Message
+        from chat.models import Conversation
+        from chat.state import post_message
         try:
             conversation = Conversation.objects.get(booking=booking)
             if status == 'confirmed':
@@ -1458,11 +1242,7 @@ def update_booking_status(request, reference, status):
                 auto_message = f"ℹ️ Booking status updated to {booking.get_status_display()}."
 
             # Create system message
-            Message.objects.create(
-                conversation=conversation,
-                sender=request.user,
-                content=auto_message
-            )
+            post_message(conversation.pk, request.user, auto_message)
         except Conversation.DoesNotExist:
             pass
 
@@ -1689,21 +1469,71 @@ def admin_delete_review(request, review_id):
         'review': review
     })
 
-def get_listing_calendar_data(request, pk):
-    """API view for getting listing calendar data"""
+def _calendar_window(request):
+    """
+    Parse the ?from=&to= calendar window (ISO dates, both inclusive).
+    Defaults to CALENDAR_WINDOW_DAYS from today; raises ValueError if invalid.
+    """
+    today = timezone.now().date()
+    start = request.GET.get('from')
+    end = request.GET.get('to')
+
+    start = date.fromisoformat(start) if start else today
+    end = date.fromisoformat(end) if end else start + timedelta(days=CALENDAR_WINDOW_DAYS)
+
+    if end < start:
+        raise ValueError("'to' must not be before 'from'")
+    if (end - start).days > MAX_CALENDAR_WINDOW_DAYS:
+        raise ValueError(f"Window must not exceed {MAX_CALENDAR_WINDOW_DAYS} days")
+    return start, end
+
+
+def _calendar_version(request, pk):
+    # Computed once per request for both conditional-request checks
+    if not hasattr(request, '_calendar_version'):
+        request._calendar_version = calendar_version(pk)
+    return request._calendar_version
+
+
+def _calendar_etag(request, pk):
     try:
-        listing = Listing.objects.get(pk=pk)
+        start, end = _calendar_window(request)
+    except ValueError:
+        return None
+    version = _calendar_version(request, pk)
+    key = f"{pk}:{start}:{end}:{version['last_modified']}:{version['bookings']}"
+    return hashlib.md5(key.encode()).hexdigest()
 
-        # Get unavailable dates
-        unavailable_dates = listing.get_unavailable_dates()
 
-        # Return as JSON
-        return JsonResponse({
-            'unavailable_dates': unavailable_dates
-        })
-    except Listing.DoesNotExist:
+def _calendar_last_modified(request, pk):
+    return _calendar_version(request, pk)['last_modified']
+
+
+@condition(etag_func=_calendar_etag, last_modified_func=_calendar_last_modified)
+def get_listing_calendar_data(request, pk):
+    """
+    API view for getting listing calendar data.
+
+    Returns the booked ranges of the listing within the ?from=&to= window
+    (see _calendar_window) as merged [first, last] date pairs, both
+    inclusive. Repeat polls get 304 Not Modified until a booking of the
+    listing changes.
+    """
+    if not Listing.objects.filter(pk=pk).exists():
         return JsonResponse({'error': 'Listing not found'}, status=404)
 
+    try:
+        start, end = _calendar_window(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    intervals = booked_intervals(pk, start, end)
+    return JsonResponse({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'booked_ranges': [[first.isoformat(), last.isoformat()] for first, last in intervals]
+    })
+
 def calculate_booking_price(request, pk):
     """API view for calculating booking price"""
     try:
@@ -1881,7 +1711,7 @@ def host_dashboard_data(request):
     custom_end = request.GET.get('custom_end')
     
     user = request.user
-    all_bookings = Booking.objects.filter(listing__host=user)
+    host_rollups = HostDailyStats.objects.filter(host=user)
     
     # Calculate date range for filtering (same logic as main view)
     end_date = timezone.now().date()
@@ -1902,156 +1732,85 @@ def host_dashboard_data(request):
     else:
         start_date = end_date - timedelta(days=30)
     
-    # Apply filters to bookings
-    filtered_bookings = all_bookings.filter(
-        created_at__date__gte=start_date,
-        created_at__date__lte=end_date
-    )
+    # Apply filters to the period rollups
+    period_rollups = host_rollups.filter(day__gte=start_date, day__lte=end_date)
     
     if listing_filter != 'all' and listing_filter.isdigit():
-        filtered_bookings = filtered_bookings.filter(listing_id=listing_filter)
-    
-    if status_filter != 'all':
-        filtered_bookings = filtered_bookings.filter(status=status_filter)
+        period_rollups = period_rollups.filter(listing_id=listing_filter)
     
     response_data = {}
     
     if chart_type == 'revenue':
-        # Generate revenue data based on period
-        from dateutil.relativedelta import relativedelta
-        
         try:
             period_months = int(period) if period != 'all' else 12
         except ValueError:
             period_months = 12
-            
-        monthly_revenue = []
-        current_date = timezone.now().date()
-        
-        month_names_ru = {
-            1: 'Янв', 2: 'Фев', 3: 'Мар', 4: 'Апр', 5: 'Май', 6: 'Июн',
-            7: 'Июл', 8: 'Авг', 9: 'Сен', 10: 'Окт', 11: 'Ноя', 12: 'Дек'
-        }
-        
-        for i in range(period_months - 1, -1, -1):
-            target_date = current_date.replace(day=1) - relativedelta(months=i)
-            month_end = target_date + relativedelta(months=1)
-            
-            month_revenue = all_bookings.filter(
-                status='completed',
-                end_date__gte=target_date,
-                end_date__lt=month_end
-            ).aggregate(
-                total_revenue=Sum('total_price'),
-                total_bookings=Count('id')
-            )
-            
-            month_name = f"{month_names_ru[target_date.month]} {target_date.year}"
-            
-            monthly_revenue.append({
-                'month': target_date.strftime('%Y-%m-01'),
-                'month_name': month_name,
-                'revenue': float(month_revenue['total_revenue'] or 0),
-                'bookings': month_revenue['total_bookings'] or 0
-            })
         
-        response_data['monthly_revenue'] = monthly_revenue
+        response_data['monthly_revenue'] = monthly_revenue_series(host_rollups, period_months)
     
     elif chart_type == 'quarterly':
-        # Generate quarterly data
         try:
             period_quarters = int(period) if period != 'all' else 8
         except ValueError:
             period_quarters = 8
-            
-        quarterly_revenue = []
-        today = timezone.now().date()
-        current_quarter_start = date(today.year, ((today.month - 1) // 3) * 3 + 1, 1)
-        
-        for i in range(period_quarters - 1, -1, -1):
-            quarter_start = current_quarter_start - relativedelta(months=i*3)
-            quarter_end = quarter_start + relativedelta(months=3)
-            
-            quarter_revenue = all_bookings.filter(
-                status='completed',
-                end_date__gte=quarter_start,
-                end_date__lt=quarter_end
-            ).aggregate(
-                total_revenue=Sum('total_price'),
-                total_bookings=Count('id')
-            )
-            
-            quarter_num = ((quarter_start.month - 1) // 3) + 1
-            quarterly_revenue.append({
-                'quarter': f"{quarter_start.year}-Q{quarter_num}",
-                'quarter_name': f"Q{quarter_num} {quarter_start.year}",
-                'revenue': float(quarter_revenue['total_revenue'] or 0),
-                'bookings': quarter_revenue['total_bookings'] or 0
-            })
         
-        response_data['quarterly_revenue'] = quarterly_revenue
+        response_data['quarterly_revenue'] = quarterly_revenue_series(host_rollups, period_quarters)
     
     elif chart_type == 'seasonal':
-        # Generate seasonal data based on period
-        seasonal_data = {}
-        month_names_ru = [
-            '', 'Январь', 'Февраль', 'Март', 'Апрель', 'Май', 'Июнь',
-            'Июль', 'Август', 'Сентябрь', 'Октябрь', 'Ноябрь', 'Декабрь'
-        ]
-        
         # Filter by period
         if period == 'current':
-            year_filter = timezone.now().year
-            bookings_filter = all_bookings.filter(end_date__year=year_filter)
+            seasonal_rollups = host_rollups.filter(day__year=timezone.now().year)
         else:
             # All time or last 2 years
             two_years_ago = timezone.now().date() - timedelta(days=730)
-            bookings_filter = all_bookings.filter(end_date__gte=two_years_ago)
-        
-        for month in range(1, 13):
-            month_bookings = bookings_filter.filter(
-                status='completed',
-                end_date__month=month
-            ).aggregate(
-                total_revenue=Sum('total_price'),
-                total_bookings=Count('id'),
-                avg_revenue=Avg('total_price')
-            )
-            
-            seasonal_data[month] = {
-                'month': month,
-                'month_name': month_names_ru[month],
-                'total_revenue': float(month_bookings['total_revenue'] or 0),
-                'bookings': month_bookings['total_bookings'] or 0,
-                'avg_revenue': float(month_bookings['avg_revenue'] or 0)
-            }
+            seasonal_rollups = host_rollups.filter(day__gte=two_years_ago)
         
-        response_data['seasonal_revenue'] = list(seasonal_data.values())
+        response_data['seasonal_revenue'] = seasonal_revenue_series(seasonal_rollups)
     
     elif chart_type == 'status':
-        # Generate status data using filtered bookings
-        status_stats_qs = filtered_bookings.values('status').annotate(
-            count=Count('id'),
-            revenue=Sum(Case(
-                When(status='completed', then='total_price'),
-                default=0,
-                output_field=DecimalField()
-            ))
-        )
-        
-        status_stats = []
-        for item in status_stats_qs:
-            if item['count'] > 0:
-                status_stats.append({
-                    'status': item['status'],
-                    'count': item['count'],
-                    'revenue': float(item['revenue'] or 0)
-                })
-        
-        response_data['status_stats'] = status_stats
+        response_data['status_stats'] = status_breakdown(summarize(period_rollups), status_filter)
     
     return JsonResponse(response_data)
 
+# Rows used to size export columns; later rows are streamed without being inspected
+EXPORT_WIDTH_SAMPLE_SIZE = 200
+EXPORT_CHUNK_SIZE = 2000
+
+
+def _styled_cell(ws, value, font=None, fill=None, alignment=None):
+    """Cell for a write-only worksheet with optional styling"""
+    cell = WriteOnlyCell(ws, value=value)
+    if font:
+        cell.font = font
+    if fill:
+        cell.fill = fill
+    if alignment:
+        cell.alignment = alignment
+    return cell
+
+
+def _write_export_sheet(wb, title, headers, rows, header_font, header_fill):
+    """
+    Append a sheet with a styled header row to a write-only workbook.
+
+    Column widths have to be set before the first row is written, so they are
+    estimated from the header and the first EXPORT_WIDTH_SAMPLE_SIZE rows.
+    """
+    ws = wb.create_sheet(title=title)
+    rows = iter(rows)
+    sample = list(islice(rows, EXPORT_WIDTH_SAMPLE_SIZE))
+
+    for col_idx, header in enumerate(headers, 1):
+        max_length = max([len(str(header))] + [len(str(row[col_idx - 1])) for row in sample])
+        ws.column_dimensions[get_column_letter(col_idx)].width = min(max_length + 2, 50)
+
+    ws.append([
+        _styled_cell(ws, header, font=header_font, fill=header_fill, alignment=Alignment(horizontal="center"))
+        for header in headers
+    ])
+    for row in chain(sample, rows):
+        ws.append(row)
+
 @login_required
 def export_dashboard_excel(request):
     """Export dashboard data to Excel"""
@@ -2105,19 +1864,34 @@ def export_dashboard_excel(request):
     if status_filter != 'all':
         bookings = bookings.filter(status=status_filter)
 
-    # Create workbook
-    wb = openpyxl.Workbook()
+    # Occupancy per listing for the report period (same figures as the dashboard)
+    occupancy_end = min(timezone.now().date(), end_date)
+    listing_occupancy = occupancy_by_listing(host_listings, start_date, occupancy_end, status_filter)
+    total_occupancy = occupancy_totals(occupancy_by_listing(
+        host_listings.filter(is_active=True, is_approved=True),
+        start_date,
+        occupancy_end,
+        status_filter
+    ))
 
-    # Remove default sheet
-    wb.remove(wb.active)
-
-    # Create summary sheet
-    summary_ws = wb.create_sheet(title="Сводка")
+    # Write-only workbook: rows are flushed to disk as they are appended,
+    # so memory use does not grow with the number of bookings
+    wb = openpyxl.Workbook(write_only=True)
 
     # Header styling
     header_font = Font(bold=True, color="FFFFFF")
     header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
 
+    # Create summary sheet
+    summary_ws = wb.create_sheet(title="Сводка")
+    summary_ws.column_dimensions['A'].width = 25
+    summary_ws.column_dimensions['B'].width = 20
+
+    completed_summary = bookings.filter(status='completed').aggregate(
+        total=Sum('total_price'),
+        avg=Avg('total_price')
+    )
+
     # Summary data
     summary_data = [
         ["Период отчета", f"{start_date} - {end_date}"],
@@ -2129,25 +1903,18 @@ def export_dashboard_excel(request):
         ["Подтвержденных бронирований", bookings.filter(status='confirmed').count()],
         ["Завершенных бронирований", bookings.filter(status='completed').count()],
         ["Отмененных бронирований", bookings.filter(status='canceled').count()],
-        ["Общий доход", bookings.filter(status='completed').aggregate(total=Sum('total_price'))['total'] or 0],
-        ["Средний чек", bookings.filter(status='completed').aggregate(avg=Avg('total_price'))['avg'] or 0],
+        ["Общий доход", completed_summary['total'] or 0],
+        ["Средний чек", completed_summary['avg'] or 0],
+        ["Забронировано ночей", total_occupancy['booked_nights']],
+        ["Заполняемость (%)", total_occupancy['occupancy_rate']],
     ]
 
     for row_idx, (label, value) in enumerate(summary_data, 1):
-        summary_ws.cell(row=row_idx, column=1, value=label)
-        summary_ws.cell(row=row_idx, column=2, value=value)
         if row_idx == 3:  # Header row
-            summary_ws.cell(row=row_idx, column=1).font = header_font
-            summary_ws.cell(row=row_idx, column=1).fill = header_fill
-
-    # Adjust column widths
-    summary_ws.column_dimensions['A'].width = 25
-    summary_ws.column_dimensions['B'].width = 20
+            label = _styled_cell(summary_ws, label, font=header_font, fill=header_fill)
+        summary_ws.append([label, value])
 
     # Create bookings sheet
-    bookings_ws = wb.create_sheet(title="Бронирования")
-
-    # Bookings headers
     bookings_headers = [
         "ID бронирования", "Ссылка на бронирование", "Объявление", "Гость", 
         "Email гостя", "Дата заезда", "Дата выезда", "Количество ночей", 
@@ -2155,112 +1922,72 @@ def export_dashboard_excel(request):
         "Сервисный сбор", "Общая стоимость", "Дата создания", "Особые пожелания"
     ]
 
-    # Write headers
-    for col_idx, header in enumerate(bookings_headers, 1):
-        cell = bookings_ws.cell(row=1, column=col_idx, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal="center")
-
-    # Write booking data
-    for row_idx, booking in enumerate(bookings.order_by('-created_at'), 2):
-        data = [
-            str(booking.booking_reference),
-            str(booking.booking_reference),
-            str(booking.listing.title),
-            str(booking.guest.get_full_name() or booking.guest.username),
-            str(booking.guest.email),
-            booking.start_date.strftime('%Y-%m-%d') if booking.start_date else '',
-            booking.end_date.strftime('%Y-%m-%d') if booking.end_date else '',
-            int(booking.duration_nights),
-            int(booking.guests),
-            str(booking.get_status_display()),
-            float(booking.base_price),
-            float(booking.cleaning_fee),
-            float(booking.service_fee),
-            float(booking.total_price),
-            booking.created_at.strftime('%Y-%m-%d %H:%M'),
-            str(booking.special_requests or "")
-        ]
-
-        for col_idx, value in enumerate(data, 1):
-            bookings_ws.cell(row=row_idx, column=col_idx, value=value)
+    def booking_rows():
+        for booking in bookings.order_by('-created_at').iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield [
+                str(booking.booking_reference),
+                str(booking.booking_reference),
+                str(booking.listing.title),
+                str(booking.guest.get_full_name() or booking.guest.username),
+                str(booking.guest.email),
+                booking.start_date.strftime('%Y-%m-%d') if booking.start_date else '',
+                booking.end_date.strftime('%Y-%m-%d') if booking.end_date else '',
+                int(booking.duration_nights),
+                int(booking.guests),
+                str(booking.get_status_display()),
+                float(booking.base_price),
+                float(booking.cleaning_fee),
+                float(booking.service_fee),
+                float(booking.total_price),
+                booking.created_at.strftime('%Y-%m-%d %H:%M'),
+                str(booking.special_requests or "")
+            ]
 
-    # Auto-adjust column widths
-    for column in bookings_ws.columns:
-        max_length = 0
-        column_letter = get_column_letter(column[0].column)
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        bookings_ws.column_dimensions[column_letter].width = adjusted_width
+    _write_export_sheet(wb, "Бронирования", bookings_headers, booking_rows(), header_font, header_fill)
 
     # Create listings performance sheet
-    listings_ws = wb.create_sheet(title="Эффективность объявлений")
-
     listings_headers = [
         "Название объявления", "Город", "Статус", "Цена за ночь",
         "Количество бронирований", "Завершенных бронирований", 
-        "Общий доход", "Средний рейтинг", "Количество отзывов"
+        "Общий доход", "Средний рейтинг", "Количество отзывов",
+        "Забронировано ночей", "Заполняемость (%)"
     ]
 
-    # Write headers
-    for col_idx, header in enumerate(listings_headers, 1):
-        cell = listings_ws.cell(row=1, column=col_idx, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal="center")
-
     # Get listings with stats
     listings_with_stats = host_listings.annotate(
         total_bookings=Count('bookings', filter=Q(bookings__created_at__date__gte=start_date, bookings__created_at__date__lte=end_date)),
         completed_bookings=Count('bookings', filter=Q(bookings__status='completed', bookings__created_at__date__gte=start_date, bookings__created_at__date__lte=end_date)),
-        total_revenue=Sum('bookings__total_price', filter=Q(bookings__status='completed', bookings__created_at__date__gte=start_date, bookings__created_at__date__lte=end_date)),
-        avg_rating=Avg('reviews__rating'),
-        review_count=Count('reviews')
+        total_revenue=Sum('bookings__total_price', filter=Q(bookings__status='completed', bookings__created_at__date__gte=start_date, bookings__created_at__date__lte=end_date))
     )
 
-    # Write listings data
-    for row_idx, listing in enumerate(listings_with_stats, 2):
-        data = [
-            listing.title,
-            listing.city,
-            "Активно" if listing.is_active else "Неактивно",
-            float(listing.price_per_night),
-            listing.total_bookings or 0,
-            listing.completed_bookings or 0,
-            float(listing.total_revenue or 0),
-            round(listing.avg_rating or 0, 2),
-            listing.review_count or 0
-        ]
+    def listing_rows():
+        for listing in listings_with_stats.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield [
+                listing.title,
+                listing.city,
+                "Активно" if listing.is_active else "Неактивно",
+                float(listing.price_per_night),
+                listing.total_bookings or 0,
+                listing.completed_bookings or 0,
+                float(listing.total_revenue or 0),
+                round(listing.avg_rating or 0, 2),
+                listing.review_count or 0,
+                listing_occupancy[listing.id]['booked_nights'],
+                listing_occupancy[listing.id]['occupancy_rate']
+            ]
 
-        for col_idx, value in enumerate(data, 1):
-            listings_ws.cell(row=row_idx, column=col_idx, value=value)
+    _write_export_sheet(wb, "Эффективность объявлений", listings_headers, listing_rows(), header_font, header_fill)
 
-    # Auto-adjust column widths
-    for column in listings_ws.columns:
-        max_length = 0
-        column_letter = get_column_letter(column[0].column)
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        listings_ws.column_dimensions[column_letter].width = adjusted_width
+    # The workbook is assembled in a temporary file and streamed from there
+    output = tempfile.TemporaryFile()
+    wb.save(output)
+    output.seek(0)
 
-    # Prepare response
-    response = HttpResponse(
+    filename = f"dashboard_report_{start_date}_{end_date}.xlsx"
+    response = FileResponse(
+        output,
+        as_attachment=True,
+        filename=filename,
         content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
-
-    filename = f"dashboard_report_{start_date}_{end_date}.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-    wb.save(response)
     return response
\ No newline at end of file
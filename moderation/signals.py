@@ -4,7 +4,10 @@ from django.utils import timezone
 from .models import UserComplaint
 from listings.models import Listing
 from .models import ListingApproval, BannedUser
-from notifications.tasks import create_notification
+from notifications.tasks import (
+    create_notification, create_notifications_bulk, save_notifications_bulk, send_email_notification
+)
+from subscriptions.entitlements import invalidate_entitlements
 
 @receiver(post_save, sender=UserComplaint)
 def handle_complaint_status_change(sender, instance, created, **kwargs):
@@ -16,35 +19,33 @@ def handle_complaint_status_change(sender, instance, created, **kwargs):
             # Notify moderators about new complaint
             from django.contrib.auth import get_user_model
             User = get_user_model()
-            moderators = User.objects.filter(is_staff=True)
-
-            for moderator in moderators:
-                Notification.objects.create(
-                    user=moderator,
-                    notification_type='system',
-                    title=f"Новая жалоба #{instance.id}",
-                    message=f"Пользователь {instance.complainant.username} подал жалобу: {instance.subject}",
-                )
+            create_notifications_bulk(
+                User.objects.filter(is_staff=True),
+                notification_type='system',
+                title=f"Новая жалоба #{instance.id}",
+                message=f"Пользователь {instance.complainant.username} подал жалобу: {instance.subject}",
+            )
         else:
             # Check if status changed by comparing with original
             if hasattr(instance, '_original_status') and instance._original_status != instance.status:
                 # Notify complainant about status change
                 status_display = instance.get_status_display()
-                Notification.objects.create(
+                notices = [Notification(
                     user=instance.complainant,
                     notification_type='system',
                     title=f"Обновление жалобы #{instance.id}",
                     message=f"Статус вашей жалобы изменен на: {status_display}",
-                )
+                )]
 
                 # If there's a response, also notify about it
                 if instance.moderator_response:
-                    Notification.objects.create(
+                    notices.append(Notification(
                         user=instance.complainant,
                         notification_type='system',
                         title=f"Ответ на жалобу #{instance.id}",
                         message=f"Модератор ответил на вашу жалобу. Проверьте раздел 'Мои жалобы'.",
-                    )
+                    ))
+                save_notifications_bulk(notices)
     except ImportError:
         # notifications app not available
         pass
@@ -85,17 +86,13 @@ def create_listing_approval(sender, instance, created, **kwargs):
             
             # Уведомляем администраторов о попытке создания дубликата
             try:
-                from notifications.models import Notification
                 User = get_user_model()
-                admins = User.objects.filter(is_staff=True, is_superuser=True)
-                
-                for admin in admins:
-                    Notification.objects.create(
-                        user=admin,
-                        notification_type='system',
-                        title='Предупреждение: попытка создания дубликата',
-                        message=f'Попытка создать дублирующую запись модерации для объявления "{instance.title}" (ID: {instance.id}). Запись уже существует.'
-                    )
+                create_notifications_bulk(
+                    User.objects.filter(is_staff=True, is_superuser=True),
+                    notification_type='system',
+                    title='Предупреждение: попытка создания дубликата',
+                    message=f'Попытка создать дублирующую запись модерации для объявления "{instance.title}" (ID: {instance.id}). Запись уже существует.'
+                )
             except ImportError:
                 # notifications app недоступно
                 pass
@@ -108,6 +105,9 @@ def handle_user_ban(sender, instance, created, **kwargs):
         # Deactivate all user's listings
         user_listings = Listing.objects.filter(host=instance.user, is_active=True)
         deactivated_count = user_listings.update(is_active=False)
+        if deactivated_count:
+            # update() skips the Listing post_save receiver
+            invalidate_entitlements(instance.user_id)
 
         # Create notification for the banned user
         if instance.is_permanent:
@@ -123,4 +123,5 @@ def handle_user_ban(sender, instance, created, **kwargs):
             notification_type='system',
             title=title,
             message=message
-        )
\ No newline at end of file
+        )
+        send_email_notification(instance.user.email, title, message)
\ No newline at end of file
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Notification, EmailTemplate
+from django.utils import timezone
+from .counters import invalidate_unread
+from .models import Notification, NotificationSummary, EmailTemplate, QueuedTask
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
@@ -12,15 +14,40 @@ class NotificationAdmin(admin.ModelAdmin):
     
     def mark_as_read(self, request, queryset):
         queryset.update(is_read=True)
+        invalidate_unread(*queryset.order_by().values_list('user_id', flat=True).distinct())
         self.message_user(request, f"{queryset.count()} notifications marked as read.")
     mark_as_read.short_description = "Mark selected notifications as read"
     
     def mark_as_unread(self, request, queryset):
         queryset.update(is_read=False)
+        invalidate_unread(*queryset.order_by().values_list('user_id', flat=True).distinct())
         self.message_user(request, f"{queryset.count()} notifications marked as unread.")
     mark_as_unread.short_description = "Mark selected notifications as unread"
 
+@admin.register(NotificationSummary)
+class NotificationSummaryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'notification_type', 'month', 'count', 'updated_at')
+    list_filter = ('notification_type', 'month')
+    search_fields = ('user__username', 'user__email')
+    readonly_fields = ('user', 'notification_type', 'month', 'count', 'updated_at')
+
 @admin.register(EmailTemplate)
 class EmailTemplateAdmin(admin.ModelAdmin):
     list_display = ('name', 'subject')
     search_fields = ('name', 'subject', 'content')
+
+@admin.register(QueuedTask)
+class QueuedTaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'created_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'last_error')
+    readonly_fields = ('created_at', 'updated_at', 'locked_by', 'locked_at')
+
+    actions = ['requeue']
+
+    def requeue(self, request, queryset):
+        updated = queryset.exclude(status='running').update(
+            status='pending', attempts=0, run_at=timezone.now(), last_error=''
+        )
+        self.message_user(request, f"{updated} tasks requeued.")
+    requeue.short_description = "Requeue selected tasks"
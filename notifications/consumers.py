@@ -0,0 +1,40 @@
+import json
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+
+from .push import unread_counts, user_group
+
+class UnreadCountConsumer(AsyncWebsocketConsumer):
+    """Pushes a user's unread notification and message counts to the navbar"""
+
+    async def connect(self):
+        self.user = self.scope["user"]
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+
+        self.group_name = user_group(self.user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+        # Initial state, the page may have been rendered a while ago
+        await self.send_counts()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, "group_name"):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive(self, text_data):
+        # Clients may ask for a refresh, e.g. after waking from sleep
+        await self.send_counts()
+
+    async def unread_changed(self, event):
+        await self.send_counts()
+
+    async def send_counts(self):
+        counts = await self.get_counts()
+        await self.send(text_data=json.dumps(counts))
+
+    @database_sync_to_async
+    def get_counts(self):
+        return unread_counts(self.user.id)
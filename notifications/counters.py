@@ -0,0 +1,104 @@
+"""
+Cached unread notification counters.
+
+The navbar badge shows the unread count on every page and polls it every
+30 seconds, so the count is kept per user in the default cache instead of
+running COUNT(*) each time. A missing entry is computed from the database
+once; afterwards it is maintained in place:
+
+    * a saved notification increments the counter (post_save),
+    * Notification.mark_as_read decrements it,
+    * mark_all_read resets it to 0,
+    * bulk inserts and queryset updates drop it, so it is recomputed on the
+      next read (one delete_many instead of an increment per recipient).
+
+Counter changes are applied after the surrounding transaction commits,
+and the user's open tabs are told to refresh their badge (see push.py).
+Within a request the value is memoized on the request object, so the
+template tags and views rendering one page share a single lookup.
+
+Notifications are also created by run_task_worker, a separate process, so
+the counters need a cache shared between processes (Redis in dev and
+prod). With a process-local backend (locmem, dummy) the worker's updates
+would never reach the web server, and the count is read from the database
+every time instead.
+"""
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from .push import push_unread_changed
+
+UNREAD_COUNT_CACHE_TTL = 15 * 60
+
+REQUEST_MEMO_ATTR = '_unread_notification_count'
+
+
+def _cache_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def compute_unread_count(user_id):
+    from .models import Notification
+    return Notification.objects.filter(user_id=user_id, is_read=False).count()
+
+
+def _cache_is_shared():
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def get_unread_count(user_id):
+    """Return the user's unread notification count, from cache when possible"""
+    if not _cache_is_shared():
+        return compute_unread_count(user_id)
+
+    key = _cache_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = compute_unread_count(user_id)
+        cache.set(key, count, UNREAD_COUNT_CACHE_TTL)
+    # Concurrent decrements can briefly overshoot
+    return max(count, 0)
+
+
+def unread_count_for_request(request):
+    """Unread count of request.user, looked up at most once per request"""
+    if not request.user.is_authenticated:
+        return 0
+    count = getattr(request, REQUEST_MEMO_ATTR, None)
+    if count is None:
+        count = get_unread_count(request.user.pk)
+        setattr(request, REQUEST_MEMO_ATTR, count)
+    return count
+
+
+def _adjust(user_id, delta):
+    try:
+        cache.incr(_cache_key(user_id), delta)
+    except ValueError:
+        # Not cached: the next read computes it from the database
+        pass
+
+
+def increment_unread(user_id, delta=1):
+    transaction.on_commit(lambda: _adjust(user_id, delta))
+    push_unread_changed(user_id)
+
+
+def decrement_unread(user_id, delta=1):
+    transaction.on_commit(lambda: _adjust(user_id, -delta))
+    push_unread_changed(user_id)
+
+
+def reset_unread(user_id):
+    """All of the user's notifications were marked read"""
+    transaction.on_commit(lambda: cache.set(_cache_key(user_id), 0, UNREAD_COUNT_CACHE_TTL))
+    push_unread_changed(user_id)
+
+
+def invalidate_unread(*user_ids):
+    """Drop cached counters after bulk changes"""
+    keys = [_cache_key(user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+    push_unread_changed(*user_ids)
@@ -0,0 +1,221 @@
+"""
+Email delivery layer.
+
+send_mail opens (and closes) a new backend connection for every message.
+Here messages are grouped by template and recipient provider (the domain
+of the address) and sent in batches of EMAIL_BATCH_SIZE, each batch over
+one connection from get_connection(). Single messages sent by the task
+worker reuse a per-thread pooled connection that is reopened after
+CONNECTION_MAX_IDLE seconds of inactivity or after an error.
+
+Providers can be rate limited with the EMAIL_RATE_LIMITS setting,
+messages per second per recipient domain, e.g.
+
+    EMAIL_RATE_LIMITS = {'default': 20, 'gmail.com': 5}
+
+The limits apply per worker process. Every batch logs its size and timing
+and returns a BatchReport. All of this works with the locmem and file
+email backends.
+"""
+import logging
+import smtplib
+import threading
+import time
+from dataclasses import dataclass, field
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+
+# Reopen pooled connections idle longer than this (SMTP servers drop them)
+CONNECTION_MAX_IDLE = 60
+
+
+def batch_size():
+    return getattr(settings, 'EMAIL_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+
+def from_email():
+    return settings.DEFAULT_FROM_EMAIL or 'noreply@rentalapp.com'
+
+
+@dataclass(frozen=True)
+class OutgoingEmail:
+    recipient: str
+    subject: str
+    body: str
+    template: str = 'default'
+
+    @property
+    def provider(self):
+        return self.recipient.rpartition('@')[2].lower()
+
+    def as_message(self, connection=None):
+        return EmailMessage(
+            subject=self.subject,
+            body=self.body,
+            from_email=from_email(),
+            to=[self.recipient],
+            connection=connection
+        )
+
+
+@dataclass
+class BatchReport:
+    template: str
+    provider: str
+    sent: int = 0
+    rejected: list = field(default_factory=list)
+    seconds: float = 0.0
+    throttled: float = 0.0
+
+
+class DeliveryInterrupted(Exception):
+    """The connection failed part-way through a batch"""
+
+    def __init__(self, report, remaining, error):
+        super().__init__(str(error))
+        self.report = report
+        self.remaining = remaining
+        self.error = error
+
+
+class RateLimiter:
+    """Spaces out messages per provider according to EMAIL_RATE_LIMITS"""
+
+    def __init__(self, limits=None):
+        self.limits = getattr(settings, 'EMAIL_RATE_LIMITS', {}) if limits is None else limits
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, provider):
+        """Block until the next message may go to provider; returns seconds waited"""
+        rate = self.limits.get(provider, self.limits.get('default'))
+        if not rate:
+            return 0.0
+
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_slot.get(provider, now))
+            self.next_slot[provider] = start + 1 / rate
+        wait = start - now
+        if wait > 0:
+            time.sleep(wait)
+        return max(wait, 0.0)
+
+
+limiter = RateLimiter()
+
+_pool = threading.local()
+
+
+def pooled_connection():
+    """Open backend connection of the current thread, reused between sends"""
+    connection = getattr(_pool, 'connection', None)
+    idle = time.monotonic() - getattr(_pool, 'last_used', 0)
+    if connection is not None and idle > CONNECTION_MAX_IDLE:
+        close_pooled_connection()
+        connection = None
+
+    if connection is None:
+        connection = get_connection(fail_silently=False)
+        connection.open()
+        _pool.connection = connection
+    _pool.last_used = time.monotonic()
+    return connection
+
+
+def close_pooled_connection():
+    connection = getattr(_pool, 'connection', None)
+    _pool.connection = None
+    if connection is not None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+def send_email(email):
+    """Send one message over the pooled connection"""
+    limiter.acquire(email.provider)
+    try:
+        pooled_connection().send_messages([email.as_message()])
+    except Exception:
+        # Never reuse a connection in an unknown state
+        close_pooled_connection()
+        raise
+
+
+def send_batch(emails, template, provider):
+    """
+    Send emails (one template, one provider) over a single connection.
+    Refused recipients are skipped and reported. A connection failure
+    raises DeliveryInterrupted with the unsent remainder.
+    """
+    report = BatchReport(template=template, provider=provider)
+    started = time.monotonic()
+
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+        for index, email in enumerate(emails):
+            # Per message, so a batch never bursts past the provider's rate
+            report.throttled += limiter.acquire(provider)
+            try:
+                connection.send_messages([email.as_message()])
+            except smtplib.SMTPRecipientsRefused:
+                report.rejected.append(email.recipient)
+                continue
+            except Exception as e:
+                report.seconds = time.monotonic() - started
+                raise DeliveryInterrupted(report, emails[index:], e)
+            report.sent += 1
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    report.seconds = time.monotonic() - started
+    logger.info(
+        f"Email batch {template}/{provider}: {report.sent} sent, "
+        f"{len(report.rejected)} rejected in {report.seconds:.2f}s "
+        f"(throttled {report.throttled:.2f}s)"
+    )
+    return report
+
+
+def group_emails(emails, size=None):
+    """Split emails into (template, provider, batch) groups of at most size"""
+    size = size or batch_size()
+    ordered = sorted(emails, key=lambda email: (email.template, email.provider))
+    for (template, provider), group in groupby(ordered, key=lambda email: (email.template, email.provider)):
+        group = list(group)
+        for start in range(0, len(group), size):
+            yield template, provider, group[start:start + size]
+
+
+def deliver(emails, size=None):
+    """Send emails synchronously in batches; returns the BatchReports"""
+    return [
+        send_batch(batch, template, provider)
+        for template, provider, batch in group_emails(emails, size)
+    ]
+
+
+def queue_emails(emails, size=None):
+    """Queue emails for the task worker, one task per batch"""
+    from .tasks import deliver_email_batch
+
+    queued = 0
+    for template, provider, batch in group_emails(emails, size):
+        deliver_email_batch.delay(
+            template,
+            [[email.recipient, email.subject, email.body] for email in batch]
+        )
+        queued += 1
+    return queued
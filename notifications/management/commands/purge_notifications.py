@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from notifications.retention import (
+    DEFAULT_BATCH_SIZE, count_purgeable, purge_notifications, retention_days
+)
+
+
+class Command(BaseCommand):
+    help = 'Delete old read notifications, keeping their counts in notification summaries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Keep read notifications newer than this many days (default: NOTIFICATION_RETENTION_DAYS or 90)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Number of notifications deleted per transaction (default: {DEFAULT_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be deleted without deleting'
+        )
+
+    def handle(self, *args, **options):
+        days = retention_days() if options['days'] is None else options['days']
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be made'))
+            by_type = count_purgeable(timezone.now() - timedelta(days=days))
+            self.write_by_type(by_type)
+            self.stdout.write(self.style.SUCCESS(
+                f'{sum(by_type.values())} read notifications older than {days} days would be deleted'
+            ))
+            return
+
+        def report(stats):
+            self.stdout.write(f'  batch {stats.batches}: {stats.deleted} deleted')
+
+        stats = purge_notifications(
+            days=days,
+            batch_size=max(1, options['batch_size']),
+            on_batch=report if options['verbosity'] > 1 else None
+        )
+
+        self.write_by_type(stats.by_type)
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {stats.deleted} read notifications older than {days} days '
+            f'in {stats.batches} batches ({stats.elapsed:.1f}s)'
+        ))
+
+    def write_by_type(self, by_type):
+        for notification_type, count in sorted(by_type.items()):
+            self.stdout.write(f'  {notification_type}: {count}')
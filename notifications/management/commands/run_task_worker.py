@@ -0,0 +1,88 @@
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from notifications.task_queue import (
+    DEFAULT_LOCK_TIMEOUT, STALE_CHECK_INTERVAL, claim_tasks, execute_task, release_stale_tasks
+)
+
+
+def _run(pk):
+    close_old_connections()
+    try:
+        return execute_task(pk)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Execute queued background tasks (emails, notifications)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Number of tasks executed in parallel threads (default: 1)'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to sleep when the queue is empty (default: 2)'
+        )
+        parser.add_argument(
+            '--lock-timeout',
+            type=int,
+            default=DEFAULT_LOCK_TIMEOUT,
+            help=f'Requeue running tasks locked longer than this many seconds (default: {DEFAULT_LOCK_TIMEOUT})'
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once no task is due instead of polling forever'
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        worker_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        totals = {'done': 0, 'retry': 0, 'dead': 0}
+
+        self.stdout.write(f'Task worker {worker_id} started (concurrency {concurrency})')
+        next_stale_check = 0
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                while True:
+                    # Other workers may crash while this one keeps running
+                    if time.monotonic() >= next_stale_check:
+                        self.release_stale(options['lock_timeout'])
+                        next_stale_check = time.monotonic() + STALE_CHECK_INTERVAL
+
+                    claimed = claim_tasks(worker_id, concurrency)
+                    if not claimed:
+                        if options['burst']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+
+                    for outcome in pool.map(_run, claimed):
+                        totals[outcome] += 1
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping worker...')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Tasks completed: {totals['done']}, retried: {totals['retry']}, "
+            f"dead-lettered: {totals['dead']}"
+        ))
+
+    def release_stale(self, lock_timeout):
+        requeued, dead = release_stale_tasks(lock_timeout)
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} abandoned tasks'))
+        if dead:
+            self.stdout.write(self.style.WARNING(f'Dead-lettered {dead} abandoned tasks out of attempts'))
@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from notifications.tasks import NOTIFICATION_BULK_BATCH_SIZE, create_notifications_bulk
+
+
+class Command(BaseCommand):
+    help = 'Send a system notification to every active user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('title', help='Notification title')
+        parser.add_argument('message', help='Notification text')
+        parser.add_argument(
+            '--staff-only',
+            action='store_true',
+            help='Only notify staff users'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=NOTIFICATION_BULK_BATCH_SIZE,
+            help=f'Number of notifications per INSERT (default: {NOTIFICATION_BULK_BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.filter(is_active=True)
+        if options['staff_only']:
+            users = users.filter(is_staff=True)
+
+        created = create_notifications_bulk(
+            users,
+            notification_type='system',
+            title=options['title'],
+            message=options['message'],
+            batch_size=options['batch_size']
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'Announcement sent to {created} users'))
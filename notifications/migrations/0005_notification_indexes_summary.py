@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_queuedtask'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[('booking_request', 'Booking Request'), ('booking_confirmed', 'Booking Confirmed'), ('booking_canceled', 'Booking Canceled'), ('message_received', 'Message Received'), ('review_received', 'Review Received'), ('listing_approved', 'Listing Approved'), ('payment_received', 'Payment Received'), ('system', 'System Notification')], max_length=30, verbose_name='Notification Type')),
+                ('month', models.DateField(verbose_name='Month')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Count')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+            ],
+            options={
+                'verbose_name': 'Notification Summary',
+                'verbose_name_plural': 'Notification Summaries',
+                'ordering': ['-month'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', '-created_at'], name='notif_user_read_created'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at'], name='notif_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['is_read', 'created_at'], name='notif_read_created'),
+        ),
+        migrations.AddField(
+            model_name='notificationsummary',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_summaries', to=settings.AUTH_USER_MODEL, verbose_name='User'),
+        ),
+        migrations.AddConstraint(
+            model_name='notificationsummary',
+            constraint=models.UniqueConstraint(fields=('user', 'notification_type', 'month'), name='unique_notification_summary'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 class Notification(models.Model):
@@ -71,6 +72,14 @@ class Notification(models.Model):
         verbose_name = _("Notification")
         verbose_name_plural = _("Notifications")
         ordering = ['-created_at']
+        indexes = [
+            # Unread badge count and the unread dropdown
+            models.Index(fields=['user', 'is_read', '-created_at'], name='notif_user_read_created'),
+            # Notification list, newest first
+            models.Index(fields=['user', '-created_at'], name='notif_user_created'),
+            # Retention scan for old read notifications
+            models.Index(fields=['is_read', 'created_at'], name='notif_read_created'),
+        ]
 
     def __str__(self):
         return f"{self.notification_type} - {self.title} - {self.user.username}"
@@ -81,6 +90,43 @@ class Notification(models.Model):
             self.is_read = True
             self.save(update_fields=['is_read'])
 
+            from .counters import decrement_unread
+            decrement_unread(self.user_id)
+
+class NotificationSummary(models.Model):
+    """
+    Counts of notifications removed by the retention job
+    (see notifications/retention.py), per user, type and month of creation.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='notification_summaries',
+        verbose_name=_("User")
+    )
+    notification_type = models.CharField(
+        _("Notification Type"),
+        max_length=30,
+        choices=Notification.NOTIFICATION_TYPES
+    )
+    month = models.DateField(_("Month"))
+    count = models.PositiveIntegerField(_("Count"), default=0)
+    updated_at = models.DateTimeField(_("Updated At"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("Notification Summary")
+        verbose_name_plural = _("Notification Summaries")
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'notification_type', 'month'],
+                name='unique_notification_summary'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.notification_type} - {self.user_id} - {self.month:%Y-%m}: {self.count}"
+
 class EmailTemplate(models.Model):
     """
     Model for storing email templates
@@ -94,4 +140,39 @@ class EmailTemplate(models.Model):
         verbose_name_plural = _("Email Templates")
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class QueuedTask(models.Model):
+    """
+    Background task stored in the database and executed by the
+    run_task_worker command (see notifications/task_queue.py)
+    """
+    STATUS_CHOICES = [
+        ('pending', _('Pending')),
+        ('running', _('Running')),
+        ('dead', _('Dead')),
+    ]
+
+    name = models.CharField(_("Task"), max_length=255)
+    args = models.JSONField(_("Arguments"), default=list, blank=True)
+    kwargs = models.JSONField(_("Keyword Arguments"), default=dict, blank=True)
+    status = models.CharField(_("Status"), max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(_("Attempts"), default=0)
+    max_attempts = models.PositiveIntegerField(_("Max Attempts"), default=5)
+    run_at = models.DateTimeField(_("Run At"), default=timezone.now)
+    locked_by = models.CharField(_("Locked By"), max_length=100, blank=True)
+    locked_at = models.DateTimeField(_("Locked At"), null=True, blank=True)
+    last_error = models.TextField(_("Last Error"), blank=True)
+    created_at = models.DateTimeField(_("Created At"), auto_now_add=True)
+    updated_at = models.DateTimeField(_("Updated At"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("Queued Task")
+        verbose_name_plural = _("Queued Tasks")
+        ordering = ['run_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status}, attempt {self.attempts}/{self.max_attempts})"
@@ -0,0 +1,52 @@
+"""
+Unread counter push.
+
+Every open tab used to poll the notification and message badge endpoints
+every 30 seconds. Now the navbar keeps a WebSocket to UnreadCountConsumer
+(ws/notifications/) and only polls while it is disconnected.
+
+When a user's notifications or messages change, push_unread_changed() sends
+an "unread.changed" event to the user's group once the transaction
+commits. Each connected consumer then reads the current counts and sends
+them to its tab, so users without an open tab cost nothing.
+"""
+import logging
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def user_group(user_id):
+    return f'unread_{user_id}'
+
+
+def unread_counts(user_id):
+    from chat.state import total_unread_count
+    from .counters import get_unread_count
+    return {
+        'notifications': get_unread_count(user_id),
+        'messages': total_unread_count(user_id),
+    }
+
+
+def _send(user_ids):
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        for user_id in user_ids:
+            async_to_sync(channel_layer.group_send)(user_group(user_id), {'type': 'unread.changed'})
+    except Exception as e:
+        # Clients fall back to polling; a push must never break the write
+        logger.warning(f"Could not push unread counts: {e}")
+
+
+def push_unread_changed(*user_ids):
+    """Tell the users' open tabs to refresh their unread counts"""
+    user_ids = set(user_ids)
+    if user_ids:
+        transaction.on_commit(lambda: _send(user_ids))
@@ -0,0 +1,133 @@
+"""
+Notification retention.
+
+Read notifications older than the retention period (NOTIFICATION_RETENTION_DAYS,
+90 days by default) are deleted in batches so the notifications table, and
+with it the list and badge queries, does not grow without bound. Before a
+batch is deleted its rows are counted per user, type and month of creation
+into NotificationSummary, so totals survive the purge. Unread notifications
+are never removed.
+
+Each batch is one transaction that takes the oldest matching rows (an index
+range scan on (is_read, created_at)), adds them to the summaries and
+deletes them; see the purge_notifications management command.
+"""
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_DAYS = 90
+DEFAULT_BATCH_SIZE = 1000
+
+
+def retention_days():
+    return getattr(settings, 'NOTIFICATION_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+
+
+@dataclass
+class PurgeStats:
+    """Totals of a retention run"""
+    batches: int = 0
+    deleted: int = 0
+    by_type: Counter = field(default_factory=Counter)
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+
+def purgeable_notifications(cutoff):
+    from .models import Notification
+    return Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+
+
+def _month(created_at):
+    return timezone.localtime(created_at).date().replace(day=1)
+
+
+def add_to_summaries(counts):
+    """Add {(user_id, notification_type, month): count} to NotificationSummary"""
+    from .models import NotificationSummary
+
+    NotificationSummary.objects.bulk_create([
+        NotificationSummary(user_id=user_id, notification_type=notification_type, month=month)
+        for user_id, notification_type, month in counts
+    ], ignore_conflicts=True)
+
+    for (user_id, notification_type, month), count in counts.items():
+        NotificationSummary.objects.filter(
+            user_id=user_id,
+            notification_type=notification_type,
+            month=month
+        ).update(count=F('count') + count)
+
+
+def purge_batch(cutoff, batch_size=DEFAULT_BATCH_SIZE):
+    """Summarize and delete the oldest batch of purgeable notifications; returns their types"""
+    from .models import Notification
+
+    with transaction.atomic():
+        rows = list(
+            purgeable_notifications(cutoff)
+            .order_by('created_at')
+            .values_list('pk', 'user_id', 'notification_type', 'created_at')[:batch_size]
+        )
+        if not rows:
+            return Counter()
+
+        add_to_summaries(Counter(
+            (user_id, notification_type, _month(created_at))
+            for pk, user_id, notification_type, created_at in rows
+        ))
+        Notification.objects.filter(pk__in=[row[0] for row in rows]).delete()
+
+    return Counter(notification_type for pk, user_id, notification_type, created_at in rows)
+
+
+def count_purgeable(cutoff):
+    """What a run would delete, per notification type (one GROUP BY query)"""
+    return Counter(dict(
+        purgeable_notifications(cutoff)
+        .order_by()
+        .values_list('notification_type')
+        .annotate(total=Count('pk'))
+    ))
+
+
+def purge_notifications(days=None, batch_size=DEFAULT_BATCH_SIZE, now=None, on_batch=None):
+    """
+    Delete read notifications older than days in batches and return the
+    PurgeStats. on_batch(stats) is called after each batch.
+    """
+    days = retention_days() if days is None else days
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    stats = PurgeStats()
+
+    while True:
+        deleted = purge_batch(cutoff, batch_size)
+        if not deleted:
+            break
+        stats.batches += 1
+        stats.deleted += sum(deleted.values())
+        stats.by_type.update(deleted)
+        if on_batch:
+            on_batch(stats)
+        if sum(deleted.values()) < batch_size:
+            break
+
+    logger.info(
+        f"Notification retention: {stats.deleted} read notifications older than "
+        f"{days} days deleted in {stats.batches} batches ({stats.elapsed:.2f}s)"
+    )
+    return stats
+
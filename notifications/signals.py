@@ -5,12 +5,16 @@ This module contains signal handlers for notification-related events
 and connections to other app signals that should generate notifications.
 """
 
-from django.db.models.signals import post_save, pre_save
-from django.dispatch import receiver
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+# Sent once per bulk insert (see notifications.tasks.save_notifications_bulk)
+# with user_ids (set of recipients) and count instead of a post_save per row
+notifications_created = Signal()
+
 # Try to import models - they might not be loaded during startup
 try:
     from .models import Notification
@@ -22,22 +26,37 @@ except ImportError:
 
 # Only register signals if models are available
 if MODELS_AVAILABLE:
+    @receiver(post_save, sender=Notification)
+    def count_new_notification(sender, instance, created, **kwargs):
+        """Keep the recipient's cached unread counter in step"""
+        if created and not instance.is_read:
+            from .counters import increment_unread
+            increment_unread(instance.user_id)
+
+    @receiver(post_delete, sender=Notification)
+    def uncount_deleted_notification(sender, instance, **kwargs):
+        if not instance.is_read:
+            from .counters import decrement_unread
+            decrement_unread(instance.user_id)
+
+    @receiver(notifications_created)
+    def count_bulk_notifications(sender, user_ids, **kwargs):
+        """Bulk inserts skip post_save; recount the recipients lazily"""
+        from .counters import invalidate_unread
+        invalidate_unread(*user_ids)
+
     @receiver(post_save, sender=Message)
     def create_message_notification(sender, instance, created, **kwargs):
         """
         Create a notification when a new message is received.
         """
-        if created and instance.sender != instance.conversation.participants.all():
-            # Create notifications for all other participants
-            for user in instance.conversation.participants.all():
-                if user != instance.sender:
-                    Notification.objects.create(
-                        user=user,
-                        notification_type='message_received',
-                        title=f"New message",
-                        message=f"New message from {instance.sender.username}",
-                        conversation=instance.conversation,
-                    )
+        if created:
+            from .tasks import create_message_notifications
+
+            # Notify all other participants; the bulk insert also pushes
+            # their new unread message count to open tabs. Participant ids
+            # only, so posting a message never loads the conversation.
+            create_message_notifications([instance])
 
     @receiver(pre_save, sender=Booking)
     def store_booking_original_status(sender, instance, **kwargs):
@@ -0,0 +1,205 @@
+"""
+Database-backed task queue.
+
+Functions decorated with @task get a .delay(*args, **kwargs) method that
+stores a QueuedTask row instead of running the function. The
+run_task_worker management command picks the rows up and executes them, so
+slow work (SMTP, fan-out notifications) never runs inside a request.
+
+    * Arguments must be JSON serializable; model instances are stored as
+      references and loaded again by the worker.
+    * Tasks are claimed with a conditional UPDATE, so any number of workers
+      (and threads) can share a queue on SQLite or Postgres without an
+      external broker.
+    * Failed tasks are retried with exponential backoff. After max_attempts
+      (or on a permanent error such as a deleted referenced object) the task
+      is dead-lettered: it stays in the table with status 'dead' and its
+      last error, and can be requeued from the admin.
+    * Every worker periodically requeues tasks left 'running' by a worker
+      that died; a task abandoned on its last attempt is dead-lettered, so
+      a task that kills its worker is not retried forever.
+
+Set TASK_QUEUE_EAGER = True to run tasks inline (e.g. in tests).
+"""
+import logging
+import random
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import models
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Backoff before retry N is BACKOFF_BASE_SECONDS * 2 ** (N - 1), capped
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 6 * 60 * 60
+
+# Running tasks locked longer than this are considered abandoned by a dead worker
+DEFAULT_LOCK_TIMEOUT = 15 * 60
+
+# How often a worker looks for abandoned tasks
+STALE_CHECK_INTERVAL = 60
+
+MODEL_REFERENCE_KEY = '__model__'
+
+
+class PermanentTaskError(Exception):
+    """Raised by a task that must not be retried"""
+
+
+def task(func=None, *, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Register func as a queueable task and give it a .delay() method"""
+    def decorator(func):
+        name = f'{func.__module__}.{func.__name__}'
+
+        def delay(*args, **kwargs):
+            return enqueue(name, args, kwargs, max_attempts=max_attempts)
+
+        func.task_name = name
+        func.delay = delay
+        return func
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def _encode(value):
+    if isinstance(value, models.Model):
+        return {MODEL_REFERENCE_KEY: value._meta.label, 'pk': value.pk}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict) and MODEL_REFERENCE_KEY in value:
+        model = apps.get_model(value[MODEL_REFERENCE_KEY])
+        return model._default_manager.get(pk=value['pk'])
+    return value
+
+
+def enqueue(name, args=(), kwargs=None, max_attempts=DEFAULT_MAX_ATTEMPTS, run_at=None):
+    """Store a task for the worker; returns the QueuedTask"""
+    from .models import QueuedTask
+
+    kwargs = kwargs or {}
+    if getattr(settings, 'TASK_QUEUE_EAGER', False):
+        import_string(name)(*args, **kwargs)
+        return None
+
+    return QueuedTask.objects.create(
+        name=name,
+        args=[_encode(arg) for arg in args],
+        kwargs={key: _encode(value) for key, value in kwargs.items()},
+        max_attempts=max_attempts,
+        run_at=run_at or timezone.now()
+    )
+
+
+def backoff_delay(attempts):
+    """Seconds to wait before the next attempt, with jitter"""
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(1, 1.25)
+
+
+def release_stale_tasks(lock_timeout=DEFAULT_LOCK_TIMEOUT):
+    """
+    Return tasks of crashed workers to the queue. A task that has used up
+    its attempts (it may be what crashes the worker) is dead-lettered
+    instead. Returns (requeued, dead_lettered).
+    """
+    from .models import QueuedTask
+
+    now = timezone.now()
+    stale = QueuedTask.objects.filter(
+        status='running',
+        locked_at__lt=now - timedelta(seconds=lock_timeout)
+    )
+    dead = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='dead',
+        locked_by='',
+        locked_at=None,
+        last_error='Abandoned by a worker that stopped while running it',
+        updated_at=now
+    )
+    requeued = stale.update(status='pending', locked_by='', locked_at=None, updated_at=now)
+    if dead:
+        logger.error(f"Dead-lettered {dead} tasks abandoned after their last attempt")
+    return requeued, dead
+
+
+def claim_tasks(worker_id, limit):
+    """
+    Atomically take up to limit due tasks for worker_id. A task whose
+    conditional UPDATE matches no row was taken by another worker.
+    """
+    from .models import QueuedTask
+
+    now = timezone.now()
+    candidates = QueuedTask.objects.filter(
+        status='pending',
+        run_at__lte=now
+    ).order_by('run_at', 'pk').values_list('pk', flat=True)[:limit]
+
+    claimed = []
+    for pk in list(candidates):
+        taken = QueuedTask.objects.filter(pk=pk, status='pending').update(
+            status='running',
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=F('attempts') + 1
+        )
+        if taken:
+            claimed.append(pk)
+    return claimed
+
+
+def execute_task(pk):
+    """Run one claimed task; returns 'done', 'retry' or 'dead'"""
+    from .models import QueuedTask
+
+    queued = QueuedTask.objects.get(pk=pk)
+    try:
+        func = import_string(queued.name)
+    except ImportError as e:
+        return _fail(queued, e, permanent=True)
+
+    try:
+        if getattr(func, 'task_name', None) != queued.name:
+            raise PermanentTaskError(f"{queued.name} is not a registered task")
+        args = [_decode(arg) for arg in queued.args]
+        kwargs = {key: _decode(value) for key, value in queued.kwargs.items()}
+        func(*args, **kwargs)
+    except (ObjectDoesNotExist, PermanentTaskError) as e:
+        return _fail(queued, e, permanent=True)
+    except Exception as e:
+        return _fail(queued, e)
+
+    queued.delete()
+    return 'done'
+
+
+def _fail(queued, error, permanent=False):
+    queued.last_error = f"{type(error).__name__}: {error}"
+    queued.locked_by = ''
+    queued.locked_at = None
+
+    if permanent or queued.attempts >= queued.max_attempts:
+        queued.status = 'dead'
+        logger.error(f"Task {queued.name} #{queued.pk} dead-lettered: {queued.last_error}")
+    else:
+        queued.status = 'pending'
+        queued.run_at = timezone.now() + timedelta(seconds=backoff_delay(queued.attempts))
+        logger.warning(
+            f"Task {queued.name} #{queued.pk} failed (attempt {queued.attempts}/"
+            f"{queued.max_attempts}), retrying at {queued.run_at}: {queued.last_error}"
+        )
+
+    queued.save(update_fields=['status', 'run_at', 'last_error', 'locked_by', 'locked_at', 'updated_at'])
+    return 'dead' if queued.status == 'dead' else 'retry'
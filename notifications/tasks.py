@@ -1,50 +1,54 @@
 """
 Async tasks for sending notifications
+
+Email delivery and in-app notification writes go through the database task
+queue (see notifications/task_queue.py) and are executed by the
+run_task_worker command, so request handlers only insert a queue row.
+Emails are sent through notifications/delivery.py, which reuses backend
+connections and batches bulk mailings.
 """
-from django.core.mail import send_mail
-from django.conf import settings
+from datetime import timedelta
+from itertools import islice
+
 from django.utils import timezone
 
-# In a real project, this would use Celery or a similar task queue
-# For simplicity in this project, we're implementing it as synchronous functions
+from .delivery import DeliveryInterrupted, OutgoingEmail, send_batch, send_email
+from .task_queue import backoff_delay, enqueue, task
 
-def send_email_notification(recipient_email, subject, message):
+NOTIFICATION_BULK_BATCH_SIZE = 1000
+
+@task
+def deliver_email(recipient_email, subject, message):
+    """Send an email; raising lets the queue retry with backoff"""
+    send_email(OutgoingEmail(recipient_email, subject, message))
+
+@task
+def deliver_email_batch(template, messages):
     """
-    Send an email notification
-    In a real app with Celery, this would be a @task-decorated function
+    Send a batch of [recipient, subject, body] messages over one connection.
+    If the connection breaks after some messages went out, only the rest
+    is queued again so nobody gets a duplicate.
     """
+    emails = [OutgoingEmail(recipient, subject, body, template) for recipient, subject, body in messages]
     try:
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL or 'noreply@rentalapp.com',
-            recipient_list=[recipient_email],
-            fail_silently=False,
+        send_batch(emails, template, emails[0].provider if emails else '')
+    except DeliveryInterrupted as e:
+        if not (e.report.sent or e.report.rejected):
+            raise e.error
+        enqueue(
+            deliver_email_batch.task_name,
+            (template, [[email.recipient, email.subject, email.body] for email in e.remaining]),
+            run_at=timezone.now() + timedelta(seconds=backoff_delay(1))
         )
-        return True
-    except Exception as e:
-        print(f"Error sending email: {e}")
-        return False
 
-def create_notification(user, notification_type, title, message, **kwargs):
+def send_email_notification(recipient_email, subject, message):
     """
-    Create a notification in the database
-    In a real app with Celery, this would be a @task-decorated function
+    Queue an email notification
     """
-    from notifications.models import Notification
-
-    try:
-        notification = Notification.objects.create(
-            user=user,
-            notification_type=notification_type,
-            title=title,
-            message=message,
-            **kwargs
-        )
-        return notification
-    except Exception as e:
-        print(f"Error creating notification: {e}")
-        return None
+    if not recipient_email:
+        return False
+    deliver_email.delay(recipient_email, subject, message)
+    return True
 
 def send_booking_request_notification(booking):
     """Send notification for new booking request"""
@@ -248,11 +252,12 @@ def send_new_review_notification(review):
         listing=listing
     )
 
-def create_notification(user, notification_type, title, message, booking=None, listing=None, conversation=None, review=None):
+@task
+def deliver_notification(user, notification_type, title, message, booking=None, listing=None, conversation=None, review=None):
     """Create an in-app notification for a user"""
     from .models import Notification
 
-    notification = Notification.objects.create(
+    Notification.objects.create(
         user=user,
         notification_type=notification_type,
         title=title,
@@ -262,7 +267,95 @@ def create_notification(user, notification_type, title, message, booking=None, l
         conversation=conversation,
         review=review
     )
-    return notification
+
+def create_notification(user, notification_type, title, message, booking=None, listing=None, conversation=None, review=None):
+    """Queue an in-app notification for a user"""
+    return deliver_notification.delay(
+        user, notification_type, title, message,
+        booking=booking,
+        listing=listing,
+        conversation=conversation,
+        review=review
+    )
+
+def save_notifications_bulk(notifications, batch_size=NOTIFICATION_BULK_BATCH_SIZE):
+    """
+    Insert prepared (unsaved) notifications with chunked bulk_create and send
+    a single notifications_created signal; returns the number created
+    """
+    from .models import Notification
+    from .signals import notifications_created
+
+    notifications = iter(notifications)
+    user_ids = set()
+    count = 0
+    while True:
+        chunk = list(islice(notifications, batch_size))
+        if not chunk:
+            break
+        Notification.objects.bulk_create(chunk)
+        user_ids.update(notification.user_id for notification in chunk)
+        count += len(chunk)
+
+    if count:
+        notifications_created.send(sender=Notification, user_ids=user_ids, count=count)
+    return count
+
+def create_notifications_bulk(users, notification_type, title, message, batch_size=NOTIFICATION_BULK_BATCH_SIZE, **related):
+    """
+    Create the same in-app notification for many users (a queryset, or an
+    iterable of users or user ids). related takes booking, listing,
+    conversation and review like create_notification.
+    """
+    from django.db.models import QuerySet
+    from .models import Notification
+
+    if isinstance(users, QuerySet):
+        user_ids = users.values_list('pk', flat=True).iterator(chunk_size=batch_size)
+    else:
+        user_ids = (getattr(user, 'pk', user) for user in users)
+
+    return save_notifications_bulk(
+        (
+            Notification(
+                user_id=user_id,
+                notification_type=notification_type,
+                title=title,
+                message=message,
+                **related
+            )
+            for user_id in user_ids
+        ),
+        batch_size=batch_size
+    )
+
+def create_message_notifications(messages):
+    """
+    Notify the other participants of saved chat messages (possibly of
+    several conversations) with one participants query and one bulk insert
+    """
+    from chat.models import Conversation
+    from .models import Notification
+
+    participants = {}
+    rows = Conversation.participants.through.objects.filter(
+        conversation_id__in={message.conversation_id for message in messages}
+    ).values_list('conversation_id', 'user_id')
+    for conversation_id, user_id in rows:
+        participants.setdefault(conversation_id, []).append(user_id)
+
+    return save_notifications_bulk(
+        Notification(
+            user_id=user_id,
+            notification_type='message_received',
+            title="New message",
+            message=f"New message from {message.sender.username}",
+            conversation_id=message.conversation_id
+        )
+        for message in messages
+        for user_id in participants.get(message.conversation_id, [])
+        if user_id != message.sender_id
+    )
 
 def send_listing_approved_notification(listing):
     """Send notification when listing is approved"""
@@ -2,16 +2,17 @@ from django import template
 from django.utils.safestring import mark_safe
 from django.template.loader import render_to_string
 
+from notifications.counters import unread_count_for_request
+
 register = template.Library()
 
 @register.simple_tag(takes_context=True)
 def notification_count(context):
-    """Return the number of unread notifications"""
-    user = context['request'].user
-    if user.is_authenticated:
-        count = user.notifications.filter(is_read=False).count()
-        return count
-    return 0
+    """Return the number of unread notifications (one cache lookup per request)"""
+    request = context.get('request')
+    if request is None:
+        return 0
+    return unread_count_for_request(request)
 
 @register.simple_tag(takes_context=True)
 def notification_badge(context):
@@ -9,5 +9,6 @@ urlpatterns = [
     path('mark-all-read/', views.mark_all_read, name='mark_all_read'),
     path('get-unread-count/', views.get_unread_count, name='get_unread_count'),
     path('api/unread-count/', views.get_unread_count_json, name='get_unread_count_json'),
+    path('api/list/', views.notification_list_json, name='notification_list_json'),
     path('api/recent/', views.recent_notifications, name='recent_notifications'),
 ]
@@ -1,18 +1,65 @@
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.contrib import messages
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
+from utils.pagination import InvalidCursor, clamp_page_size, keyset_page
+from .counters import reset_unread, unread_count_for_request
 from .models import Notification
+from .templatetags.notify_tags import notification_target_url
+
+def _notification_page(request):
+    """Keyset page of the user's notifications, newest first"""
+    notifications = request.user.notifications.select_related(
+        'booking', 'listing', 'conversation', 'review__listing'
+    )
+    page_size = clamp_page_size(
+        request.GET.get('page_size'),
+        default=getattr(settings, 'NOTIFICATIONS_PAGE_SIZE', 20)
+    )
+    return keyset_page(notifications, request.GET.get('cursor'), page_size)
 
 @login_required
 def notification_list(request):
     """View for listing user notifications"""
-    # Get user's notifications, newest first
-    notifications = request.user.notifications.all().order_by('-created_at')
-    
+    try:
+        page = _notification_page(request)
+    except InvalidCursor:
+        return redirect('notifications:notification_list')
+
     return render(request, 'notifications/notification_list.html', {
-        'notifications': notifications
+        'notifications': page.items,
+        'next_cursor': page.next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
+        'page_size': request.GET.get('page_size', ''),
+    })
+
+@login_required
+def notification_list_json(request):
+    """JSON API for paging through notifications with ?cursor=&page_size="""
+    try:
+        page = _notification_page(request)
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'results': [
+            {
+                'id': notification.id,
+                'type': notification.notification_type,
+                'title': notification.title,
+                'message': notification.message,
+                'is_read': notification.is_read,
+                'created_at': notification.created_at.isoformat(),
+                'url': notification_target_url(notification),
+            }
+            for notification in page.items
+        ],
+        'next_cursor': page.next_cursor,
+        'has_next': page.has_next,
     })
 
 @login_required
@@ -32,6 +79,7 @@ def mark_notification_read(request, pk):
 def mark_all_read(request):
     """Mark all notifications as read"""
     request.user.notifications.filter(is_read=False).update(is_read=True)
+    reset_unread(request.user.pk)
     
     # If AJAX request, return JSON response
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
@@ -40,25 +88,36 @@ def mark_all_read(request):
     messages.success(request, "All notifications marked as read.")
     return redirect('notifications:notification_list')
 
+def _unread_etag(request):
+    # Polling fallback of the unread WebSocket: unchanged counts get a 304
+    return f'"notifications-{request.user.pk}-{unread_count_for_request(request)}"'
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_unread_etag)
 def get_unread_count(request):
     """API to get unread notification count"""
-    count = request.user.notifications.filter(is_read=False).count()
+    count = unread_count_for_request(request)
     
     # Always return HTML template for HTMX in navbar
     return render(request, 'notifications/partials/notification_badge.html', {'count': count})
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_unread_etag)
 def get_unread_count_json(request):
     """JSON API to get unread notification count"""
-    count = request.user.notifications.filter(is_read=False).count()
+    count = unread_count_for_request(request)
     return JsonResponse({'count': count})
 
 @login_required
 def recent_notifications(request):
     """API to get recent notifications for dropdown"""
     # Only show unread notifications in the dropdown
-    notifications = request.user.notifications.filter(is_read=False).order_by('-created_at')[:5]
+    if unread_count_for_request(request):
+        notifications = request.user.notifications.filter(is_read=False).order_by('-created_at')[:5]
+    else:
+        notifications = Notification.objects.none()
     return render(request, 'notifications/partials/recent_notifications.html', {
         'notifications': notifications
     })
@@ -8,6 +8,7 @@ from .models import (
     SubscriptionPlan, UserSubscription, SubscriptionUsage,
     SubscriptionLog, DefaultSubscriptionSettings
 )
+from .entitlements import invalidate_entitlements
 
 @admin.register(SubscriptionPlan)
 class SubscriptionPlanAdmin(admin.ModelAdmin):
@@ -124,6 +125,7 @@ class UserSubscriptionAdmin(admin.ModelAdmin):
     def activate_subscription(self, request, queryset):
         """Activate selected subscriptions"""
         count = queryset.update(status='active')
+        invalidate_entitlements(*queryset.values_list('user_id', flat=True))
         self.message_user(request, f'{count} subscriptions activated.')
     activate_subscription.short_description = _('Activate selected subscriptions')
     
@@ -0,0 +1,232 @@
+"""
+Subscription analytics engine.
+
+The admin analytics page and its CSV export used to issue an aggregate and
+a count per day/month of the window plus per seasonal month (about a
+hundred queries for a two-year window). Here the whole report is built from
+a handful of grouped queries:
+
+    * one conditional aggregate over all subscriptions for the summary;
+    * one TruncDay/TruncMonth GROUP BY over the period for the time buckets
+      (seasonal data is folded from the same rows);
+    * one GROUP BY (plan, status) for the plan and status distributions;
+    * the ten most recent subscriptions;
+    * the signup cohort retention triangle (two grouped queries, see
+      subscriptions/cohorts.py).
+
+Missing buckets are zero-filled in Python. Results are memoized per
+(start, end) window for ANALYTICS_CACHE_TTL seconds, so the page and the
+export requested right after it share one computation.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth
+from django.utils import timezone
+
+ANALYTICS_CACHE_TTL = 60
+
+# Windows up to this many days are reported per day, longer ones per month
+DAILY_BUCKETS_MAX_DAYS = 7
+
+DEFAULT_PERIOD_DAYS = 365
+
+SEASONAL_MONTH_NAMES = [
+    '', 'Январь', 'Февраль', 'Март', 'Апрель', 'Май', 'Июнь',
+    'Июль', 'Август', 'Сентябрь', 'Октябрь', 'Ноябрь', 'Декабрь'
+]
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    if isinstance(value, datetime):
+        # Same conversion the __date lookups apply to datetimes
+        if timezone.is_aware(value):
+            value = timezone.make_naive(value)
+        return value.date()
+    return value
+
+
+def resolve_period(start_date=None, end_date=None, days=None):
+    """Return the (start, end) dates of the requested analytics window"""
+    if start_date and end_date:
+        return _as_date(start_date), _as_date(end_date)
+
+    end_date = timezone.now().date()
+    if days:
+        return end_date - timedelta(days=int(days)), end_date
+    return end_date - timedelta(days=DEFAULT_PERIOD_DAYS), end_date
+
+
+def _next_month(day):
+    if day.month == 12:
+        return day.replace(year=day.year + 1, month=1)
+    return day.replace(month=day.month + 1)
+
+
+def _period_filter(start_date, end_date):
+    return Q(created_at__date__gte=start_date, created_at__date__lte=end_date)
+
+
+def summary_stats(start_date, end_date):
+    """Summary counters for all subscriptions and for the period, in one query"""
+    from .models import UserSubscription
+
+    in_period = _period_filter(start_date, end_date)
+    totals = UserSubscription.objects.aggregate(
+        total_subscriptions=Count('id'),
+        active_subscriptions=Count('id', filter=Q(status='active')),
+        expired_subscriptions=Count('id', filter=Q(status='expired')),
+        canceled_subscriptions=Count('id', filter=Q(status='canceled')),
+        period_subscriptions=Count('id', filter=in_period),
+        total_revenue=Sum('amount_paid'),
+        period_revenue=Sum('amount_paid', filter=in_period),
+        average_subscription_value=Avg('amount_paid', filter=in_period),
+    )
+    for field in ('total_revenue', 'period_revenue', 'average_subscription_value'):
+        totals[field] = float(totals[field] or 0)
+    return totals
+
+
+def bucket_totals(period_subscriptions, daily):
+    """{bucket date: (revenue, subscriptions)} from a single GROUP BY"""
+    trunc = TruncDay if daily else TruncMonth
+    rows = period_subscriptions.annotate(
+        bucket=trunc('created_at')
+    ).values('bucket').annotate(
+        revenue=Sum('amount_paid'),
+        subscriptions=Count('id')
+    ).order_by()
+
+    totals = {}
+    for row in rows:
+        bucket = row['bucket']
+        if isinstance(bucket, datetime):
+            bucket = bucket.date()
+        totals[bucket] = (row['revenue'] or Decimal('0'), row['subscriptions'])
+    return totals
+
+
+def revenue_series(totals, start_date, end_date, daily):
+    """Zero-filled revenue series over the window"""
+    series = []
+    if daily:
+        for i in range((end_date - start_date).days + 1):
+            day = start_date + timedelta(days=i)
+            revenue, subscriptions = totals.get(day, (0, 0))
+            series.append({
+                'label': day.strftime('%Y-%m-%d'),
+                'month_name': day.strftime('%d %b'),
+                'revenue': float(revenue),
+                'subscriptions': subscriptions
+            })
+        return series
+
+    month = start_date.replace(day=1)
+    while month <= end_date:
+        revenue, subscriptions = totals.get(month, (0, 0))
+        series.append({
+            'label': month.strftime('%Y-%m'),
+            'month_name': month.strftime('%b %Y'),
+            'revenue': float(revenue),
+            'subscriptions': subscriptions
+        })
+        month = _next_month(month)
+    return series
+
+
+def seasonal_series(totals):
+    """Revenue per calendar month, folded from the bucket totals"""
+    revenue = defaultdict(Decimal)
+    subscriptions = defaultdict(int)
+    for bucket, (bucket_revenue, bucket_count) in totals.items():
+        revenue[bucket.month] += bucket_revenue
+        subscriptions[bucket.month] += bucket_count
+
+    return [
+        {
+            'month': month_num,
+            'month_name': SEASONAL_MONTH_NAMES[month_num],
+            'total_revenue': float(revenue[month_num]),
+            'subscriptions': subscriptions[month_num],
+            'avg_revenue': float(revenue[month_num] / max(subscriptions[month_num], 1))
+        }
+        for month_num in range(1, 13)
+    ]
+
+
+def distributions(period_subscriptions):
+    """Plan and status distributions of the period from one grouped query"""
+    rows = period_subscriptions.values('plan__name', 'status').annotate(
+        count=Count('id')
+    ).order_by()
+
+    plans = defaultdict(int)
+    statuses = defaultdict(int)
+    for row in rows:
+        plans[row['plan__name']] += row['count']
+        statuses[row['status']] += row['count']
+
+    plans_distribution = dict(sorted(plans.items(), key=lambda item: -item[1]))
+    return plans_distribution, dict(statuses)
+
+
+def recent_subscriptions(period_subscriptions, limit=10):
+    recent = period_subscriptions.select_related('user', 'plan').order_by('-created_at')[:limit]
+    return [
+        {
+            'user': sub.user.username,
+            'plan': sub.plan.name,
+            'status': sub.status,
+            'start_date': sub.start_date.isoformat() if sub.start_date else None,
+            'end_date': sub.end_date.isoformat() if sub.end_date else None,
+            'amount_paid': float(sub.amount_paid),
+            'auto_renew': sub.auto_renew
+        }
+        for sub in recent
+    ]
+
+
+def compute_analytics(start_date, end_date):
+    """Build the analytics report for the window without caching"""
+    from .cohorts import cohort_matrix
+    from .models import UserSubscription
+
+    period_subscriptions = UserSubscription.objects.filter(_period_filter(start_date, end_date))
+
+    period_days = (end_date - start_date).days
+    daily = period_days <= DAILY_BUCKETS_MAX_DAYS
+    if period_days < 0:
+        totals = {}
+    else:
+        totals = bucket_totals(period_subscriptions, daily)
+
+    plans_distribution, status_distribution = distributions(period_subscriptions)
+
+    return {
+        'summary': summary_stats(start_date, end_date),
+        'monthly_revenue': revenue_series(totals, start_date, end_date, daily),
+        'plans_distribution': plans_distribution,
+        'seasonal_data': seasonal_series(totals),
+        'recent_subscriptions': recent_subscriptions(period_subscriptions),
+        'status_distribution': status_distribution,
+        'cohorts': cohort_matrix(start_date, end_date),
+        'period': {
+            'start': start_date.isoformat(),
+            'end': end_date.isoformat()
+        }
+    }
+
+
+def get_analytics(start_date, end_date):
+    """Analytics report for the window, memoized for ANALYTICS_CACHE_TTL seconds"""
+    key = f'subscriptions:analytics:{start_date.isoformat()}:{end_date.isoformat()}'
+    data = cache.get(key)
+    if data is None:
+        data = compute_analytics(start_date, end_date)
+        cache.set(key, data, ANALYTICS_CACHE_TTL)
+    return data
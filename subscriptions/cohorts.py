@@ -0,0 +1,156 @@
+"""
+Signup-month cohort analytics for subscriptions.
+
+Users are grouped into cohorts by the month they joined. For every cohort
+we count the distinct users holding a subscription created in each month
+since signup (month offset 0 is conversion, later offsets are renewals and
+late conversions). The whole matrix comes from three grouped queries:
+
+    * cohort sizes: users per TruncMonth(date_joined);
+    * cohort activity: distinct subscribers per
+      (TruncMonth(user.date_joined), TruncMonth(created_at));
+    * renewals: the (user, month) pairs of the first two months after
+      signup, so that next-month retention counts only the users who
+      converted in the signup month and subscribed again (late converters
+      in month 1 are activity, not retention).
+
+The rows are pivoted in memory into the retention triangle, so the cost no
+longer grows with the number of months in the window.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+
+def _month(value):
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.replace(day=1)
+
+
+def months_between(start_month, end_month):
+    return (end_month.year - start_month.year) * 12 + end_month.month - start_month.month
+
+
+def _rate(part, whole):
+    return round(part / whole * 100, 2) if whole else 0
+
+
+def cohort_matrix(start_date, end_date):
+    """
+    Retention triangle for the cohorts that signed up between start_date
+    and end_date (both dates, whole calendar months).
+
+    Each cohort row holds, per month offset up to end_date, the number of
+    distinct subscribers and their share of the cohort in percent, and
+    renewed: how many of the signup-month subscribers subscribed again in
+    the following month.
+    """
+    from .models import UserSubscription
+
+    User = get_user_model()
+    first_month = _month(start_date)
+    last_month = _month(end_date)
+    if first_month > last_month:
+        return {'offsets': [], 'cohorts': []}
+
+    sizes = {}
+    size_rows = User.objects.filter(
+        date_joined__date__gte=first_month,
+        date_joined__date__lte=end_date
+    ).annotate(
+        cohort=TruncMonth('date_joined')
+    ).values('cohort').annotate(users=Count('id')).order_by()
+    for row in size_rows:
+        sizes[_month(row['cohort'])] = row['users']
+
+    subscriptions = UserSubscription.objects.filter(
+        created_at__date__gte=first_month,
+        created_at__date__lte=end_date,
+        user__date_joined__date__gte=first_month,
+        user__date_joined__date__lte=end_date
+    ).annotate(
+        cohort=TruncMonth('user__date_joined'),
+        month=TruncMonth('created_at')
+    )
+
+    activity = defaultdict(dict)
+    activity_rows = subscriptions.values('cohort', 'month').annotate(
+        users=Count('user', distinct=True)
+    ).order_by()
+    for row in activity_rows:
+        cohort = _month(row['cohort'])
+        offset = months_between(cohort, _month(row['month']))
+        if offset >= 0:
+            activity[cohort][offset] = row['users']
+
+    # Offsets 0 and 1 per user; only subscriptions created before the end
+    # of the month after signup can fall into them
+    user_offsets = defaultdict(set)
+    user_rows = subscriptions.filter(
+        created_at__lt=TruncMonth('user__date_joined') + timedelta(days=62)
+    ).values('user', 'cohort', 'month').annotate(n=Count('id')).order_by()
+    for row in user_rows:
+        cohort = _month(row['cohort'])
+        offset = months_between(cohort, _month(row['month']))
+        if offset in (0, 1):
+            user_offsets[(cohort, row['user'])].add(offset)
+
+    renewed = defaultdict(int)
+    for (cohort, _), offsets in user_offsets.items():
+        if offsets == {0, 1}:
+            renewed[cohort] += 1
+
+    cohorts = []
+    cohort_month = first_month
+    while cohort_month <= last_month:
+        size = sizes.get(cohort_month, 0)
+        counts = [
+            activity[cohort_month].get(offset, 0)
+            for offset in range(months_between(cohort_month, last_month) + 1)
+        ]
+        cohorts.append({
+            'month': cohort_month.isoformat(),
+            'label': cohort_month.strftime('%Y-%m'),
+            'size': size,
+            'subscribers': counts,
+            'retention': [_rate(count, size) for count in counts],
+            'renewed': renewed[cohort_month],
+        })
+        cohort_month = cohort_month.replace(
+            year=cohort_month.year + cohort_month.month // 12,
+            month=cohort_month.month % 12 + 1
+        )
+
+    return {
+        'offsets': list(range(months_between(first_month, last_month) + 1)),
+        'cohorts': cohorts,
+    }
+
+
+def conversion_series(matrix):
+    """
+    Per-cohort conversion (subscribed in the signup month) and next-month
+    retention (the share of signup-month subscribers who subscribed again
+    in the following month).
+    """
+    labels = []
+    conversion = []
+    retention = []
+    for cohort in matrix['cohorts']:
+        subscribers = cohort['subscribers']
+        converted = subscribers[0] if subscribers else 0
+        renewed = cohort['renewed']
+
+        labels.append(datetime.fromisoformat(cohort['month']).strftime('%B %Y'))
+        conversion.append(_rate(converted, cohort['size']))
+        retention.append(_rate(renewed, converted))
+
+    return {
+        'labels': labels,
+        'conversion': conversion,
+        'retention': retention
+    }
@@ -0,0 +1,104 @@
+"""
+Cached per-user subscription entitlements.
+
+Listing creation and the subscription APIs ask for a user's ad limits on
+almost every request. Entitlements are computed once (active listing count
+plus the current plan) and kept in the default cache for
+ENTITLEMENTS_CACHE_TTL seconds, or until the subscription ends if that is
+sooner. Listing and UserSubscription signals (see subscriptions/signals.py)
+invalidate the entry whenever one of its inputs changes.
+"""
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Optional
+
+from django.core.cache import cache
+from django.utils import timezone
+
+# Limits of users without an active subscription
+FREE_PLAN_NAME = 'Free'
+FREE_ADS_LIMIT = 2
+
+ENTITLEMENTS_CACHE_TTL = 300
+
+
+@dataclass(frozen=True)
+class Entitlements:
+    """What a user's subscription currently allows"""
+    current_ads: int
+    ads_limit: int
+    plan_name: str
+    subscription_status: str
+    expires_at: Optional[datetime] = None
+    days_remaining: Optional[int] = None
+
+    @property
+    def can_create_ad(self):
+        return self.current_ads < self.ads_limit
+
+    def as_limits(self):
+        """Dictionary in the format returned by SubscriptionService.get_ads_limits"""
+        limits = asdict(self)
+        limits['current'] = limits.pop('current_ads')
+        limits['limit'] = limits.pop('ads_limit')
+        if self.subscription_status == 'none':
+            del limits['expires_at'], limits['days_remaining']
+        return limits
+
+
+def _cache_key(user_id):
+    return f'subscriptions:entitlements:{user_id}'
+
+
+def compute_entitlements(user_id):
+    """Build entitlements from the database (two queries)"""
+    from listings.models import Listing
+    from .models import UserSubscription
+
+    now = timezone.now()
+    current_ads = Listing.objects.filter(host_id=user_id, is_active=True).count()
+    subscription = UserSubscription.objects.filter(
+        user_id=user_id,
+        status='active',
+        start_date__lte=now,
+        end_date__gte=now
+    ).select_related('plan').first()
+
+    if not subscription:
+        return Entitlements(
+            current_ads=current_ads,
+            ads_limit=FREE_ADS_LIMIT,
+            plan_name=FREE_PLAN_NAME,
+            subscription_status='none'
+        )
+
+    return Entitlements(
+        current_ads=current_ads,
+        ads_limit=subscription.plan.ads_limit,
+        plan_name=subscription.plan.name,
+        subscription_status='active' if subscription.is_active else 'expired',
+        expires_at=subscription.end_date,
+        days_remaining=subscription.days_remaining
+    )
+
+
+def get_entitlements(user_id):
+    """Return the user's entitlements, from cache when possible"""
+    key = _cache_key(user_id)
+    entitlements = cache.get(key)
+    if entitlements is None:
+        entitlements = compute_entitlements(user_id)
+
+        timeout = ENTITLEMENTS_CACHE_TTL
+        if entitlements.expires_at:
+            # Never serve a plan past its end date
+            seconds_left = int((entitlements.expires_at - timezone.now()).total_seconds())
+            timeout = max(1, min(timeout, seconds_left))
+        cache.set(key, entitlements, timeout)
+
+    return entitlements
+
+
+def invalidate_entitlements(*user_ids):
+    """Drop cached entitlements after a change to listings or subscriptions"""
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
@@ -1,10 +1,10 @@
 
 from django.core.management.base import BaseCommand
+from django.db import connection
 from django.utils import timezone
-from django.db import transaction
 from subscriptions.models import UserSubscription
 from subscriptions.services import NotificationService
-from subscriptions.models import SubscriptionLog
+from subscriptions.renewals import DEFAULT_BATCH_SIZE, run_pipeline
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,10 +23,30 @@ class Command(BaseCommand):
             action='store_true',
             help='Only send notifications, do not process renewals',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Number of subscriptions per batch (default: {DEFAULT_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of worker processes handling batches (default: 1)',
+        )
     
     def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
         dry_run = options['dry_run']
         notify_only = options['notify_only']
+        self.batch_size = max(1, options['batch_size'])
+        self.workers = max(1, options['workers'])
+
+        if self.workers > 1 and connection.vendor == 'sqlite':
+            # SQLite has a single writer, parallel batches would only fail on locks
+            self.stdout.write(self.style.WARNING('SQLite database - processing batches in a single worker'))
+            self.workers = 1
         
         if dry_run:
             self.stdout.write(self.style.WARNING('Running in DRY-RUN mode - no changes will be made'))
@@ -66,75 +86,33 @@ class Command(BaseCommand):
             logger.error(f"Error sending expiration notifications: {e}")
             self.stdout.write(self.style.ERROR(f'Error: {e}'))
     
+    def run_batches(self, task, dry_run):
+        def report(stats):
+            if self.verbosity > 1:
+                self.stdout.write(
+                    f'  batch {stats.batches}: {stats.processed} processed '
+                    f'({stats.throughput:.1f}/s)'
+                )
+
+        stats = run_pipeline(
+            task,
+            batch_size=self.batch_size,
+            workers=self.workers,
+            dry_run=dry_run,
+            on_batch=report
+        )
+        self.stdout.write(
+            f'  {stats.processed} subscriptions in {stats.batches} batches, '
+            f'{stats.elapsed:.2f}s ({stats.throughput:.1f} subscriptions/s)'
+        )
+        return stats
+
     def process_auto_renewals(self, dry_run=False):
         """Process automatic subscription renewals"""
-        now = timezone.now()
-        expired_auto_renew = UserSubscription.objects.filter(
-            status='active',
-            auto_renew=True,
-            end_date__lte=now
-        )
-        
-        renewed_count = 0
-        failed_count = 0
-        
-        for subscription in expired_auto_renew:
-            try:
-                if not dry_run:
-                    with transaction.atomic():
-                        success = subscription.renew()
-                        
-                        if success:
-                            NotificationService.send_renewal_success(subscription)
-                            SubscriptionLog.objects.create(
-                                subscription=subscription,
-                                action='renewed',
-                                description='Auto-renewal processed successfully',
-                                metadata={'renewal_date': now.isoformat()}
-                            )
-                            renewed_count += 1
-                        else:
-                            NotificationService.send_renewal_failed(
-                                subscription, 
-                                "Plan no longer available or auto-renewal disabled"
-                            )
-                            failed_count += 1
-                else:
-                    # Dry run - just count
-                    if subscription.plan.is_active:
-                        renewed_count += 1
-                    else:
-                        failed_count += 1
-                        
-            except Exception as e:
-                logger.error(f"Error renewing subscription {subscription.id}: {e}")
-                if not dry_run:
-                    NotificationService.send_renewal_failed(subscription, str(e))
-                failed_count += 1
-        
-        self.stdout.write(f'Auto-renewals: {renewed_count} successful, {failed_count} failed')
+        stats = self.run_batches('renew', dry_run)
+        self.stdout.write(f'Auto-renewals: {stats.renewed} successful, {stats.failed} failed')
     
     def mark_expired_subscriptions(self, dry_run=False):
         """Mark subscriptions as expired"""
-        now = timezone.now()
-        expired_subscriptions = UserSubscription.objects.filter(
-            status='active',
-            end_date__lt=now,
-            auto_renew=False
-        )
-        
-        count = expired_subscriptions.count()
-        
-        if not dry_run and count > 0:
-            expired_subscriptions.update(status='expired')
-            
-            # Log the expiration
-            for subscription in expired_subscriptions:
-                SubscriptionLog.objects.create(
-                    subscription=subscription,
-                    action='expired',
-                    description='Subscription expired automatically',
-                    metadata={'expiration_date': now.isoformat()}
-                )
-        
-        self.stdout.write(f'Marked {count} subscriptions as expired')
+        stats = self.run_batches('expire', dry_run)
+        self.stdout.write(f'Marked {stats.expired} subscriptions as expired')
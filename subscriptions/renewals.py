@@ -0,0 +1,241 @@
+"""
+Batched subscription renewal pipeline.
+
+Renewals and expirations are processed in keyset-paginated batches of
+subscription ids (ordered by primary key, so rows renewed or expired while
+the run is in progress are never revisited). Every batch runs in a single
+transaction: subscriptions are updated with bulk_update/update, their
+SubscriptionLog rows and user notifications are queued in memory and
+written with bulk_create at the end of the batch; failed-renewal emails go
+to the task queue as batched deliveries. Batches can be spread
+over a process pool (see the process_subscription_renewals command).
+"""
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .entitlements import invalidate_entitlements
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+
+@dataclass
+class BatchResult:
+    """Outcome of one processed batch"""
+    processed: int = 0
+    renewed: int = 0
+    failed: int = 0
+    expired: int = 0
+
+
+@dataclass
+class RunStats:
+    """Totals of a pipeline run"""
+    batches: int = 0
+    processed: int = 0
+    renewed: int = 0
+    failed: int = 0
+    expired: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    def add(self, result):
+        self.batches += 1
+        self.processed += result.processed
+        self.renewed += result.renewed
+        self.failed += result.failed
+        self.expired += result.expired
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def throughput(self):
+        """Processed subscriptions per second"""
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def due_for_renewal(now):
+    from .models import UserSubscription
+    return UserSubscription.objects.filter(
+        status='active',
+        auto_renew=True,
+        end_date__lte=now
+    )
+
+
+def due_for_expiration(now):
+    from .models import UserSubscription
+    return UserSubscription.objects.filter(
+        status='active',
+        end_date__lt=now,
+        auto_renew=False
+    )
+
+
+def id_batches(queryset, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield lists of primary keys using keyset pagination"""
+    last_pk = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return
+        yield ids
+        last_pk = ids[-1]
+
+
+def renew_batch(ids, now, dry_run=False):
+    """Renew the given subscriptions that are still due"""
+    from notifications.delivery import queue_emails
+    from notifications.tasks import save_notifications_bulk
+    from .models import SubscriptionLog, UserSubscription
+    from .services import NotificationService
+
+    result = BatchResult()
+    with transaction.atomic():
+        subscriptions = list(
+            due_for_renewal(now).filter(pk__in=ids).select_related('user', 'plan')
+        )
+        result.processed = len(subscriptions)
+
+        renewed = []
+        logs = []
+        notifications = []
+        for subscription in subscriptions:
+            if not subscription.plan.is_active:
+                result.failed += 1
+                notifications.append(NotificationService.renewal_failed(
+                    subscription,
+                    "Plan no longer available or auto-renewal disabled"
+                ))
+                continue
+
+            # Same period arithmetic as UserSubscription.renew()
+            subscription.start_date = subscription.end_date
+            subscription.end_date = subscription.start_date + timedelta(
+                days=subscription.plan.duration_days
+            )
+            subscription.status = 'active'
+            renewed.append(subscription)
+            logs.append(SubscriptionLog(
+                subscription=subscription,
+                action='renewed',
+                description='Auto-renewal processed successfully',
+                metadata={'renewal_date': now.isoformat()}
+            ))
+            notifications.append(NotificationService.renewal_success(subscription))
+        result.renewed = len(renewed)
+
+        if dry_run:
+            return result
+
+        UserSubscription.objects.bulk_update(renewed, ['start_date', 'end_date', 'status'])
+        SubscriptionLog.objects.bulk_create(logs)
+        save_notifications_bulk(notifications)
+        queue_emails(NotificationService.emails_for(
+            [notification for notification in notifications
+             if notification.notification_type == 'subscription_renewal_failed'],
+            'subscription_renewal_failed'
+        ))
+
+        user_ids = {subscription.user_id for subscription in renewed}
+        transaction.on_commit(lambda: invalidate_entitlements(*user_ids))
+
+    return result
+
+
+def expire_batch(ids, now, dry_run=False):
+    """Mark the given subscriptions expired if they still are due"""
+    from .models import SubscriptionLog, UserSubscription
+
+    result = BatchResult()
+    with transaction.atomic():
+        expiring = list(
+            due_for_expiration(now).filter(pk__in=ids).values_list('pk', 'user_id')
+        )
+        result.processed = result.expired = len(expiring)
+        if dry_run or not expiring:
+            return result
+
+        # Capture the rows before the update, afterwards they no longer match
+        expired_ids = [pk for pk, user_id in expiring]
+        UserSubscription.objects.filter(pk__in=expired_ids).update(status='expired')
+        SubscriptionLog.objects.bulk_create([
+            SubscriptionLog(
+                subscription_id=pk,
+                action='expired',
+                description='Subscription expired automatically',
+                metadata={'expiration_date': now.isoformat()}
+            )
+            for pk in expired_ids
+        ])
+
+        user_ids = {user_id for pk, user_id in expiring}
+        transaction.on_commit(lambda: invalidate_entitlements(*user_ids))
+
+    return result
+
+
+def _run_batch(task, ids, now, dry_run):
+    handler = renew_batch if task == 'renew' else expire_batch
+    try:
+        return handler(ids, now, dry_run)
+    except Exception as e:
+        # The batch transaction is rolled back, the next run retries it
+        logger.error(f"Error processing {task} batch {ids[0]}..{ids[-1]}: {e}")
+        return BatchResult(processed=len(ids), failed=len(ids))
+
+
+def _init_worker():
+    # Spawned workers start with an unconfigured Django
+    import django
+    django.setup()
+
+
+def run_pipeline(task, now=None, batch_size=DEFAULT_BATCH_SIZE, workers=1,
+                 dry_run=False, on_batch=None):
+    """
+    Process every due subscription for task ('renew' or 'expire') and
+    return the RunStats. on_batch(stats) is called after each batch.
+    """
+    now = now or timezone.now()
+    queryset = due_for_renewal(now) if task == 'renew' else due_for_expiration(now)
+    stats = RunStats()
+
+    if workers <= 1:
+        for ids in id_batches(queryset, batch_size):
+            stats.add(_run_batch(task, ids, now, dry_run))
+            if on_batch:
+                on_batch(stats)
+        return stats
+
+    import multiprocessing
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    # Spawned (not forked) workers never share the parent's database connection
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker) as pool:
+        pending = set()
+        for ids in id_batches(queryset, batch_size):
+            pending.add(pool.submit(_run_batch, task, ids, now, dry_run))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stats.add(future.result())
+                    if on_batch:
+                        on_batch(stats)
+        for future in pending:
+            stats.add(future.result())
+            if on_batch:
+                on_batch(stats)
+
+    return stats
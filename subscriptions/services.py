@@ -32,40 +32,17 @@ class SubscriptionService:
             logger.error(f"Error getting current subscription for user {user.id}: {e}")
             return None
 
+    @staticmethod
+    def get_entitlements(user_id):
+        """Get cached entitlements (ad limit, usage and plan) for user"""
+        from .entitlements import get_entitlements
+        return get_entitlements(user_id)
+
     @staticmethod
     def get_ads_limits(user_id):
         """Get ad limits for user"""
         try:
-            from django.contrib.auth import get_user_model
-            from listings.models import Listing
-            User = get_user_model()
-            user = User.objects.get(id=user_id)
-
-            # Count actual active listings from database
-            current_ads = Listing.objects.filter(
-                host=user,
-                is_active=True
-            ).count()
-
-            current_subscription = SubscriptionService.get_current_subscription(user)
-
-            if not current_subscription:
-                # Return free tier limits
-                return {
-                    'current': current_ads,
-                    'limit': 2,    # Free tier limit
-                    'plan_name': 'Free',
-                    'subscription_status': 'none'
-                }
-
-            return {
-                'current': current_ads,
-                'limit': current_subscription.plan.ads_limit,
-                'plan_name': current_subscription.plan.name,
-                'subscription_status': 'active' if current_subscription.is_active else 'expired',
-                'expires_at': current_subscription.end_date,
-                'days_remaining': current_subscription.days_remaining
-            }
+            return SubscriptionService.get_entitlements(user_id).as_limits()
         except Exception as e:
             logger.error(f"Error getting ads limits for user {user_id}: {e}")
             return {
@@ -78,13 +55,14 @@ class SubscriptionService:
     @staticmethod
     def can_create_ad(user_id):
         """Check if user can create a new ad"""
-        limits = SubscriptionService.get_ads_limits(user_id)
-
-        if limits['subscription_status'] == 'error':
+        try:
+            entitlements = SubscriptionService.get_entitlements(user_id)
+        except Exception as e:
+            logger.error(f"Error getting ads limits for user {user_id}: {e}")
             return False, "Ошибка проверки подписки"
 
-        if limits['current'] >= limits['limit']:
-            return False, f"Достигнут лимит объявлений ({limits['limit']}) для плана {limits['plan_name']}"
+        if not entitlements.can_create_ad:
+            return False, f"Достигнут лимит объявлений ({entitlements.ads_limit}) для плана {entitlements.plan_name}"
 
         return True, ""
 
@@ -146,182 +124,11 @@ class SubscriptionService:
     @staticmethod
     def get_analytics_data(start_date=None, end_date=None, days=None):
         """Get comprehensive analytics data for subscriptions"""
+        from .analytics import get_analytics, resolve_period
         try:
-            # Calculate date range
-            now = timezone.now()
-            if start_date and end_date:
-                if isinstance(start_date, str):
-                    start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                if isinstance(end_date, str):
-                    end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-            elif days:
-                # Calculate based on days parameter
-                end_date = now.date()
-                start_date = end_date - timedelta(days=int(days))
-            else:
-                # Default to last year
-                end_date = now.date()
-                start_date = end_date - timedelta(days=365)
-
+            start_date, end_date = resolve_period(start_date, end_date, days)
             logger.info(f"Analytics date range: {start_date} to {end_date}")
-
-            # Get filtered subscriptions for the specific period
-            period_subscriptions = UserSubscription.objects.filter(
-                created_at__date__gte=start_date,
-                created_at__date__lte=end_date
-            )
-
-            # Get all subscriptions for total counts
-            all_subscriptions = UserSubscription.objects.all()
-
-            logger.info(f"Found {period_subscriptions.count()} subscriptions in period, {all_subscriptions.count()} total")
-
-            # Summary statistics - use filtered data for period-specific metrics
-            summary = {
-                'total_subscriptions': all_subscriptions.count(),
-                'active_subscriptions': all_subscriptions.filter(status='active').count(),
-                'expired_subscriptions': all_subscriptions.filter(status='expired').count(),
-                'canceled_subscriptions': all_subscriptions.filter(status='canceled').count(),
-                'period_subscriptions': period_subscriptions.count(),
-                'total_revenue': float(all_subscriptions.aggregate(
-                    total=Sum('amount_paid')
-                )['total'] or 0),
-                'period_revenue': float(period_subscriptions.aggregate(
-                    total=Sum('amount_paid')
-                )['total'] or 0),
-                'average_subscription_value': float(period_subscriptions.aggregate(
-                    avg=Avg('amount_paid')
-                )['avg'] or 0)
-            }
-
-            # Monthly revenue data - use ONLY filtered period data
-            monthly_data = []
-
-            # Calculate how many months to show based on period
-            period_days = (end_date - start_date).days
-            if period_days <= 7:  # 1 week
-                # Show daily data for short periods
-                for i in range(period_days + 1):
-                    day = start_date + timedelta(days=i)
-                    day_subscriptions = period_subscriptions.filter(
-                        created_at__date=day
-                    )
-                    
-                    day_revenue = day_subscriptions.aggregate(
-                        total=Sum('amount_paid')
-                    )['total'] or 0
-
-                    monthly_data.append({
-                        'label': day.strftime('%Y-%m-%d'),
-                        'month_name': day.strftime('%d %b'),
-                        'revenue': float(day_revenue),
-                        'subscriptions': day_subscriptions.count()
-                    })
-            elif period_days <= 92:  # ~3 months
-                months_to_show = 3
-            elif period_days <= 366:  # ~1 year
-                months_to_show = 12
-            else:
-                months_to_show = 24
-
-            # For longer periods, show monthly data
-            if period_days > 7:
-                current_date = start_date.replace(day=1)  # Start from first day of start month
-                
-                while current_date <= end_date:
-                    # Calculate month end
-                    if current_date.month == 12:
-                        month_end = current_date.replace(year=current_date.year + 1, month=1)
-                    else:
-                        month_end = current_date.replace(month=current_date.month + 1)
-                    
-                    # Filter subscriptions for this month within our period
-                    month_subscriptions = period_subscriptions.filter(
-                        created_at__date__gte=max(current_date, start_date),
-                        created_at__date__lt=min(month_end, end_date + timedelta(days=1))
-                    )
-
-                    month_revenue = month_subscriptions.aggregate(
-                        total=Sum('amount_paid')
-                    )['total'] or 0
-
-                    monthly_data.append({
-                        'label': current_date.strftime('%Y-%m'),
-                        'month_name': current_date.strftime('%b %Y'),
-                        'revenue': float(month_revenue),
-                        'subscriptions': month_subscriptions.count()
-                    })
-                    
-                    # Move to next month
-                    current_date = month_end
-
-            # Plans distribution
-            plans_data = period_subscriptions.values(
-                'plan__name'
-            ).annotate(
-                count=Count('id')
-            ).order_by('-count')
-
-            plans_distribution = {}
-            for item in plans_data:
-                plans_distribution[item['plan__name']] = item['count']
-
-            # Seasonal data (monthly aggregation for filtered period)
-            seasonal_data = []
-            month_names = [
-                '', 'Январь', 'Февраль', 'Март', 'Апрель', 'Май', 'Июнь',
-                'Июль', 'Август', 'Сентябрь', 'Октябрь', 'Ноябрь', 'Декабрь'
-            ]
-
-            for month_num in range(1, 13):
-                # Only use subscriptions from filtered period
-                month_subs = period_subscriptions.filter(created_at__month=month_num)
-                month_revenue = month_subs.aggregate(total=Sum('amount_paid'))['total'] or 0
-                seasonal_data.append({
-                    'month': month_num,
-                    'month_name': month_names[month_num],
-                    'total_revenue': float(month_revenue),
-                    'subscriptions': month_subs.count(),
-                    'avg_revenue': float(month_revenue / max(month_subs.count(), 1))
-                })
-
-            # Recent subscriptions - from filtered period
-            recent_subscriptions = period_subscriptions.select_related('user', 'plan').order_by('-created_at')[:10]
-            recent_subscriptions_list = []
-            for sub in recent_subscriptions:
-                recent_subscriptions_list.append({
-                    'user': sub.user.username,
-                    'plan': sub.plan.name,
-                    'status': sub.status,
-                    'start_date': sub.start_date.isoformat() if sub.start_date else None,
-                    'end_date': sub.end_date.isoformat() if sub.end_date else None,
-                    'amount_paid': float(sub.amount_paid),
-                    'auto_renew': sub.auto_renew
-                })
-
-            # Status distribution - use filtered period data
-            status_data = period_subscriptions.values('status').annotate(
-                count=Count('id')
-            )
-            status_distribution = {}
-            for item in status_data:
-                status_distribution[item['status']] = item['count']
-                
-            logger.info(f"Status distribution: {status_distribution}")
-            logger.info(f"Monthly data count: {len(monthly_data)}")
-
-            return {
-                'summary': summary,
-                'monthly_revenue': monthly_data,
-                'plans_distribution': plans_distribution,
-                'seasonal_data': seasonal_data,
-                'recent_subscriptions': recent_subscriptions_list,
-                'status_distribution': status_distribution,
-                'period': {
-                    'start': start_date.isoformat() if hasattr(start_date, 'isoformat') else str(start_date),
-                    'end': end_date.isoformat() if hasattr(end_date, 'isoformat') else str(end_date)
-                }
-            }
+            return get_analytics(start_date, end_date)
         except Exception as e:
             logger.error(f"Error getting subscription analytics data: {e}")
             return {
@@ -331,6 +138,7 @@ class SubscriptionService:
                 'seasonal_data': [],
                 'recent_subscriptions': [],
                 'status_distribution': {},
+                'cohorts': {'offsets': [], 'cohorts': []},
                 'period': {}
             }
 
@@ -698,61 +506,8 @@ class SubscriptionService:
     @staticmethod
     def get_conversion_data(start_date, end_date):
         """Get conversion and retention data"""
-        from django.contrib.auth import get_user_model
-        from dateutil.relativedelta import relativedelta
-
-        User = get_user_model()
-
-        # Generate monthly data points
-        current = start_date
-        labels = []
-        conversion = []
-        retention = []
-
-        while current <= end_date:
-            month_end = current + relativedelta(months=1)
-
-            # Total users registered in this month
-            total_users = User.objects.filter(
-                date_joined__gte=current,
-                date_joined__lt=month_end
-            ).count()
-
-            # Users who subscribed in this month
-            subscribed_users = UserSubscription.objects.filter(
-                created_at__gte=current,
-                created_at__lt=month_end,
-                user__date_joined__gte=current,
-                user__date_joined__lt=month_end
-            ).values('user').distinct().count()
-
-            # Conversion rate
-            conv_rate = (subscribed_users / total_users * 100) if total_users > 0 else 0
-
-            # Retention: users who renewed after their first subscription
-            renewal_month = current + relativedelta(months=1)
-            renewed_users = UserSubscription.objects.filter(
-                created_at__gte=renewal_month,
-                created_at__lt=renewal_month + relativedelta(months=1),
-                user__in=UserSubscription.objects.filter(
-                    created_at__gte=current,
-                    created_at__lt=month_end
-                ).values('user')
-            ).values('user').distinct().count()
-
-            retention_rate = (renewed_users / subscribed_users * 100) if subscribed_users > 0 else 0
-
-            labels.append(current.strftime('%B %Y'))
-            conversion.append(round(conv_rate, 2))
-            retention.append(round(retention_rate, 2))
-
-            current = month_end
-
-        return {
-            'labels': labels,
-            'conversion': conversion,
-            'retention': retention
-        }
+        from .cohorts import cohort_matrix, conversion_series
+        return conversion_series(cohort_matrix(start_date, end_date))
 
     @staticmethod
     def get_arpu_data(subscriptions):
@@ -914,73 +669,92 @@ class NotificationService:
     @staticmethod
     def notify_expiring_subscriptions():
         """Send notifications for expiring subscriptions"""
+        from notifications.tasks import save_notifications_bulk
+
         expiring_subscriptions = UserSubscription.objects.filter(
             status='active',
             end_date__lte=timezone.now() + timedelta(days=3),
             end_date__gte=timezone.now()
-        )
+        ).select_related('user', 'plan')
 
-        for subscription in expiring_subscriptions:
-            NotificationService.send_expiration_warning(subscription)
+        from notifications.delivery import queue_emails
+
+        notifications = [
+            NotificationService.expiration_warning(subscription)
+            for subscription in expiring_subscriptions
+        ]
+        save_notifications_bulk(notifications)
+        queue_emails(NotificationService.emails_for(notifications, 'subscription_expiring'))
+        logger.info(f"Sent {len(notifications)} expiration warnings")
 
     @staticmethod
-    def send_expiration_warning(subscription):
-        """Send expiration warning notification"""
+    def emails_for(notifications, template):
+        """Email copies of in-app notifications for users with an address"""
+        from notifications.delivery import OutgoingEmail
+
+        return [
+            OutgoingEmail(notification.user.email, str(notification.title), notification.message, template)
+            for notification in notifications
+            if notification.user.email
+        ]
+
+    @staticmethod
+    def expiration_warning(subscription):
+        """Build (unsaved) expiration warning notification"""
         from notifications.models import Notification
 
-        Notification.objects.create(
+        return Notification(
             user=subscription.user,
             notification_type='subscription_expiring',
             title=_("Subscription Expiring Soon"),
             message=_(
                 "Your {} subscription will expire in {} days. "
                 "Renew now to continue enjoying premium features."
-            ).format(subscription.plan.name, subscription.days_remaining),
-            metadata={
-                'subscription_id': subscription.id,
-                'plan_name': subscription.plan.name,
-                'days_remaining': subscription.days_remaining
-            }
+            ).format(subscription.plan.name, subscription.days_remaining)
         )
 
-        logger.info(f"Sent expiration warning to user {subscription.user.username}")
-
     @staticmethod
-    def send_renewal_success(subscription):
-        """Send successful renewal notification"""
+    def renewal_success(subscription):
+        """Build (unsaved) successful renewal notification"""
         from notifications.models import Notification
 
-        Notification.objects.create(
+        return Notification(
             user=subscription.user,
             notification_type='subscription_renewed',
             title=_("Subscription Renewed Successfully"),
             message=_(
                 "Your {} subscription has been renewed successfully. "
                 "It will expire on {}."
-            ).format(subscription.plan.name, subscription.end_date.strftime('%B %d, %Y')),
-            metadata={
-                'subscription_id': subscription.id,
-                'plan_name': subscription.plan.name,
-                'end_date': subscription.end_date.isoformat()
-            }
+            ).format(subscription.plan.name, subscription.end_date.strftime('%B %d, %Y'))
         )
 
     @staticmethod
-    def send_renewal_failed(subscription, error_message):
-        """Send failed renewal notification"""
+    def renewal_failed(subscription, error_message):
+        """Build (unsaved) failed renewal notification"""
         from notifications.models import Notification
 
-        Notification.objects.create(
+        return Notification(
             user=subscription.user,
             notification_type='subscription_renewal_failed',
             title=_("Subscription Renewal Failed"),
             message=_(
                 "We couldn't renew your {} subscription automatically. "
                 "Please update your payment method or renew manually. Error: {}"
-            ).format(subscription.plan.name, error_message),
-            metadata={
-                'subscription_id': subscription.id,
-                'plan_name': subscription.plan.name,
-                'error_message': error_message
-            }
-        )
\ No newline at end of file
+            ).format(subscription.plan.name, error_message)
+        )
+
+    @staticmethod
+    def send_expiration_warning(subscription):
+        """Send expiration warning notification"""
+        NotificationService.expiration_warning(subscription).save()
+        logger.info(f"Sent expiration warning to user {subscription.user.username}")
+
+    @staticmethod
+    def send_renewal_success(subscription):
+        """Send successful renewal notification"""
+        NotificationService.renewal_success(subscription).save()
+
+    @staticmethod
+    def send_renewal_failed(subscription, error_message):
+        """Send failed renewal notification"""
+        NotificationService.renewal_failed(subscription, error_message).save()
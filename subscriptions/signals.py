@@ -5,6 +5,7 @@ from django.utils import timezone
 from listings.models import Listing
 from .services import SubscriptionService
 from .models import UserSubscription, SubscriptionLog
+from .entitlements import invalidate_entitlements
 import logging
 
 logger = logging.getLogger(__name__)
@@ -35,6 +36,18 @@ def update_subscription_usage_on_listing_delete(sender, instance, **kwargs):
         SubscriptionService.update_usage_on_ad_deleted(instance.host)
         logger.info(f"Updated subscription usage for user {instance.host.username} - listing deleted")
 
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+def invalidate_entitlements_on_listing_change(sender, instance, **kwargs):
+    """Active listing count is part of the host's cached entitlements"""
+    invalidate_entitlements(instance.host_id)
+
+@receiver(post_save, sender=UserSubscription)
+@receiver(post_delete, sender=UserSubscription)
+def invalidate_entitlements_on_subscription_change(sender, instance, **kwargs):
+    """Plan and status are part of the user's cached entitlements"""
+    invalidate_entitlements(instance.user_id)
+
 @receiver(post_save, sender=UserSubscription)
 def log_subscription_changes(sender, instance, created, **kwargs):
     """Log subscription status changes"""
@@ -493,7 +493,8 @@ def subscription_analytics(request):
             'plans_distribution': {},
             'seasonal_data': [],
             'recent_subscriptions': [],
-            'status_distribution': {}
+            'status_distribution': {},
+            'cohorts': {'offsets': [], 'cohorts': []}
         }, status=status.HTTP_200_OK)  # Return empty data instead of error
 
 @api_view(['GET'])
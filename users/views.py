@@ -143,7 +143,7 @@ def public_profile_view(request, user_id):
     user_listings = None
     if profile_user.is_host:
         from listings.models import Listing
-        user_listings = Listing.objects.filter(
+        user_listings = Listing.objects.with_main_image().filter(
             host=profile_user,
             is_active=True,
             is_approved=True
@@ -50,10 +50,64 @@ def get_days_in_month(year: int, month: int) -> int:
     """
     return calendar.monthrange(year, month)[1]
 
+class AvailabilityBitmap:
+    """
+    Unavailable days of a date window packed into a bytearray, one byte per
+    day offset from ``start`` (1 = unavailable).
+
+    The ISO date strings are parsed once when the bitmap is built; lookups
+    and per-month slices are then constant time per day, so one bitmap can be
+    shared by every month of a multi-month calendar. Days outside the window
+    are reported as available.
+    """
+    __slots__ = ('start', 'days', 'bits')
+
+    def __init__(self, start: date, end: date):
+        self.start = start
+        self.days = max(0, (end - start).days + 1)
+        self.bits = bytearray(self.days)
+
+    @classmethod
+    def from_dates(cls, unavailable_dates: List[str], start: date, end: date) -> 'AvailabilityBitmap':
+        """Build a bitmap for [start, end] from ISO date strings"""
+        bitmap = cls(start, end)
+        for date_str in unavailable_dates:
+            offset = (date.fromisoformat(date_str) - start).days
+            if 0 <= offset < bitmap.days:
+                bitmap.bits[offset] = 1
+        return bitmap
+
+    @classmethod
+    def from_intervals(cls, intervals: List[Tuple[date, date]], start: date, end: date) -> 'AvailabilityBitmap':
+        """Build a bitmap for [start, end] from inclusive (first, last) date ranges"""
+        bitmap = cls(start, end)
+        for first, last in intervals:
+            lo = max((first - start).days, 0)
+            hi = min((last - start).days + 1, bitmap.days)
+            if lo < hi:
+                bitmap.bits[lo:hi] = b'\x01' * (hi - lo)
+        return bitmap
+
+    def is_available(self, day: date) -> bool:
+        offset = (day - self.start).days
+        return not (0 <= offset < self.days and self.bits[offset])
+
+    def month_flags(self, year: int, month: int) -> bytearray:
+        """Unavailability flags for every day of a month, indexed by day - 1"""
+        num_days = get_days_in_month(year, month)
+        offset = (date(year, month, 1) - self.start).days
+        flags = bytearray(num_days)
+
+        lo = max(offset, 0)
+        hi = min(offset + num_days, self.days)
+        if lo < hi:
+            flags[lo - offset:hi - offset] = self.bits[lo:hi]
+        return flags
+
 def get_calendar_with_availability(
     year: int, 
     month: int, 
-    unavailable_dates: List[str]
+    unavailable_dates: Union[List[str], AvailabilityBitmap]
 ) -> Dict[str, Any]:
     """
     Generate a calendar dictionary with availability information
@@ -61,7 +115,8 @@ def get_calendar_with_availability(
     Args:
         year: Calendar year
         month: Calendar month
-        unavailable_dates: List of unavailable dates in ISO format (YYYY-MM-DD)
+        unavailable_dates: List of unavailable dates in ISO format (YYYY-MM-DD),
+            or an AvailabilityBitmap shared between several months
     
     Returns:
         Dictionary with calendar information including:
@@ -76,10 +131,13 @@ def get_calendar_with_availability(
           - date: ISO formatted date
           - available: Whether the date is available
     """
-    # Convert string dates to date objects
-    unavailable_date_objs = [
-        date.fromisoformat(date_str) for date_str in unavailable_dates
-    ]
+    if not isinstance(unavailable_dates, AvailabilityBitmap):
+        unavailable_dates = AvailabilityBitmap.from_dates(
+            unavailable_dates,
+            date(year, month, 1),
+            date(year, month, get_days_in_month(year, month))
+        )
+    unavailable_flags = unavailable_dates.month_flags(year, month)
     
     # Get calendar matrix
     cal_matrix = get_month_calendar(year, month)
@@ -96,12 +154,10 @@ def get_calendar_with_availability(
                     'available': None
                 })
             else:
-                current_date = date(year, month, day)
-                date_str = current_date.isoformat()
                 week_data.append({
                     'day': day,
-                    'date': date_str,
-                    'available': current_date not in unavailable_date_objs
+                    'date': date(year, month, day).isoformat(),
+                    'available': not unavailable_flags[day - 1]
                 })
         calendar_data.append(week_data)
     
@@ -122,7 +178,7 @@ def get_multiple_months_calendar(
     start_year: int,
     start_month: int,
     num_months: int,
-    unavailable_dates: List[str]
+    unavailable_dates: Union[List[str], AvailabilityBitmap]
 ) -> List[Dict[str, Any]]:
     """
     Generate calendar data for multiple months
@@ -131,11 +187,26 @@ def get_multiple_months_calendar(
         start_year: Starting year
         start_month: Starting month
         num_months: Number of months to generate
-        unavailable_dates: List of unavailable dates in ISO format
+        unavailable_dates: List of unavailable dates in ISO format,
+            or an AvailabilityBitmap covering the months
     
     Returns:
         List of calendar dictionaries, one for each month
     """
+    if num_months <= 0:
+        return []
+
+    # Parse the dates once into a bitmap spanning all requested months
+    if not isinstance(unavailable_dates, AvailabilityBitmap):
+        end_year, end_month = start_year, start_month
+        for _ in range(num_months - 1):
+            end_year, end_month = get_next_month(end_year, end_month)
+        unavailable_dates = AvailabilityBitmap.from_dates(
+            unavailable_dates,
+            date(start_year, start_month, 1),
+            date(end_year, end_month, get_days_in_month(end_year, end_month))
+        )
+
     calendars = []
     current_year, current_month = start_year, start_month
     
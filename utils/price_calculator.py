@@ -1,8 +1,10 @@
 """
 Utility functions for calculating prices
 """
+from bisect import bisect_right
 from decimal import Decimal
-from typing import Dict, Union, List, Tuple
+from itertools import accumulate
+from typing import Dict, Union, List, Tuple, Optional, Iterable
 from datetime import date, timedelta
 
 def calculate_night_price(
@@ -48,6 +50,195 @@ def calculate_night_price(
     
     return price
 
+class SeasonalRateTable:
+    """
+    Seasonal adjustments compiled into a sorted table of non-overlapping
+    intervals.
+
+    The 'YYYY-MM-DD:YYYY-MM-DD' keys are parsed once. Where ranges overlap,
+    the first one in the mapping wins, as in calculate_night_price. Lookups
+    are a bisect, and a whole stay is resolved in a single sweep.
+    """
+
+    def __init__(self, seasonal_adjustments: Dict[str, Decimal] = None):
+        # Half-open [start, end) ranges in date ordinals, in priority order
+        ranges = []
+        for date_range, multiplier in (seasonal_adjustments or {}).items():
+            start_str, end_str = date_range.split(':')
+            ranges.append((
+                date.fromisoformat(start_str).toordinal(),
+                date.fromisoformat(end_str).toordinal() + 1,
+                multiplier
+            ))
+
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        self.multipliers: List[Decimal] = []
+
+        bounds = sorted({bound for start, end, _ in ranges for bound in (start, end)})
+        for lo, hi in zip(bounds, bounds[1:]):
+            for start, end, multiplier in ranges:
+                if start <= lo and hi <= end:
+                    self.starts.append(lo)
+                    self.ends.append(hi)
+                    self.multipliers.append(multiplier)
+                    break
+
+    def multiplier_for(self, date_obj: date) -> Optional[Decimal]:
+        """Seasonal multiplier for a night, or None if no season applies"""
+        ordinal = date_obj.toordinal()
+        idx = bisect_right(self.starts, ordinal) - 1
+        if idx >= 0 and ordinal < self.ends[idx]:
+            return self.multipliers[idx]
+        return None
+
+    def nightly_multipliers(self, start_date: date, end_date: date) -> List[Optional[Decimal]]:
+        """Seasonal multiplier (or None) for every night in [start_date, end_date)"""
+        first, last = start_date.toordinal(), end_date.toordinal()
+        result: List[Optional[Decimal]] = [None] * max(0, last - first)
+
+        idx = max(bisect_right(self.starts, first) - 1, 0)
+        while idx < len(self.starts) and self.starts[idx] < last:
+            lo = max(self.starts[idx], first)
+            hi = min(self.ends[idx], last)
+            if lo < hi:
+                result[lo - first:hi - first] = [self.multipliers[idx]] * (hi - lo)
+            idx += 1
+
+        return result
+
+class PriceQuoteEngine:
+    """
+    Prices stays for a single listing.
+
+    Seasonal ranges are compiled once per engine. quote_many() prices all
+    nights spanned by the requested stays in one pass and then totals each
+    stay from that shared table.
+    """
+
+    def __init__(
+        self,
+        base_price: Decimal,
+        cleaning_fee: Decimal = Decimal('0'),
+        service_fee: Decimal = Decimal('0'),
+        seasonal_adjustments: Dict[str, Decimal] = None,
+        day_of_week_adjustments: Dict[int, Decimal] = None,
+        length_of_stay_discount: Dict[int, Decimal] = None
+    ):
+        self.base_price = base_price
+        self.cleaning_fee = cleaning_fee
+        self.service_fee = service_fee
+        self.seasons = SeasonalRateTable(seasonal_adjustments)
+        self.day_of_week_adjustments = day_of_week_adjustments
+        self.length_of_stay_discount = sorted((length_of_stay_discount or {}).items(), reverse=True)
+
+    def nightly_prices(self, start_date: date, end_date: date) -> List[Decimal]:
+        """Price of every night in [start_date, end_date)"""
+        prices = []
+        weekday = start_date.weekday()
+        for multiplier in self.seasons.nightly_multipliers(start_date, end_date):
+            price = self.base_price
+            if multiplier is not None:
+                price = price * multiplier
+            if self.day_of_week_adjustments and weekday in self.day_of_week_adjustments:
+                price = price * self.day_of_week_adjustments[weekday]
+            prices.append(price)
+            weekday = (weekday + 1) % 7
+        return prices
+
+    def _build_quote(self, nights: int, base_total: Decimal, nightly_prices) -> Dict[str, Decimal]:
+        # Apply length of stay discount if applicable
+        discount = Decimal('0')
+        applicable_discount = None
+        for min_nights, discount_multiplier in self.length_of_stay_discount:
+            if nights >= min_nights:
+                applicable_discount = discount_multiplier
+                break
+
+        if applicable_discount:
+            discount = base_total * (Decimal('1') - applicable_discount)
+            base_total = base_total * applicable_discount
+
+        return {
+            'base_total': base_total,
+            'nightly_prices': nightly_prices,
+            'cleaning_fee': self.cleaning_fee,
+            'service_fee': self.service_fee,
+            'discount': discount,
+            'total': base_total + self.cleaning_fee + self.service_fee,
+            'nights': nights
+        }
+
+    def quote(self, start_date: date, end_date: date) -> Dict[str, Decimal]:
+        """Price a single stay; same result as calculate_stay_price"""
+        return self.quote_many([(start_date, end_date)])[0]
+
+    def quote_many(
+        self,
+        stays: Iterable[Tuple[date, date]],
+        include_nightly: bool = True
+    ) -> List[Dict[str, Decimal]]:
+        """
+        Price several (check_in, check_out) stays, returning one result per
+        stay in the same format as calculate_stay_price.
+
+        With include_nightly=False, 'nightly_prices' is None and totals come
+        from running sums, so each stay costs O(1) once the table is built.
+        """
+        stays = list(stays)
+        for start_date, end_date in stays:
+            if (end_date - start_date).days <= 0:
+                raise ValueError("End date must be after start date")
+        if not stays:
+            return []
+
+        span_start = min(start_date for start_date, _ in stays)
+        span_end = max(end_date for _, end_date in stays)
+        prices = self.nightly_prices(span_start, span_end)
+        running_totals = None if include_nightly else list(accumulate(prices, initial=Decimal('0')))
+
+        quotes = []
+        for start_date, end_date in stays:
+            nights = (end_date - start_date).days
+            first = (start_date - span_start).days
+            last = first + nights
+
+            if include_nightly:
+                nightly_prices = [
+                    (start_date + timedelta(days=i), price)
+                    for i, price in enumerate(prices[first:last])
+                ]
+                base_total = sum(price for _, price in nightly_prices)
+            else:
+                nightly_prices = None
+                base_total = running_totals[last] - running_totals[first]
+
+            quotes.append(self._build_quote(nights, base_total, nightly_prices))
+
+        return quotes
+
+def quote_many(
+    listing,
+    stays: Iterable[Tuple[date, date]],
+    seasonal_adjustments: Dict[str, Decimal] = None,
+    day_of_week_adjustments: Dict[int, Decimal] = None,
+    length_of_stay_discount: Dict[int, Decimal] = None,
+    include_nightly: bool = False
+) -> List[Dict[str, Decimal]]:
+    """
+    Quote several (check_in, check_out) stays for a listing using its nightly
+    price and fees. See PriceQuoteEngine.quote_many.
+    """
+    engine = PriceQuoteEngine(
+        listing.price_per_night,
+        listing.cleaning_fee,
+        listing.service_fee,
+        seasonal_adjustments,
+        day_of_week_adjustments,
+        length_of_stay_discount
+    )
+    return engine.quote_many(stays, include_nightly=include_nightly)
+
 def calculate_stay_price(
     base_price: Decimal,
     start_date: date,
@@ -81,55 +272,15 @@ def calculate_stay_price(
         - 'total': Final total price
         - 'nights': Number of nights
     """
-    # Calculate number of nights
-    nights = (end_date - start_date).days
-    
-    if nights <= 0:
-        raise ValueError("End date must be after start date")
-    
-    # Calculate price for each night
-    nightly_prices = []
-    current_date = start_date
-    
-    while current_date < end_date:
-        night_price = calculate_night_price(
-            base_price, 
-            current_date,
-            seasonal_adjustments,
-            day_of_week_adjustments
-        )
-        nightly_prices.append((current_date, night_price))
-        current_date += timedelta(days=1)
-    
-    # Calculate base total
-    base_total = sum(price for _, price in nightly_prices)
-    
-    # Apply length of stay discount if applicable
-    discount = Decimal('0')
-    if length_of_stay_discount:
-        # Find the applicable discount
-        applicable_discount = None
-        for min_nights, discount_multiplier in sorted(length_of_stay_discount.items(), reverse=True):
-            if nights >= min_nights:
-                applicable_discount = discount_multiplier
-                break
-        
-        if applicable_discount:
-            discount = base_total * (Decimal('1') - applicable_discount)
-            base_total = base_total * applicable_discount
-    
-    # Calculate total
-    total = base_total + cleaning_fee + service_fee
-    
-    return {
-        'base_total': base_total,
-        'nightly_prices': nightly_prices,
-        'cleaning_fee': cleaning_fee,
-        'service_fee': service_fee,
-        'discount': discount,
-        'total': total,
-        'nights': nights
-    }
+    engine = PriceQuoteEngine(
+        base_price,
+        cleaning_fee,
+        service_fee,
+        seasonal_adjustments,
+        day_of_week_adjustments,
+        length_of_stay_discount
+    )
+    return engine.quote(start_date, end_date)
 
 def format_price(price: Decimal, currency: str = '₽') -> str:
     """